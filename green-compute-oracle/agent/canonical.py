@@ -0,0 +1,126 @@
+"""
+Canonical JSON (RFC 8785, JSON Canonicalization Scheme).
+
+Everything that is signed or hashed is serialized here, so the agent, the
+certificate signer and storage agree on the exact bytes: object members
+sorted by UTF-16 code units, no insignificant whitespace, strings escaped
+minimally and emitted as UTF-8, and numbers formatted like ECMAScript's
+``Number.prototype.toString``. Callers canonicalize once and reuse the
+bytes for both the signature and the digest.
+
+This module only uses the standard library. The agent vendors it as
+agent/canonical.py, an identical copy (checked by tests/test_canonical.py).
+"""
+from typing import Any
+import hashlib
+import json
+import math
+
+# Strings go through the C encoder; with ensure_ascii=False it escapes exactly
+# what RFC 8785 requires (quote, backslash, control characters as \b \t \n
+# \f \r or lowercase \u00xx) and leaves everything else as is
+_encode_string = json.JSONEncoder(ensure_ascii=False).encode
+
+# Integers in this range are exact as IEEE 754 doubles and print as themselves
+_MAX_SAFE_INTEGER = 2 ** 53
+
+
+def _utf16_key(key: str) -> bytes:
+    return key.encode("utf-16-be")
+
+
+def _sorted_keys(obj: dict) -> list:
+    keys = list(obj)
+    for key in keys:
+        if type(key) is not str:
+            raise TypeError(f"Object keys must be strings, not {type(key).__name__}")
+    keys.sort()
+    # Code point order only differs from UTF-16 code unit order above the BMP
+    if not "".join(keys).isascii():
+        keys.sort(key=_utf16_key)
+    return keys
+
+
+def format_number(value: float) -> str:
+    """Formats a number the way ECMAScript (and so RFC 8785) does."""
+    if isinstance(value, int) and -_MAX_SAFE_INTEGER < value < _MAX_SAFE_INTEGER:
+        return str(value)
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{value} is not allowed in canonical JSON")
+    if value == 0:
+        return "0"
+
+    # repr gives the shortest round-tripping digits; only the layout differs
+    sign = "-" if value < 0 else ""
+    mantissa, _, exponent = repr(abs(value)).partition("e")
+    integer, _, fraction = mantissa.partition(".")
+    digits = integer + fraction
+    # The value is 0.<digits> * 10**point
+    point = len(integer) + (int(exponent) if exponent else 0)
+    stripped = digits.lstrip("0")
+    point -= len(digits) - len(stripped)
+    digits = stripped.rstrip("0")
+    k = len(digits)
+
+    if k <= point <= 21:
+        return sign + digits + "0" * (point - k)
+    if 0 < point <= 21:
+        return sign + digits[:point] + "." + digits[point:]
+    if -6 < point <= 0:
+        return sign + "0." + "0" * -point + digits
+    exp = point - 1
+    exp_text = ("+" if exp > 0 else "-") + str(abs(exp))
+    if k == 1:
+        return sign + digits + "e" + exp_text
+    return sign + digits[0] + "." + digits[1:] + "e" + exp_text
+
+
+def _encode(value: Any, parts: list) -> None:
+    kind = type(value)
+    if kind is str:
+        parts.append(_encode_string(value))
+    elif kind is dict:
+        parts.append("{")
+        first = True
+        for key in _sorted_keys(value):
+            if not first:
+                parts.append(",")
+            first = False
+            parts.append(_encode_string(key))
+            parts.append(":")
+            _encode(value[key], parts)
+        parts.append("}")
+    elif kind is list or kind is tuple:
+        parts.append("[")
+        for i, item in enumerate(value):
+            if i:
+                parts.append(",")
+            _encode(item, parts)
+        parts.append("]")
+    elif value is None:
+        parts.append("null")
+    elif value is True:
+        parts.append("true")
+    elif value is False:
+        parts.append("false")
+    elif isinstance(value, (int, float)):
+        parts.append(format_number(value))
+    elif isinstance(value, str):
+        parts.append(_encode_string(str(value)))
+    elif isinstance(value, dict):
+        _encode(dict(value), parts)
+    else:
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def canonicalize(value: Any) -> bytes:
+    """Returns the RFC 8785 canonical UTF-8 encoding of a JSON value."""
+    parts = []
+    _encode(value, parts)
+    return "".join(parts).encode("utf-8")
+
+
+def digest(canonical: bytes) -> str:
+    """Hex SHA-256 of canonical bytes; the content address of a document."""
+    return hashlib.sha256(canonical).hexdigest()
@@ -0,0 +1,288 @@
+"""
+Asyncio agent runtime.
+
+The agent runs as four concurrent stages connected by bounded queues:
+
+    sample -> detect inference boundaries -> sign (executor) -> ship (spool)
+
+Sampling keeps pace with the GPUSampler thread regardless of how long signing
+or disk writes take, and a slow downstream stage applies backpressure through
+its queue instead of stalling energy integration; energy simply keeps
+accumulating in the sampler until it is collected. Every stage records how
+far behind real time the items it finishes are, and a reporter task logs
+queue depth and lag periodically.
+
+Each stage is supervised: if it raises, the error is logged and the stage is
+restarted after a backoff, so one bad item cannot stop the agent. Several
+sign workers may run at once, but payloads are spooled in the order their
+inferences finished: the ship stage waits on each payload's signature in
+detection order.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio
+import logging
+import time
+import uuid
+
+from signer import signed_content
+
+logger = logging.getLogger(__name__)
+
+RESTART_BACKOFF_SECONDS = 1.0
+MAX_RESTART_BACKOFF_SECONDS = 60.0
+
+
+class StageStats:
+    """Lag (seconds from item creation to stage completion) for one stage."""
+    __slots__ = ("name", "count", "last_lag", "max_lag", "ewma_lag")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.ewma_lag = 0.0
+
+    def observe(self, created_at: float) -> None:
+        lag = time.monotonic() - created_at
+        self.count += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.ewma_lag = lag if self.count == 1 else 0.9 * self.ewma_lag + 0.1 * lag
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "last_lag_ms": self.last_lag * 1000.0,
+            "ewma_lag_ms": self.ewma_lag * 1000.0,
+            "max_lag_ms": self.max_lag * 1000.0,
+        }
+
+
+class InferenceBoundaryDetector:
+    """
+    Splits the stream of energy chunks into inferences. An inference ends when
+    utilization stays below ``idle_threshold`` for ``idle_seconds`` or when it
+    has run for ``max_seconds``, whichever comes first.
+    """
+
+    def __init__(self, idle_threshold: float = 5.0, idle_seconds: float = 1.0, max_seconds: float = 10.0):
+        self.idle_threshold = idle_threshold
+        self.idle_seconds = idle_seconds
+        self.max_seconds = max_seconds
+        self._reset(time.monotonic())
+
+    def _reset(self, now: float) -> None:
+        self.inference_id = str(uuid.uuid4())
+        self.started_at = now
+        self.energy_kwh = 0.0
+        self.util_time = 0.0
+        self.elapsed = 0.0
+        self.idle_since = None
+
+    def feed(self, now: float, energy_kwh: float, utilization: float, dt: float):
+        """
+        Adds one chunk. Returns a finished inference dict when a boundary is
+        crossed, else None.
+        """
+        self.energy_kwh += energy_kwh
+        self.util_time += utilization * dt
+        self.elapsed += dt
+
+        if utilization < self.idle_threshold:
+            self.idle_since = self.idle_since if self.idle_since is not None else now
+        else:
+            self.idle_since = None
+
+        went_idle = self.idle_since is not None and now - self.idle_since >= self.idle_seconds
+        if not went_idle and now - self.started_at < self.max_seconds:
+            return None
+
+        finished = {
+            "inference_id": self.inference_id,
+            "energy_kwh": self.energy_kwh,
+            "gpu_utilization": self.util_time / self.elapsed if self.elapsed > 0 else 0.0,
+        }
+        self._reset(now)
+        # An idle tail carries no inference; only report work that drew energy
+        return finished if finished["energy_kwh"] > 0 else None
+
+
+class AgentRuntime:
+    """
+    Wires the sampler, signer and spool together as asyncio tasks.
+    ``sign`` maps bytes to a hex signature; pass None when the uploader
+    signs whole batches instead.
+    """
+
+    def __init__(
+        self,
+        sampler,
+        sign,
+        spool,
+        uploader,
+        node_id: str,
+        model_id: str,
+        detector: InferenceBoundaryDetector = None,
+        tick_seconds: float = 0.1,
+        queue_size: int = 1024,
+        sign_workers: int = 2,
+        report_seconds: float = 30.0,
+    ):
+        self.sampler = sampler
+        self.sign = sign
+        self.spool = spool
+        self.uploader = uploader
+        self.node_id = node_id
+        self.model_id = model_id
+        self.detector = detector or InferenceBoundaryDetector()
+        self.tick_seconds = tick_seconds
+        self.queue_size = queue_size
+        self.report_seconds = report_seconds
+        self.sign_workers = sign_workers
+        self.executor = ThreadPoolExecutor(max_workers=sign_workers, thread_name_prefix="agent-sign")
+
+        self.stats = {name: StageStats(name) for name in ("sample", "detect", "sign", "ship")}
+        self.chunks: asyncio.Queue = None
+        self.to_sign: asyncio.Queue = None
+        self.to_ship: asyncio.Queue = None
+        self.restarts = {}
+
+    async def sample_stage(self) -> None:
+        """Collects the sampler's integrated energy every tick."""
+        loop_time = time.monotonic()
+        last = loop_time
+        while True:
+            loop_time += self.tick_seconds
+            await asyncio.sleep(max(0.0, loop_time - time.monotonic()))
+            now = time.monotonic()
+            energy_kwh, utilization = self.sampler.take()
+            await self.chunks.put((now, energy_kwh, utilization, now - last))
+            # Sampling lag is how late the tick ran against its schedule
+            self.stats["sample"].observe(loop_time)
+            if time.monotonic() - loop_time > self.tick_seconds:
+                loop_time = time.monotonic()
+            last = now
+
+    async def detect_stage(self) -> None:
+        while True:
+            created_at, energy_kwh, utilization, dt = await self.chunks.get()
+            finished = self.detector.feed(created_at, energy_kwh, utilization, dt)
+            self.stats["detect"].observe(created_at)
+            if finished is None:
+                continue
+
+            payload = {
+                "node_id": self.node_id,
+                "model_id": self.model_id,
+                "inference_id": finished["inference_id"],
+                "timestamp": datetime.utcnow().isoformat(),
+                "energy_kwh": finished["energy_kwh"],
+                "gpu_utilization": finished["gpu_utilization"],
+                "signature": ""  # To be filled
+            }
+            # Shipped in this order, whichever sign worker finishes first
+            signed = asyncio.get_running_loop().create_future()
+            await self.to_ship.put((created_at, payload, signed))
+            await self.to_sign.put((created_at, payload, signed))
+
+    def _sign_payload(self, payload: dict) -> str:
+        if self.sign is None:
+            # Batch signing: the uploader signs each batch as it ships
+            return ""
+        # RFC 8785 canonical JSON, as the server hashes and verifies it
+        return self.sign(signed_content(payload))
+
+    async def sign_stage(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            created_at, payload, signed = await self.to_sign.get()
+            try:
+                # Canonicalization and signing are CPU-bound; keep them off the loop
+                payload["signature"] = await loop.run_in_executor(self.executor, self._sign_payload, payload)
+            except Exception as e:
+                # Reported by the ship stage, which is waiting on this payload
+                signed.set_exception(e)
+                continue
+            self.stats["sign"].observe(created_at)
+            signed.set_result(payload)
+
+    async def ship_stage(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            created_at, pending, signed = await self.to_ship.get()
+            try:
+                payload = await signed
+            except Exception as e:
+                logger.error(f"Dropping telemetry for {pending['inference_id']}: signing failed ({e!r})")
+                continue
+            # Spool appends fsync, so they also run off the loop
+            await loop.run_in_executor(None, self.spool.append, payload)
+            self.uploader.notify()
+            self.stats["ship"].observe(created_at)
+            logger.info(f"Spooled telemetry for {payload['inference_id']}: {payload['energy_kwh']:.6f} kWh")
+
+    def report(self) -> dict:
+        return {
+            "stages": {name: stats.snapshot() for name, stats in self.stats.items()},
+            "queues": {
+                "chunks": self.chunks.qsize(),
+                "to_sign": self.to_sign.qsize(),
+                "to_ship": self.to_ship.qsize(),
+            },
+            "spool_pending_bytes": self.spool.pending_bytes(),
+            "restarts": dict(self.restarts),
+        }
+
+    async def report_stage(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_seconds)
+            report = self.report()
+            lags = ", ".join(
+                f"{name} {s['ewma_lag_ms']:.1f}ms (max {s['max_lag_ms']:.1f})"
+                for name, s in report["stages"].items()
+            )
+            logger.info(f"Stage lag: {lags}; queues: {report['queues']}")
+
+    async def supervise(self, name: str, stage) -> None:
+        """
+        Runs ``stage()`` until it is cancelled, restarting it after an
+        exponential backoff whenever it raises.
+        """
+        backoff = RESTART_BACKOFF_SECONDS
+        while True:
+            started_at = time.monotonic()
+            try:
+                await stage()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.restarts[name] = self.restarts.get(name, 0) + 1
+                if time.monotonic() - started_at > MAX_RESTART_BACKOFF_SECONDS:
+                    # It had been running fine; this is a new failure
+                    backoff = RESTART_BACKOFF_SECONDS
+                logger.exception(f"Stage {name} failed; restarting in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RESTART_BACKOFF_SECONDS)
+
+    async def run(self) -> None:
+        self.chunks = asyncio.Queue(maxsize=self.queue_size)
+        self.to_sign = asyncio.Queue(maxsize=self.queue_size)
+        self.to_ship = asyncio.Queue(maxsize=self.queue_size)
+
+        stages = [
+            ("sample", self.sample_stage),
+            ("detect", self.detect_stage),
+            *[(f"sign-{i}", self.sign_stage) for i in range(self.sign_workers)],
+            ("ship", self.ship_stage),
+            ("report", self.report_stage),
+        ]
+        tasks = [asyncio.create_task(self.supervise(name, stage), name=name) for name, stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,194 @@
+"""
+High-frequency multi-GPU power sampler.
+
+A background thread polls every NVML device at a fixed rate with handles
+cached up front. Samples land in fixed-size ``array('d')`` ring buffers, and
+energy is integrated per device by the trapezoidal rule over
+``time.monotonic()`` deltas, or read from the driver's total-energy counter
+where the device supports it. Missed ticks shorten nothing: every interval is
+weighted by the time that actually elapsed.
+"""
+from array import array
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Fixed-capacity float ring buffer backed by ``array('d')``."""
+    __slots__ = ("data", "capacity", "index", "count")
+
+    def __init__(self, capacity: int):
+        self.data = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+
+    def append(self, value: float) -> None:
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def latest(self, n: int):
+        """The most recent ``n`` values, oldest first."""
+        n = min(n, self.count)
+        start = (self.index - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n].tolist()
+        return (self.data[start:] + self.data[:(start + n) % self.capacity]).tolist()
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class SimulatedNVML:
+    """
+    Stand-in for the subset of pynvml the sampler uses, for nodes without a GPU.
+    """
+
+    class _Utilization:
+        def __init__(self, gpu):
+            self.gpu = gpu
+
+    class NVMLError(Exception):
+        pass
+
+    def __init__(self, device_count: int = 1, base_power_w: float = 250.0):
+        self.device_count = device_count
+        self.base_power_w = base_power_w
+
+    def nvmlDeviceGetCount(self):
+        return self.device_count
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        return index
+
+    def nvmlDeviceGetPowerUsage(self, handle):
+        return (self.base_power_w + random.uniform(-10, 10)) * 1000.0  # mW
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        return self._Utilization(random.uniform(80, 100))
+
+    def nvmlDeviceGetTotalEnergyConsumption(self, handle):
+        raise self.NVMLError("Not Supported")
+
+
+class _DeviceState:
+    __slots__ = (
+        "index", "handle", "use_counter", "last_counter_mj", "last_t", "last_power_w",
+        "energy_j", "util_time", "elapsed", "times", "power_w", "utilization",
+    )
+
+    def __init__(self, index, handle, buffer_size):
+        self.index = index
+        self.handle = handle
+        self.use_counter = False
+        self.last_counter_mj = 0
+        self.last_t = None
+        self.last_power_w = 0.0
+        # Accumulated since the last take()
+        self.energy_j = 0.0
+        self.util_time = 0.0
+        self.elapsed = 0.0
+        self.times = RingBuffer(buffer_size)
+        self.power_w = RingBuffer(buffer_size)
+        self.utilization = RingBuffer(buffer_size)
+
+
+class GPUSampler(threading.Thread):
+    """
+    Polls all devices at ``rate_hz`` and integrates their energy.
+    """
+
+    def __init__(self, nvml, rate_hz: float = 20.0, buffer_seconds: float = 60.0, clock=time.monotonic):
+        super().__init__(name="gpu-sampler", daemon=True)
+        self.nvml = nvml
+        self.period = 1.0 / rate_hz
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        buffer_size = max(1, int(rate_hz * buffer_seconds))
+        self.devices = []
+        for index in range(nvml.nvmlDeviceGetCount()):
+            state = _DeviceState(index, nvml.nvmlDeviceGetHandleByIndex(index), buffer_size)
+            try:
+                # Millijoules since driver load; far more accurate than sampled power
+                state.last_counter_mj = nvml.nvmlDeviceGetTotalEnergyConsumption(state.handle)
+                state.use_counter = True
+            except Exception:
+                state.use_counter = False
+            self.devices.append(state)
+
+        logger.info(
+            f"Sampling {len(self.devices)} GPU(s) at {rate_hz:g} Hz "
+            f"({sum(d.use_counter for d in self.devices)} with energy counters)"
+        )
+
+    def sample_once(self) -> None:
+        """Reads every device once and folds the interval into its accumulators."""
+        nvml = self.nvml
+        for device in self.devices:
+            try:
+                power_w = nvml.nvmlDeviceGetPowerUsage(device.handle) / 1000.0
+                util = nvml.nvmlDeviceGetUtilizationRates(device.handle).gpu
+                counter_mj = nvml.nvmlDeviceGetTotalEnergyConsumption(device.handle) if device.use_counter else 0
+            except Exception as e:
+                logger.error(f"Error reading GPU {device.index}: {e}")
+                continue
+            t = self.clock()
+
+            with self._lock:
+                if device.last_t is not None:
+                    dt = t - device.last_t
+                    if device.use_counter:
+                        device.energy_j += (counter_mj - device.last_counter_mj) / 1000.0
+                    else:
+                        device.energy_j += 0.5 * (device.last_power_w + power_w) * dt
+                    device.util_time += util * dt
+                    device.elapsed += dt
+                device.last_t = t
+                device.last_power_w = power_w
+                device.last_counter_mj = counter_mj
+
+                device.times.append(t)
+                device.power_w.append(power_w)
+                device.utilization.append(util)
+
+    def take(self):
+        """
+        Returns (energy_kwh, mean_utilization_percent) over all devices since
+        the previous call, and resets the accumulators.
+        """
+        with self._lock:
+            energy_j = 0.0
+            util_time = 0.0
+            elapsed = 0.0
+            for device in self.devices:
+                energy_j += device.energy_j
+                util_time += device.util_time
+                elapsed += device.elapsed
+                device.energy_j = 0.0
+                device.util_time = 0.0
+                device.elapsed = 0.0
+        utilization = util_time / elapsed if elapsed > 0 else 0.0
+        return energy_j / 3_600_000.0, utilization
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def run(self) -> None:
+        next_tick = self.clock()
+        while not self._stopping.is_set():
+            self.sample_once()
+            next_tick += self.period
+            delay = next_tick - self.clock()
+            if delay < 0:
+                # Fell behind; skip the missed ticks rather than bursting
+                next_tick = self.clock()
+                continue
+            self._stopping.wait(delay)
@@ -0,0 +1,108 @@
+"""
+Telemetry signing.
+
+Stands in for the TPM with a software key that is generated once and
+persisted, so a node keeps its identity across restarts. The public key is
+written next to it as ``<key>.pub``; register it with the backend by copying
+it to ``NODE_KEY_DIR/<node_id>.pem``. Ed25519 is the default; ECDSA P-256
+is there for TPMs and HSMs that only implement NIST curves.
+
+An agent signs either each payload or a whole upload batch at once. A
+payload signature covers the payload's RFC 8785 canonical JSON without its
+``signature`` field. A batch signature covers the canonical JSON array of
+those payloads' hex SHA-256 digests, in batch order. The backend recomputes
+both from what it receives (see app/services/node_keys.py).
+"""
+import hashlib
+import os
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+# A copy of the backend's, so both sides sign the same bytes
+import canonical
+
+ALGORITHMS = ("ed25519", "p256")
+
+
+def signed_content(payload: dict) -> bytes:
+    """The bytes a payload signature covers."""
+    return canonical.canonicalize({k: v for k, v in payload.items() if k != "signature"})
+
+
+def batch_content(contents) -> bytes:
+    """The bytes a batch signature covers, given each payload's signed content."""
+    return canonical.canonicalize([hashlib.sha256(content).hexdigest() for content in contents])
+
+
+def _generate(algorithm: str):
+    if algorithm == "ed25519":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == "p256":
+        return ec.generate_private_key(ec.SECP256R1())
+    raise ValueError(f"Unknown signing algorithm {algorithm!r}; expected one of {ALGORITHMS}")
+
+
+class Signer:
+    """
+    Signs telemetry with an Ed25519 or ECDSA P-256 key. Signatures are
+    returned hex-encoded; ECDSA signatures are DER.
+    """
+
+    def __init__(self, private_key):
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        if isinstance(private_key, ed25519.Ed25519PrivateKey):
+            self.algorithm = "ed25519"
+            self._sign = private_key.sign
+        else:
+            self.algorithm = "p256"
+            ecdsa = ec.ECDSA(hashes.SHA256())
+            self._sign = lambda data: private_key.sign(data, ecdsa)
+
+    @classmethod
+    def load(cls, path: str, algorithm: str = "ed25519") -> "Signer":
+        """
+        Loads the key at ``path``, generating and persisting one (and its
+        public key) on first start. An existing key is kept whatever
+        ``algorithm`` says, since the backend has it registered.
+        """
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return cls(serialization.load_pem_private_key(f.read(), password=None))
+
+        signer = cls(_generate(algorithm))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pem = signer.private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        # Written under a temporary name and renamed, so a crash never leaves a partial key
+        temp_path = f"{path}.tmp"
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+            f.write(pem)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        with open(f"{path}.pub", "wb") as f:
+            f.write(signer.public_pem())
+        return signer
+
+    def public_pem(self) -> bytes:
+        return self.public_key.public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+    def sign(self, data: bytes) -> str:
+        return self._sign(data).hex()
+
+    def sign_payload(self, payload: dict) -> str:
+        return self.sign(signed_content(payload))
+
+    def sign_batch(self, payloads) -> str:
+        """One signature for a list of payloads, over their digests."""
+        return self.sign(batch_content([signed_content(payload) for payload in payloads]))
@@ -0,0 +1,265 @@
+"""
+Disk-backed telemetry spool and batched uploader.
+
+Signed payloads are appended to an append-only JSON-lines file and shipped to
+the backend by a background thread, so sampling never waits on the network
+and nothing is lost while the backend is slow or down. A small offset file
+records how far the backend has acknowledged; both survive restarts. Records
+the backend refuses outright are moved to a quarantine file for inspection
+instead of holding up the rest.
+"""
+import json
+import logging
+import os
+import random
+import threading
+
+import requests
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+class Spool:
+    """
+    Append-only on-disk queue of telemetry records.
+    """
+
+    def __init__(self, directory: str, compact_bytes: int = 16 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, "telemetry.spool")
+        self.offset_path = os.path.join(directory, "telemetry.offset")
+        self.quarantine_path = os.path.join(directory, "telemetry.rejected")
+        # Acknowledged records are dropped once this much of the file is consumed
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        self._file = open(self.data_path, "ab")
+        self._offset = self._load_offset()
+
+    def _load_offset(self) -> int:
+        try:
+            with open(self.offset_path) as f:
+                offset = int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        return min(offset, os.path.getsize(self.data_path))
+
+    def _save_offset(self, offset: int) -> None:
+        tmp_path = f"{self.offset_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.offset_path)
+
+    def append(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def quarantine(self, record: dict, reason: str) -> None:
+        """Keeps a record the backend will never accept, with the reason."""
+        line = json.dumps({"reason": reason, "record": record}, separators=(",", ":")).encode() + b"\n"
+        with self._lock, open(self.quarantine_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read_batch(self, max_records: int):
+        """
+        Returns (records, end_offset) for up to ``max_records`` unacknowledged
+        records. A torn final line from a crash mid-write is ignored.
+        """
+        records = []
+        with self._lock, open(self.data_path, "rb") as f:
+            f.seek(self._offset)
+            end = self._offset
+            while len(records) < max_records:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.error("Skipping corrupt spool record")
+        return records, end
+
+    @property
+    def offset(self) -> int:
+        """Byte offset of the first unacknowledged record."""
+        return self._offset
+
+    def commit(self, end_offset: int) -> None:
+        """Acknowledges everything before ``end_offset``."""
+        with self._lock:
+            self._offset = end_offset
+            if self._offset >= self.compact_bytes and self._offset == os.path.getsize(self.data_path):
+                # Everything is shipped: start a fresh file
+                self._file.close()
+                self._file = open(self.data_path, "wb")
+                self._offset = 0
+            self._save_offset(self._offset)
+
+    def pending_bytes(self) -> int:
+        with self._lock:
+            return os.path.getsize(self.data_path) - self._offset
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _raw_signatures(record: dict) -> dict:
+    """
+    A copy of the record with hex signatures as bytes. Signatures that are
+    not hex are left as they are for the backend to reject, rather than
+    failing the upload (and retrying it forever).
+    """
+    converted = dict(record)
+    for field in ("signature", "batch_signature"):
+        if isinstance(record.get(field), str):
+            try:
+                converted[field] = bytes.fromhex(record[field])
+            except ValueError:
+                pass
+    return converted
+
+
+class Uploader(threading.Thread):
+    """
+    Ships spooled records to the backend batch endpoint over a keep-alive
+    session, backing off exponentially while the backend is unavailable.
+    Batches are sent as MessagePack with raw-bytes signatures, or as JSON
+    with ``wire_format="json"`` or when msgpack is not installed. Given a
+    ``signer``, each batch is sent with one signature over all its payloads
+    (see signer.py). A batch the backend
+    refuses outright (a 4xx other than 408 or 429) is split in halves until
+    the offending records are isolated and quarantined.
+    """
+
+    def __init__(
+        self,
+        spool: Spool,
+        batch_url: str,
+        batch_size: int = 100,
+        timeout: float = 10.0,
+        max_backoff: float = 60.0,
+        session=None,
+        wire_format: str = "msgpack",
+        signer=None,
+    ):
+        super().__init__(name="telemetry-uploader", daemon=True)
+        self.spool = spool
+        self.batch_url = batch_url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.session = session or requests.Session()
+        if wire_format == "msgpack" and msgpack is None:
+            logger.warning("msgpack not installed; uploading telemetry as JSON")
+            wire_format = "json"
+        self.wire_format = wire_format
+        self.signer = signer
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def notify(self) -> None:
+        """Called after appending to the spool so records ship immediately."""
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+
+    def ship_once(self) -> int:
+        """
+        Sends one batch. Returns the number of records acknowledged, 0 if the
+        spool is empty; raises on a retryable failure.
+        """
+        records, end_offset = self.spool.read_batch(self.batch_size)
+        if not records:
+            if end_offset != self.spool.offset:
+                self.spool.commit(end_offset)
+            return 0
+
+        self._deliver(records)
+        self.spool.commit(end_offset)
+        return len(records)
+
+    def _deliver(self, records) -> None:
+        """
+        Sends records, splitting a refused batch; raises on a retryable
+        failure. Parts already accepted are deduplicated by the backend when
+        the batch is retried.
+        """
+        response = self._post(records)
+        if response.status_code >= 500 or response.status_code in (408, 429):
+            raise requests.HTTPError(f"Backend error {response.status_code}", response=response)
+        if response.status_code != 200:
+            if len(records) > 1:
+                # One bad record must not take the good ones down with it
+                middle = len(records) // 2
+                self._deliver(records[:middle])
+                self._deliver(records[middle:])
+                return
+            # The backend will never accept this record; do not block the spool on it
+            logger.error(f"Quarantining telemetry {records[0].get('inference_id')}: {response.status_code} {response.text}")
+            self.spool.quarantine(records[0], f"{response.status_code} {response.text}")
+            return
+
+        result = self._decode(response)
+        for cert in result.get("certificates", []):
+            logger.info(f"Received Certificate: {cert['certificate_id']}")
+        for rejected in result.get("rejected", []):
+            logger.error(f"Telemetry {rejected['inference_id']} rejected: {rejected['detail']}")
+
+    def _post(self, records):
+        body = {"payloads": records}
+        if self.signer is not None:
+            body["batch_signature"] = self.signer.sign_batch(records)
+        if self.wire_format != "msgpack":
+            return self.session.post(self.batch_url, json=body, timeout=self.timeout)
+
+        # Hex doubles the size of the signature on the wire. Copies, so the
+        # spooled records stay as they were if the batch has to be split.
+        body = _raw_signatures(body)
+        body["payloads"] = [_raw_signatures(record) for record in records]
+        return self.session.post(
+            self.batch_url,
+            data=msgpack.packb(body),
+            headers={"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE},
+            timeout=self.timeout,
+        )
+
+    def _decode(self, response) -> dict:
+        if response.headers.get("content-type", "").startswith(MSGPACK_MEDIA_TYPE):
+            return msgpack.unpackb(response.content, raw=False)
+        return response.json()
+
+    def run(self) -> None:
+        backoff = 1.0
+        while not self._stopping.is_set():
+            # Cleared before reading so an append during the upload is not missed
+            self._wakeup.clear()
+            try:
+                shipped = self.ship_once()
+                backoff = 1.0
+            except Exception as e:
+                delay = backoff * random.uniform(0.5, 1.0)
+                logger.warning(f"Upload failed ({e}); retrying in {delay:.1f}s")
+                backoff = min(backoff * 2, self.max_backoff)
+                self._stopping.wait(delay)
+                continue
+
+            if shipped < self.batch_size:
+                # Drained: sleep until new records arrive
+                self._wakeup.wait(timeout=5.0)
@@ -1,5 +1,10 @@
+import os
+
 from pydantic_settings import BaseSettings
 
+# Key directories default to backend/keys wherever the process is started from
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Verifiable Green Compute Oracle"
     API_V1_STR: str = "/api/v1"
@@ -14,6 +19,27 @@ class Settings(BaseSettings):
     # SQLite as fallback
     SQLITE_DB_PATH: str = "green_compute.db"
     
+    # SQLite engine profile: WAL journal, one serialized writer, pooled readers
+    SQLITE_TUNED: bool = True
+    SQLITE_READ_POOL_SIZE: int = 8
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    
+    # Connection pools for Postgres. Connections are not pinged on checkout, so keep
+    # DATABASE_POOL_RECYCLE below any server, proxy or load balancer idle timeout
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 10.0  # Seconds to wait for a connection before failing
+    DATABASE_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    
+    # Optional read replica for read-only routes (lists, aggregates, exports, VCs);
+    # its connections are pinged on checkout, and while it is unreachable reads go
+    # to the primary and the replica is retried periodically
+    DATABASE_READ_REPLICA_URL: str = ""
+    DATABASE_READ_POOL_SIZE: int = 10
+    DATABASE_REPLICA_RETRY_SECONDS: float = 30.0
+    
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         if self.DATABASE_TYPE == "postgres":
@@ -21,15 +47,49 @@ class Settings(BaseSettings):
         else:
             return f"sqlite:///{self.SQLITE_DB_PATH}"
 
-    # Security
+    # Partitioning and cold archival (see services/partitions.py)
+    PARTITION_HOT_PERIODS: int = 2  # Months kept in the hot SQLite tables
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_DIR: str = "archive"
+    
+    # Without a database, certificates are kept in memory (see services/memory_store.py);
+    # set a path to append them to a snapshot file that is replayed on restart
+    MEMORY_STORE_SNAPSHOT: str = ""
+    
+    # Load the database engine, JOSE/cryptography and httpx in the background
+    # right after startup instead of on the first request that needs them
+    STARTUP_WARMUP: bool = True
+    
+    # Security (node tokens; certificates are signed with the issuer keys below)
     SECRET_KEY: str = "super-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
+    NODE_TOKEN_EXPIRE_DAYS: int = 365
+    
+    # Agent public keys (see services/node_keys.py): NODE_KEY_DIR/<node_id>.pem, Ed25519 or P-256
+    NODE_KEY_DIR: str = os.path.join(BACKEND_DIR, "keys", "nodes")
+    REQUIRE_NODE_KEYS: bool = False  # Reject nodes without a registered key instead of trusting any signature
+    
+    # Streaming ingest (see services/telemetry_stream.py)
+    STREAM_CREDITS: int = 64  # Payloads a node may have in flight per socket
+    STREAM_DRAIN_MAX: int = 100  # Queued payloads issued and stored together
+    
+    # Live dashboard feed (see services/broadcast.py)
+    SSE_CLIENT_BUFFER: int = 256  # Events buffered per subscriber before dropping the oldest
+    SSE_AGGREGATE_SECONDS: float = 2.0  # Aggregate deltas are coalesced over this interval
+    SSE_RECENT_CERTIFICATES: int = 20
+    SSE_KEEPALIVE_SECONDS: float = 15.0
     
     # External APIs
     CARBON_INTENSITY_API_KEY: str = "mock-key"
     
-    # Signing
-    PRIVATE_KEY_PATH: str = "/app/keys/private.pem"
+    # Issuer keys (see services/issuer_keys.py): ES256 PEM files, the newest signs
+    ISSUER_KEY_DIR: str = os.path.join(BACKEND_DIR, "keys", "issuer")
+    ISSUER_KEY_ID: str = ""  # Pin the signing key by kid, e.g. to publish a new key before it signs
+    ISSUER_DID: str = "did:web:localhost%3A8000"  # Resolves to /.well-known/did.json on this host
+    KEY_DOCUMENT_MAX_AGE: int = 86400  # Seconds verifiers may cache the JWKS and DID document
+    # Certificates and credentials issued before the issuer keys are HS256 under SECRET_KEY
+    # with no kid; turn this off once none of them need to verify any more
+    VERIFY_LEGACY_HS256: bool = True
 
     class Config:
         case_sensitive = True
@@ -1,24 +1,161 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+import logging
+import threading
+import time
 
-# Allow running without database for demo
-try:
-    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    DB_AVAILABLE = True
-except Exception as e:
-    print(f"⚠️  Database not available: {e}")
-    print("Running in DEMO mode without persistence")
-    SessionLocal = None
-    engine = None
-    DB_AVAILABLE = False
+logger = logging.getLogger(__name__)
+
+def _apply_sqlite_pragmas(dbapi_connection, read_only: bool):
+    """Per-connection SQLite tuning (journal mode is persistent, the rest is not)."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+def create_sqlite_engines(url: str):
+    """
+    Returns (writer, reader) engines for the tuned SQLite profile.
+    The writer pool holds exactly one connection, so writes are serialized in
+    the pool instead of colliding on SQLite's file lock; readers share a pool
+    of query-only connections that WAL lets run alongside the writer.
+    """
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+    }
+    writer = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    reader = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0
+    )
+    
+    @event.listens_for(writer, "connect")
+    def _tune_writer(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, read_only=False)
+    
+    @event.listens_for(reader, "connect")
+    def _tune_reader(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, read_only=True)
+    
+    return writer, reader
+
+def create_pooled_engine(url: str, pool_size: int, pre_ping: bool = False):
+    """
+    Engine for a client/server database with the configured pool. By default
+    connections are not pinged on checkout, which would cost a round trip per
+    request; pool_recycle retires them before server or proxy idle timeouts
+    instead, and a connection that still turns out dead invalidates the pool
+    so the others are replaced too. ``pre_ping`` is for the read replica,
+    whose failover depends on noticing on checkout that it is gone.
+    """
+    return create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=pre_ping
+    )
+
+class ReadSessionFactory:
+    """
+    Opens sessions for read-only work on the read replica. While the replica
+    cannot be reached, sessions come from the primary instead, and the
+    replica is retried after ``retry_seconds``.
+    """
+
+    def __init__(self, replica: sessionmaker, primary: sessionmaker, retry_seconds: float):
+        self.replica = replica
+        self.primary = primary
+        self.retry_seconds = retry_seconds
+        self._replica_down_until = 0.0
+
+    def __call__(self) -> Session:
+        if time.monotonic() >= self._replica_down_until:
+            db = self.replica()
+            try:
+                # Check out now, so an unreachable replica fails here and not
+                # mid-route; the replica engine pings pooled connections on
+                # checkout, so one that died while pooled fails here too
+                db.connection()
+                return db
+            except DBAPIError as e:
+                db.close()
+                self._replica_down_until = time.monotonic() + self.retry_seconds
+                logger.warning(f"Read replica unavailable, reading from the primary for {self.retry_seconds:.0f}s: {e}")
+        return self.primary()
+
+# Engines and session factories are created on first use rather than at
+# import, so a cold start does not pay for dialect/driver imports until the
+# first request that needs the database. ``from app.core.database import
+# engine`` (and SessionLocal, ReadSessionLocal, read_engine, DB_AVAILABLE)
+# still works; the module attribute triggers initialization.
+_LAZY_ATTRIBUTES = ("engine", "read_engine", "SessionLocal", "ReadSessionLocal", "DB_AVAILABLE")
+_init_lock = threading.Lock()
+
+def init_engines() -> bool:
+    """Creates the engines and session factories once; returns DB_AVAILABLE."""
+    if "DB_AVAILABLE" in globals():
+        return globals()["DB_AVAILABLE"]
+    with _init_lock:
+        if "DB_AVAILABLE" in globals():
+            return globals()["DB_AVAILABLE"]
+        # Allow running without database for demo
+        try:
+            replica_url = None
+            if settings.DATABASE_TYPE == "sqlite" and settings.SQLITE_TUNED:
+                engine, read_engine = create_sqlite_engines(settings.SQLALCHEMY_DATABASE_URI)
+            else:
+                engine = create_pooled_engine(settings.SQLALCHEMY_DATABASE_URI, settings.DATABASE_POOL_SIZE)
+                replica_url = settings.DATABASE_READ_REPLICA_URL or None
+                read_engine = (
+                    create_pooled_engine(replica_url, settings.DATABASE_READ_POOL_SIZE, pre_ping=True)
+                    if replica_url else engine
+                )
+            SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+            if replica_url:
+                ReadSessionLocal = ReadSessionFactory(ReadSessionLocal, SessionLocal, settings.DATABASE_REPLICA_RETRY_SECONDS)
+            state = {
+                "engine": engine,
+                "read_engine": read_engine,
+                "SessionLocal": SessionLocal,
+                "ReadSessionLocal": ReadSessionLocal,
+                "DB_AVAILABLE": True,
+            }
+        except Exception as e:
+            print(f"⚠️  Database not available: {e}")
+            print("Running in DEMO mode without persistence")
+            state = dict.fromkeys(_LAZY_ATTRIBUTES)
+            state["DB_AVAILABLE"] = False
+        # DB_AVAILABLE last: its presence marks initialization as complete
+        available = state.pop("DB_AVAILABLE")
+        globals().update(state)
+        globals()["DB_AVAILABLE"] = available
+        return available
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        init_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 Base = declarative_base()
 
 def get_db():
-    if not DB_AVAILABLE or SessionLocal is None:
+    if not init_engines() or SessionLocal is None:
         # Return None for demo mode
         yield None
         return
@@ -28,3 +165,19 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """
+    Session for read-only routes. Uses the read replica (falling back to the
+    primary) or the SQLite reader pool where there is one, otherwise the same
+    engine as get_db.
+    """
+    if not init_engines() or ReadSessionLocal is None:
+        yield None
+        return
+    
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,132 @@
+"""
+Wire formats for agent-facing routes.
+
+Telemetry can be sent as JSON or as MessagePack (with raw-bytes signatures),
+chosen by ``Content-Type``; responses follow ``Accept``. Both are decoded to
+Python objects (JSON by orjson) and validated from those, since the fields
+as received are kept for signature checks; models that keep them provide a
+``from_received`` constructor.
+
+Read routes that return many rows skip response models altogether: they
+build plain dicts and encode them with orjson through ``RowsJSONResponse``.
+"""
+from typing import Type
+
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise HTTPException(status_code=415, detail="MessagePack is not supported by this server")
+    return msgpack
+
+
+def _media_type(header: str) -> str:
+    return header.split(";", 1)[0].strip().lower()
+
+
+def is_msgpack(content_type: str) -> bool:
+    return _media_type(content_type or "") in MSGPACK_MEDIA_TYPES
+
+
+def accepts_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(_media_type(part) in MSGPACK_MEDIA_TYPES for part in accept.split(","))
+
+
+def request_schema(model: Type[BaseModel]) -> dict:
+    """``openapi_extra`` documenting a body accepted in both formats."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    # Inline nested models; they are not registered as OpenAPI components
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/$defs/"):
+                return resolve(defs[ref[len("#/$defs/"):]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+
+    schema = resolve(schema)
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                JSON_MEDIA_TYPE: {"schema": schema},
+                MSGPACK_MEDIA_TYPE: {"schema": schema},
+            },
+        }
+    }
+
+
+def decode_body(model: Type[BaseModel], body: bytes, content_type: str = JSON_MEDIA_TYPE) -> BaseModel:
+    """
+    Decodes a JSON or MessagePack body into ``model``. Raises HTTPException
+    for unsupported or malformed bodies and ValidationError for invalid ones.
+    """
+    validate = getattr(model, "from_received", model.model_validate)
+    if is_msgpack(content_type):
+        msgpack = _msgpack()
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Malformed MessagePack body")
+        return validate(data)
+    if _media_type(content_type) not in (JSON_MEDIA_TYPE, ""):
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+
+    import orjson
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        # Raises the ValidationError FastAPI reports for malformed JSON
+        return model.model_validate_json(body)
+    return validate(data)
+
+
+def body_decoder(model: Type[BaseModel]):
+    """
+    Returns a dependency that decodes the request body into ``model`` from
+    JSON or MessagePack according to its Content-Type.
+    """
+    async def decode(request: Request) -> BaseModel:
+        content_type = request.headers.get("content-type", JSON_MEDIA_TYPE)
+        body = await request.body()
+        try:
+            return decode_body(model, body, content_type)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False, include_context=False))
+
+    return decode
+
+
+def negotiated_response(request: Request, content: BaseModel) -> Response:
+    """Encodes a response model as MessagePack or JSON according to Accept."""
+    if accepts_msgpack(request):
+        msgpack = _msgpack()
+        return Response(msgpack.packb(content.model_dump(mode="json")), media_type=MSGPACK_MEDIA_TYPE)
+    return Response(content.model_dump_json(), media_type=JSON_MEDIA_TYPE)
+
+
+class RowsJSONResponse(Response):
+    """
+    JSON encoded by orjson from plain Python data. Returned directly, so
+    FastAPI neither validates it against the response model nor runs it
+    through jsonable_encoder. UTC datetimes end in ``Z``, as Pydantic's do.
+    """
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content) -> bytes:
+        import orjson
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
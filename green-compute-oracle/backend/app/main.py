@@ -1,11 +1,46 @@
+from contextlib import asynccontextmanager
+import asyncio
+import importlib
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import telemetry, certificates, verifiable_credentials
+from starlette.concurrency import run_in_threadpool
+from app.routes import telemetry, certificates, verifiable_credentials, placement, keys
 from app.core.config import settings
+from app.core.database import init_engines
+from app.services.issuer_keys import issuer_keyring
+
+logger = logging.getLogger(__name__)
+
+# Imported lazily by the services that use them
+WARMUP_MODULES = ("jose.jwt", "httpx")
+
+def warm_up():
+    """Loads what the first telemetry request would otherwise wait for."""
+    init_engines()
+    try:
+        issuer_keyring.load()
+    except Exception as e:
+        logger.error(f"Warm-up could not load the issuer keys: {e}")
+    for module in WARMUP_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Warm-up could not import {module}: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Scale-to-zero: start serving immediately and warm up off the event loop
+    warmup = asyncio.create_task(run_in_threadpool(warm_up)) if settings.STARTUP_WARMUP else None
+    app.state.warmup = warmup
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # CORS
@@ -20,6 +55,9 @@ app.add_middleware(
 app.include_router(telemetry.router, prefix=settings.API_V1_STR, tags=["telemetry"])
 app.include_router(certificates.router, prefix=settings.API_V1_STR, tags=["certificates"])
 app.include_router(verifiable_credentials.router, prefix=settings.API_V1_STR, tags=["verifiable-credentials"])
+app.include_router(placement.router, prefix=settings.API_V1_STR, tags=["placement"])
+# Well-known paths are resolved from the host root (did:web, JWKS discovery)
+app.include_router(keys.router, tags=["keys"])
 
 @app.get("/health")
 def health_check():
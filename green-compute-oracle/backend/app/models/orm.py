@@ -1,5 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Boolean, ForeignKey, Text
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, String, Float, DateTime, Boolean, ForeignKey, Text, Index, Integer
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 import uuid
@@ -18,7 +17,9 @@ class TelemetryEvent(Base):
     __tablename__ = "telemetry_events"
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     node_id = Column(String(36), ForeignKey("nodes.id"))
-    model_id = Column(String(36)) # Simplified for now
+    model_id = Column(String(36)) # References a registered model (models.id); not set by ingest yet
+    model_name = Column(String)  # The model ID the agent reported, e.g. "llama-2-70b"
+    node_name = Column(String)  # The node ID the agent reported; keys the node emission sketches
     inference_id = Column(String, unique=True, nullable=False)
     timestamp = Column(DateTime, nullable=False)
     energy_kwh = Column(Float, nullable=False)
@@ -38,3 +39,42 @@ class Certificate(Base):
     issued_at = Column(DateTime, default=datetime.utcnow)
     certificate_hash = Column(String, nullable=False)
     signed_content = Column(Text, nullable=False)
+    superseded_by = Column(String(36), nullable=True)  # Set when re-priced by a newer certificate
+
+    __table_args__ = (
+        Index("ix_certificates_inference_id", "inference_id"),
+        Index("ix_certificates_issued", "issued_at"),
+        # Not unique, as in schema.sql: a hash identifies one issuance (see services/storage.py)
+        Index("ix_certificates_hash", "certificate_hash"),
+        Index("ix_certificates_region_issued", "grid_region", "issued_at", "id"),
+    )
+
+
+class CarbonIntensityRecord(Base):
+    __tablename__ = "carbon_intensity_history"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    region = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    intensity_gco2_kwh = Column(Float, nullable=False)
+    source = Column(String, default="unknown")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_carbon_intensity_region_ts", "region", "timestamp"),
+    )
+
+
+class EmissionSketch(Base):
+    __tablename__ = "emission_sketches"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    dimension = Column(String, nullable=False)  # model, node or region
+    key = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)  # Hour the inferences ran in
+    count = Column(Integer, nullable=False, default=0)
+    energy_sketch = Column(Text, nullable=False)  # Serialized DDSketch (services/sketches.py)
+    emissions_sketch = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_emission_sketches_bucket", "dimension", "key", "bucket_start", unique=True),
+    )
@@ -1,18 +1,62 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 import uuid
 
+def _hex_signature(fields, name="signature"):
+    # Binary (MessagePack) clients send the raw signature bytes. Converted in
+    # place: signatures are not part of the signed content (services/node_keys.py)
+    if isinstance(fields, dict) and isinstance(fields.get(name), (bytes, bytearray)):
+        fields[name] = bytes(fields[name]).hex()
+
 class TelemetryPayload(BaseModel):
+    # The fields as received, which is what the agent signed (see
+    # services/node_keys.py); set by from_received. A slot rather than a
+    # PrivateAttr, which pydantic initializes in Python for every instance
+    __slots__ = ("_received",)
+
     node_id: str
     model_id: str
     inference_id: str
     timestamp: datetime
     energy_kwh: float
     gpu_utilization: float
-    signature: str
+    signature: str  # Empty when the enclosing batch is signed as a whole
     metrics: Optional[Dict[str, Any]] = None
 
+    @classmethod
+    def from_received(cls, data: Dict[str, Any]) -> "TelemetryPayload":
+        """
+        Validates a decoded payload, keeping its fields as received. Done
+        here rather than in model validators, which would call back into
+        Python for every payload and cost more than the parsing itself.
+        """
+        _hex_signature(data)
+        payload = cls.model_validate(data)
+        payload._received = data
+        return payload
+
+class TelemetryBatch(BaseModel):
+    payloads: List[TelemetryPayload] = Field(..., max_length=1000)
+    # One agent signature over all payloads (see services/node_keys.py)
+    batch_signature: Optional[str] = None
+
+    @classmethod
+    def from_received(cls, data: Dict[str, Any]) -> "TelemetryBatch":
+        """Validates a decoded batch, keeping each payload's fields as received."""
+        _hex_signature(data, "batch_signature")
+        received = data.get("payloads") if isinstance(data, dict) else None
+        if isinstance(received, list):
+            # Inlined: this loop runs for every payload of every batch
+            for fields in received:
+                signature = fields.get("signature") if isinstance(fields, dict) else None
+                if isinstance(signature, bytes):
+                    fields["signature"] = signature.hex()
+        batch = cls.model_validate(data)
+        for payload, fields in zip(batch.payloads, received):
+            payload._received = fields
+        return batch
+
 class AttestationRequest(BaseModel):
     node_id: str
     pcr_quote: str
@@ -30,12 +74,22 @@ class GreenCertificate(BaseModel):
     certificate_id: str
     inference_id: str
     hardware_id: str
+    model_id: Optional[str] = None
     timestamp: datetime
     energy_used_kwh: float
     carbon_intensity_gco2_kwh: float
     total_emissions_gco2: float
     issuer: str = "Verifiable Green Compute Oracle"
     signature: str
+    certificate_hash: Optional[str] = None  # SHA-256 of the canonical signed payload; identifies this issuance
+
+class RejectedTelemetry(BaseModel):
+    inference_id: str
+    detail: str
+
+class TelemetryBatchResult(BaseModel):
+    certificates: List[GreenCertificate]
+    rejected: List[RejectedTelemetry] = []
 
 class CarbonIntensityResponse(BaseModel):
     region: str
@@ -43,3 +97,39 @@ class CarbonIntensityResponse(BaseModel):
     unit: str = "gCO2/kWh"
     timestamp: datetime
     source: Optional[str] = "unknown"  # watttime, electricitymaps, or fallback
+
+class PlacementRequest(BaseModel):
+    energy_kwh: float = Field(..., gt=0)
+    duration_hours: float = Field(..., gt=0)
+    horizon_hours: float = Field(24.0, gt=0, le=168)
+    step_minutes: int = Field(15, ge=1, le=240)
+    regions: Optional[List[str]] = None
+    earliest_start: Optional[datetime] = None
+    limit: int = Field(10, ge=1, le=1000)
+
+class PlacementOption(BaseModel):
+    region: str
+    start_time: datetime
+    end_time: datetime
+    expected_emissions_gco2: float
+    avg_intensity_gco2_kwh: float
+
+class PlacementResponse(BaseModel):
+    energy_kwh: float
+    duration_hours: float
+    options: List[PlacementOption]
+
+class DistributionSummary(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, Optional[float]]
+
+class PercentileResponse(BaseModel):
+    dimension: str  # model, node or region
+    key: str
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    energy_kwh: DistributionSummary
+    emissions_gco2: DistributionSummary
@@ -1,134 +1,157 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.orm import Certificate, TelemetryEvent
-from app.models.schemas import GreenCertificate
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.core import database
+from app.core.wire import RowsJSONResponse
+from app.models.schemas import GreenCertificate, PercentileResponse
+from app.services.broadcast import broadcast_hub
+from app.services.certificate_store import CertificateStore, certificate_object, get_read_certificate_store
+from app.services.sketches import DIMENSIONS, summarize
+from datetime import datetime
+from typing import List, Literal, Optional
 import csv
 import io
 
 router = APIRouter()
 
-@router.get("/certificate/{inference_id}", response_model=GreenCertificate)
-def get_certificate(inference_id: str, db: Session = Depends(get_db)):
+@router.get("/certificate/{inference_id}", response_model=GreenCertificate, response_class=RowsJSONResponse)
+def get_certificate(inference_id: str, store: CertificateStore = Depends(get_read_certificate_store)):
     """
     Retrieves a certificate by inference ID.
     """
-    if db is None:
-        raise HTTPException(status_code=503, detail="Database not available - running in demo mode")
-    
-    cert = db.query(Certificate).filter(Certificate.inference_id == inference_id).first()
-    if not cert:
+    row = store.get_certificate_row(inference_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Certificate not found")
     
-    return GreenCertificate(
-        certificate_id=str(cert.id),
-        inference_id=cert.inference_id,
-        hardware_id="node-placeholder", # In real system, join with telemetry -> node
-        timestamp=cert.issued_at,
-        energy_used_kwh=cert.energy_used_kwh,
-        carbon_intensity_gco2_kwh=cert.carbon_intensity_gco2_kwh,
-        total_emissions_gco2=cert.total_emissions_gco2,
-        signature=cert.signed_content
-    )
+    return RowsJSONResponse(certificate_object(row))
+
+@router.get("/certificates/by-hash/{certificate_hash}", response_model=GreenCertificate, response_class=RowsJSONResponse)
+def get_certificate_by_hash(certificate_hash: str, store: CertificateStore = Depends(get_read_certificate_store)):
+    """
+    Retrieves a certificate by its content hash: the SHA-256 of its
+    canonical (RFC 8785) signed payload. An indexed lookup.
+    """
+    row = store.get_certificate_row_by_hash(certificate_hash.lower())
+    if row is None:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+
+    return RowsJSONResponse(certificate_object(row))
 
-@router.get("/certificates", response_model=List[GreenCertificate])
+@router.get("/certificates", response_model=List[GreenCertificate], response_class=RowsJSONResponse)
 def list_certificates(
     limit: int = 100,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    store: CertificateStore = Depends(get_read_certificate_store)
 ):
     """
     Lists all certificates with pagination.
+    Selected columns are encoded straight to JSON; response_model only
+    documents the shape.
     """
-    if db is None:
-        return []  # Return empty list in demo mode
-    
-    certs = db.query(Certificate).order_by(Certificate.issued_at.desc()).limit(limit).offset(offset).all()
-    
-    return [
-        GreenCertificate(
-            certificate_id=str(cert.id),
-            inference_id=cert.inference_id,
-            hardware_id="node-placeholder",
-            timestamp=cert.issued_at,
-            energy_used_kwh=cert.energy_used_kwh,
-            carbon_intensity_gco2_kwh=cert.carbon_intensity_gco2_kwh,
-            total_emissions_gco2=cert.total_emissions_gco2,
-            signature=cert.signed_content
-        )
-        for cert in certs
-    ]
+    return RowsJSONResponse([certificate_object(row) for row in store.list_certificate_rows(limit, offset)])
+
+@router.get("/certificates/stream")
+async def stream_certificates():
+    """
+    Server-Sent Events feed for dashboards: a snapshot of the running totals
+    and recent certificates, then each newly stored certificate and
+    periodically coalesced aggregate deltas. All viewers share one in-process
+    hub, so the database is queried once per process, not per viewer.
+    """
+    def seed():
+        db = database.ReadSessionLocal() if database.ReadSessionLocal is not None else None
+        try:
+            broadcast_hub.seed(db)
+        finally:
+            if db is not None:
+                db.close()
+
+    await run_in_threadpool(seed)
+    subscription = broadcast_hub.subscribe()
+    return StreamingResponse(
+        broadcast_hub.events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/model/{model_id}/emissions")
-def get_model_emissions(model_id: str, db: Session = Depends(get_db)):
+def get_model_emissions(model_id: str, store: CertificateStore = Depends(get_read_certificate_store)):
     """
     Aggregates emissions for a specific model.
     """
-    from sqlalchemy import func
-    
-    result = db.query(
-        func.sum(Certificate.total_emissions_gco2).label('total_emissions'),
-        func.avg(Certificate.total_emissions_gco2).label('avg_emissions'),
-        func.count(Certificate.id).label('inference_count')
-    ).join(
-        TelemetryEvent, Certificate.inference_id == TelemetryEvent.inference_id
-    ).filter(
-        TelemetryEvent.model_id == model_id
-    ).first()
-    
-    if result.inference_count == 0:
-        return {
-            "model_id": model_id,
-            "total_emissions_gco2": 0,
-            "avg_emissions_gco2": 0,
-            "inference_count": 0
-        }
+    return {"model_id": model_id, **store.model_emissions(model_id)}
+
+@router.get("/percentiles/{dimension}/{key}", response_model=PercentileResponse)
+def get_percentiles(
+    dimension: Literal[DIMENSIONS],
+    key: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    q: List[float] = Query([0.5, 0.95, 0.99]),
+    store: CertificateStore = Depends(get_read_certificate_store)
+):
+    """
+    Per-inference energy and emissions percentiles for a model, node or region.
+    Merges the hourly sketches overlapping [start, end) rather than scanning
+    certificates; values are within 1% of the exact percentiles.
+    """
+    if any(not 0 <= quantile <= 1 for quantile in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
     
-    return {
-        "model_id": model_id,
-        "total_emissions_gco2": float(result.total_emissions or 0),
-        "avg_emissions_gco2": float(result.avg_emissions or 0),
-        "inference_count": result.inference_count
-    }
+    energy, emissions = store.emission_distributions(dimension, key, start, end)
+    return PercentileResponse(
+        dimension=dimension,
+        key=key,
+        start=start,
+        end=end,
+        energy_kwh=summarize(energy, q),
+        emissions_gco2=summarize(emissions, q)
+    )
 
 @router.get("/compliance/export")
-def export_compliance_report(db: Session = Depends(get_db)):
+def export_compliance_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    store: CertificateStore = Depends(get_read_certificate_store)
+):
     """
-    Exports a CSV compliance report with all certificates.
+    Exports a CSV compliance report with all certificates issued in [start, end).
+    Rotated partitions and cold archives are included, so the report covers the
+    full history; only the partitions overlapping the range are read.
     """
-    from fastapi.responses import StreamingResponse
-    
-    certs = db.query(Certificate).order_by(Certificate.issued_at.desc()).all()
-    
-    # Generate CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        "Certificate ID",
-        "Inference ID",
-        "Timestamp",
-        "Energy (kWh)",
-        "Carbon Intensity (gCO2/kWh)",
-        "Total Emissions (gCO2)",
-        "Verified"
-    ])
-    
-    for cert in certs:
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output)
         writer.writerow([
-            str(cert.id),
-            cert.inference_id,
-            cert.issued_at.isoformat(),
-            cert.energy_used_kwh,
-            cert.carbon_intensity_gco2_kwh,
-            cert.total_emissions_gco2,
-            "Yes"
+            "Certificate ID",
+            "Inference ID",
+            "Timestamp",
+            "Energy (kWh)",
+            "Carbon Intensity (gCO2/kWh)",
+            "Total Emissions (gCO2)",
+            "Verified"
         ])
-    
-    output.seek(0)
+        
+        for count, cert in enumerate(store.iter_certificate_rows(start, end), 1):
+            writer.writerow([
+                str(cert["id"]),
+                cert["inference_id"],
+                cert["issued_at"].isoformat(),
+                cert["energy_used_kwh"],
+                cert["carbon_intensity_gco2_kwh"],
+                cert["total_emissions_gco2"],
+                "Yes"
+            ])
+            # Flush in chunks instead of building the whole report in memory
+            if count % 1000 == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        
+        yield output.getvalue()
     
     return StreamingResponse(
-        iter([output.getvalue()]),
+        generate(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=green_compute_compliance.csv"}
     )
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Request, Response
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.issuer_keys import issuer_keyring
+
+router = APIRouter()
+
+async def key_document(request: Request, name: str, media_type: str) -> Response:
+    # First use may load or generate the keys, which touches the disk
+    content, etag = await run_in_threadpool(issuer_keyring.document, name, settings.ISSUER_DID)
+    headers = {
+        "Cache-Control": f"public, max-age={settings.KEY_DOCUMENT_MAX_AGE}",
+        "ETag": etag
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@router.get("/.well-known/jwks.json")
+async def get_jwks(request: Request):
+    """
+    The issuer's public signing keys as a JWK Set. Verifiers cache it and
+    check credential signatures offline, refetching when they meet an
+    unknown kid.
+    """
+    return await key_document(request, "jwks", "application/jwk-set+json")
+
+@router.get("/.well-known/did.json")
+async def get_did_document(request: Request):
+    """
+    The did:web document for ISSUER_DID, listing the same keys as
+    verification methods.
+    """
+    return await key_document(request, "did", "application/did+ld+json")
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException
+from app.models.schemas import PlacementRequest, PlacementResponse
+from app.services.carbon_oracle import carbon_oracle
+from app.services.placement import plan_placement
+
+router = APIRouter()
+
+@router.post("/placement", response_model=PlacementResponse)
+def recommend_placement(request: PlacementRequest):
+    """
+    Ranks (region, start time) options for a job of the given energy and duration
+    by expected emissions over the planning horizon.
+    """
+    if request.regions is not None:
+        unknown = [r for r in request.regions if r not in carbon_oracle.regional_fallbacks]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown regions: {', '.join(unknown)}")
+    
+    options = plan_placement(
+        carbon_oracle,
+        energy_kwh=request.energy_kwh,
+        duration_seconds=request.duration_hours * 3600,
+        horizon_seconds=request.horizon_hours * 3600,
+        step_seconds=request.step_minutes * 60,
+        regions=request.regions,
+        start=request.earliest_start,
+        limit=request.limit
+    )
+    
+    return PlacementResponse(
+        energy_kwh=request.energy_kwh,
+        duration_hours=request.duration_hours,
+        options=options
+    )
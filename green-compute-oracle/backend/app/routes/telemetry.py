@@ -1,89 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, WebSocket, status
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.schemas import TelemetryPayload, GreenCertificate
-from app.services.carbon_oracle import carbon_oracle
-from app.services.emission_calc import emission_calculator
+from starlette.concurrency import run_in_threadpool
+from app.core.database import get_db, get_read_db
+from app.models.schemas import TelemetryPayload, GreenCertificate, TelemetryBatch, TelemetryBatchResult, RejectedTelemetry
+from app.services.issuance import issue_certificate, InvalidAgentSignature
+from app.services.certificate_store import CertificateStore, get_certificate_store
 from app.services.crypto_engine import crypto_engine
-from datetime import datetime
-import uuid
+from app.services.telemetry_stream import TelemetryStream, authenticate_node
+from app.core.wire import body_decoder, negotiated_response, request_schema
 
 router = APIRouter()
 
-# In-memory storage for demo purposes if DB is not connected, 
-# but code is written to be DB-ready.
-# We will just print to console in this v1 for "storage" if DB fails.
-
-from app.services.storage import store_certificate
-from app.services.verifiable_credentials import vc_engine
-
-@router.post("/telemetry", response_model=GreenCertificate)
+@router.post("/telemetry", response_model=GreenCertificate, openapi_extra=request_schema(TelemetryPayload))
 async def ingest_telemetry(
-    payload: TelemetryPayload, 
+    request: Request,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    payload: TelemetryPayload = Depends(body_decoder(TelemetryPayload)),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    store: CertificateStore = Depends(get_certificate_store)
 ):
     """
     Ingests signed telemetry from the GPU Agent.
     Verifies signature, fetches carbon intensity, computes emissions, and issues a certificate.
+    Accepts and returns JSON or MessagePack (see app.core.wire).
     """
-    
-    # 1. Verify Agent Signature (TPM/TEE)
-    # In a real scenario, we'd look up the node's public key from the DB using payload.node_id
-    if not crypto_engine.verify_agent_signature(payload.dict(), payload.signature, "public_key_placeholder"):
-        raise HTTPException(status_code=401, detail="Invalid Agent Signature")
+    try:
+        certificate = await issue_certificate(payload, db, read_db)
+    except InvalidAgentSignature as e:
+        raise HTTPException(status_code=401, detail=str(e))
 
-    # 2. Fetch Carbon Intensity (now with real APIs!)
-    # We assume the node region is known or passed. For now, default to 'us-east'
-    region = "us-east" 
-    carbon_data = await carbon_oracle.get_intensity(region)
+    # Store (Async)
+    background_tasks.add_task(store.store_certificates, [(certificate, payload.signature)])
+    
+    return negotiated_response(request, certificate)
 
-    # 3. Compute Emissions
-    total_emissions = emission_calculator.calculate_emissions(
-        payload.energy_kwh, 
-        carbon_data.intensity
-    )
+@router.post("/telemetry/batch", response_model=TelemetryBatchResult, openapi_extra=request_schema(TelemetryBatch))
+async def ingest_telemetry_batch(
+    request: Request,
+    batch: TelemetryBatch = Depends(body_decoder(TelemetryBatch)),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    store: CertificateStore = Depends(get_certificate_store)
+):
+    """
+    Ingests a batch of signed telemetry records, e.g. flushed from an agent's spool.
+    Each record is issued independently; invalid records are reported, not fatal.
+    A batch_signature is verified once for all records, and rejects them all if invalid.
+    All certificates are stored in one transaction before the response, which
+    carries the stored certificate for each record: a retried batch gets back
+    the certificates issued the first time. If storing fails the request
+    fails, so the agent retries it.
+    """
+    certificates = []
+    rejected = []
+    batch_verified = False
+    if batch.batch_signature is not None:
+        batch_verified = crypto_engine.verify_agent_batch(batch.payloads, batch.batch_signature)
+    for payload in batch.payloads:
+        if batch.batch_signature is not None and not batch_verified:
+            rejected.append(RejectedTelemetry(inference_id=payload.inference_id, detail="Invalid Agent Signature"))
+            continue
+        try:
+            certificate = await issue_certificate(payload, db, read_db, signature_verified=batch_verified)
+        except InvalidAgentSignature as e:
+            rejected.append(RejectedTelemetry(inference_id=payload.inference_id, detail=str(e)))
+            continue
+        certificates.append((certificate, batch.batch_signature if batch_verified else payload.signature))
 
-    # 4. Generate Certificate ID
-    cert_id = str(uuid.uuid4())
-    
-    # 5. Generate W3C Verifiable Credential
-    vc = vc_engine.create_vc(
-        certificate_id=cert_id,
-        inference_id=payload.inference_id,
-        hardware_id=payload.node_id,
-        timestamp=payload.timestamp,
-        energy_kwh=payload.energy_kwh,
-        carbon_intensity=carbon_data.intensity,
-        total_emissions=total_emissions,
-        carbon_source=carbon_data.source
-    )
+    held = await run_in_threadpool(store.store_certificates, certificates) if certificates else []
     
-    # 6. Sign VC
-    signed_vc = vc_engine.sign_vc(vc)
-    
-    # 7. Also create legacy JWS certificate for backward compatibility
-    cert_data = {
-        "certificate_id": cert_id,
-        "inference_id": payload.inference_id,
-        "hardware_id": payload.node_id,
-        "timestamp": payload.timestamp.isoformat(),
-        "energy_used_kwh": payload.energy_kwh,
-        "carbon_intensity_gco2_kwh": carbon_data.intensity,
-        "total_emissions_gco2": total_emissions,
-        "issuer": "Verifiable Green Compute Oracle",
-        "w3c_vc": signed_vc  # Embed VC in legacy format
-    }
-    
-    signature = crypto_engine.sign_certificate(cert_data)
-    
-    certificate = GreenCertificate(
-        **{k: v for k, v in cert_data.items() if k != "w3c_vc"},
-        signature=signature
-    )
+    return negotiated_response(request, TelemetryBatchResult(
+        certificates=held,
+        rejected=rejected
+    ))
 
-    # 8. Store (Async)
-    if db is not None:
-        background_tasks.add_task(store_certificate, db, certificate, payload.signature)
-    
-    return certificate
+@router.websocket("/telemetry/stream")
+async def stream_telemetry(websocket: WebSocket):
+    """
+    Long-lived ingest channel for an authenticated node.
+    Payloads are issued like POST /telemetry and answered on the same socket,
+    with credit-based flow control (see app.services.telemetry_stream).
+    """
+    node_id = authenticate_node(websocket)
+    if node_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await TelemetryStream(websocket, node_id).run()
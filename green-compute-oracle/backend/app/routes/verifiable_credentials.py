@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.orm import Certificate
+from app.core.database import get_read_db
+from app.services.certificate_store import CertificateStore, get_read_certificate_store
 from app.services.verifiable_credentials import vc_engine
 from datetime import datetime
 import json
@@ -9,24 +9,21 @@ import json
 router = APIRouter()
 
 @router.get("/certificate/{inference_id}/vc")
-def get_verifiable_credential(inference_id: str, db: Session = Depends(get_db)):
+def get_verifiable_credential(inference_id: str, store: CertificateStore = Depends(get_read_certificate_store)):
     """
     Retrieves a W3C Verifiable Credential for a certificate.
     Returns JSON-LD format as per W3C VC Data Model.
     """
-    if db is None:
-        raise HTTPException(status_code=503, detail="Database not available")
-    
-    cert = db.query(Certificate).filter(Certificate.inference_id == inference_id).first()
+    cert = store.get_certificate(inference_id)
     if not cert:
         raise HTTPException(status_code=404, detail="Certificate not found")
     
     # Regenerate W3C VC from stored certificate data
     vc = vc_engine.create_vc(
-        certificate_id=str(cert.id),
+        certificate_id=cert.certificate_id,
         inference_id=cert.inference_id,
-        hardware_id="node-placeholder",  # Would join with telemetry in production
-        timestamp=cert.issued_at,
+        hardware_id=cert.hardware_id,
+        timestamp=cert.timestamp,
         energy_kwh=cert.energy_used_kwh,
         carbon_intensity=cert.carbon_intensity_gco2_kwh,
         total_emissions=cert.total_emissions_gco2,
@@ -46,7 +43,7 @@ def get_verifiable_credential(inference_id: str, db: Session = Depends(get_db)):
 def verify_verifiable_credential(
     inference_id: str,
     vc_data: dict,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Verifies a W3C Verifiable Credential.
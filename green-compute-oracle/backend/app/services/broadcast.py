@@ -0,0 +1,278 @@
+"""
+In-process broadcast hub for live dashboard updates.
+
+Stored certificates are published once and fanned out to every subscriber,
+so the database sees the same load whether one dashboard is open or a
+hundred. Each subscriber has a bounded buffer; a slow consumer loses its
+oldest events and is told how many it missed, rather than holding memory
+or slowing down publishers.
+
+Emission aggregates are not recomputed per viewer. Publishing accumulates a
+delta per model, and the delta is flushed to all subscribers at most every
+``aggregate_seconds``. New subscribers start from an in-memory snapshot of
+the running totals and most recent certificates, seeded from the database
+once per process.
+"""
+from collections import deque
+from typing import List, Optional
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.models.orm import Certificate, TelemetryEvent
+from app.models.schemas import GreenCertificate
+from app.services.partitions import partitioned
+
+logger = logging.getLogger(__name__)
+
+
+def _empty_totals() -> dict:
+    return {"count": 0, "total_emissions_gco2": 0.0, "energy_kwh": 0.0, "models": {}}
+
+
+def _bump(target: dict, count: int, emissions: float, energy: float) -> None:
+    target["count"] += count
+    target["total_emissions_gco2"] += emissions
+    target["energy_kwh"] += energy
+
+
+def _add(totals: dict, model_id: Optional[str], count: int, emissions: float, energy: float) -> None:
+    _bump(totals, count, emissions, energy)
+    if model_id is not None:
+        model = totals["models"].setdefault(model_id, {"count": 0, "total_emissions_gco2": 0.0, "energy_kwh": 0.0})
+        _bump(model, count, emissions, energy)
+
+
+def _merge(totals: dict, delta: dict) -> None:
+    _bump(totals, delta["count"], delta["total_emissions_gco2"], delta["energy_kwh"])
+    for model_id, model in delta["models"].items():
+        target = totals["models"].setdefault(model_id, {"count": 0, "total_emissions_gco2": 0.0, "energy_kwh": 0.0})
+        _bump(target, model["count"], model["total_emissions_gco2"], model["energy_kwh"])
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """
+    One subscriber's bounded event buffer. Events are (name, data) tuples.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+
+    def push(self, event: tuple) -> None:
+        """Adds an event, dropping the oldest if full. Safe from any thread."""
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def get(self, timeout: float) -> List[tuple]:
+        """
+        Waits up to ``timeout`` seconds for events and returns all buffered
+        ones, preceded by a ``dropped`` event if any were lost.
+        """
+        if not self.buffer:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        events = []
+        while self.buffer:
+            events.append(self.buffer.popleft())
+        if self.dropped:
+            events.insert(0, ("dropped", {"count": self.dropped}))
+            self.dropped = 0
+        return events
+
+
+class BroadcastHub:
+    """
+    Fans out stored certificates and coalesced aggregate deltas.
+    """
+
+    def __init__(self, buffer_size: int = None, aggregate_seconds: float = None, recent_size: int = None):
+        self.buffer_size = buffer_size or settings.SSE_CLIENT_BUFFER
+        self.aggregate_seconds = aggregate_seconds if aggregate_seconds is not None else settings.SSE_AGGREGATE_SECONDS
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=recent_size or settings.SSE_RECENT_CERTIFICATES)
+        self._totals = _empty_totals()
+        self._pending = _empty_totals()
+        self._last_flush = time.monotonic()
+        self._seeded = False
+        self._seed_lock = threading.Lock()  # One seeding query per process
+
+    def seed(self, db) -> None:
+        """Loads running totals and recent certificates; only the first call queries."""
+        if self._seeded:
+            return
+        with self._seed_lock:
+            if self._seeded:
+                return
+            self._seed(db)
+
+    def _seed(self, db) -> None:
+        if db is None:
+            # Nothing to load: count from what this process publishes
+            with self._lock:
+                self._seeded = True
+            return
+
+        totals = _empty_totals()
+        with self._lock:
+            # Published, so committed: the queries below count these
+            earlier_pending, earlier_recent = self._pending, list(self._recent)
+            self._pending = _empty_totals()
+            self._recent.clear()
+        try:
+            # Rotated partitions included, so totals cover the full history
+            certificates = partitioned(db, Certificate.__tablename__)
+            telemetry = partitioned(db, TelemetryEvent.__tablename__)
+            rows = db.execute(select(
+                telemetry.c.model_name,
+                func.count(certificates.c.id),
+                func.sum(certificates.c.total_emissions_gco2),
+                func.sum(certificates.c.energy_used_kwh)
+            ).join(
+                telemetry, certificates.c.inference_id == telemetry.c.inference_id
+            ).where(
+                certificates.c.superseded_by.is_(None)
+            ).group_by(telemetry.c.model_name)).all()
+            for model_id, count, emissions, energy in rows:
+                _add(totals, model_id, count, float(emissions or 0), float(energy or 0))
+
+            certs = db.execute(select(
+                certificates, telemetry.c.model_name
+            ).select_from(certificates).outerjoin(
+                telemetry, certificates.c.inference_id == telemetry.c.inference_id
+            ).where(
+                certificates.c.superseded_by.is_(None)
+            ).order_by(certificates.c.issued_at.desc()).limit(self._recent.maxlen)).all()
+            recent = [
+                GreenCertificate(
+                    certificate_id=str(cert.id),
+                    inference_id=cert.inference_id,
+                    hardware_id="node-placeholder",
+                    model_id=cert.model_name,
+                    timestamp=cert.issued_at,
+                    energy_used_kwh=cert.energy_used_kwh,
+                    carbon_intensity_gco2_kwh=cert.carbon_intensity_gco2_kwh,
+                    total_emissions_gco2=cert.total_emissions_gco2,
+                    signature=cert.signed_content
+                ).model_dump(mode="json")
+                for cert in reversed(certs)
+            ]
+        except SQLAlchemyError as e:
+            # Count from what this process publishes rather than failing every viewer
+            logger.error(f"Error seeding broadcast hub: {e}")
+            with self._lock:
+                _merge(self._pending, earlier_pending)
+                published = list(self._recent)
+                self._recent.clear()
+                self._recent.extend(earlier_recent + published)
+                self._seeded = True
+            return
+
+        with self._lock:
+            # Certificates published while the queries ran stay in _pending and
+            # are merged into the totals by the next flush. One committed just
+            # before the queries but published after the reset above is counted
+            # twice; the queries cannot tell which side of the commit they ran.
+            self._totals = totals
+            queried = {cert["inference_id"] for cert in recent}
+            published = [cert for cert in self._recent if cert["inference_id"] not in queried]
+            self._recent.clear()
+            self._recent.extend(recent)
+            self._recent.extend(published)
+            self._seeded = True
+
+    def subscribe(self) -> Subscription:
+        """Registers a subscriber on the running loop; its first event is a snapshot."""
+        subscription = Subscription(self.buffer_size)
+        with self._lock:
+            subscription.push(("snapshot", {
+                "certificates": list(reversed(self._recent)),
+                "totals": self._copy(self._totals),
+            }))
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish_certificates(self, certificates: List[GreenCertificate]) -> None:
+        """Announces newly stored certificates. Safe from any thread."""
+        with self._lock:
+            for cert in certificates:
+                data = cert.model_dump(mode="json")
+                self._recent.append(data)
+                _add(self._pending, cert.model_id, 1, cert.total_emissions_gco2, cert.energy_used_kwh)
+                for subscription in self._subscribers:
+                    subscription.push(("certificate", data))
+
+    def flush_aggregates(self, force: bool = False) -> None:
+        """
+        Sends the delta accumulated since the last flush, if at least
+        ``aggregate_seconds`` have passed and anything changed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_flush < self.aggregate_seconds:
+                return
+            self._last_flush = now
+            if not self._pending["count"]:
+                return
+            delta = self._pending
+            self._pending = _empty_totals()
+            _merge(self._totals, delta)
+            for subscription in self._subscribers:
+                subscription.push(("aggregates", delta))
+
+    async def events(self, subscription: Subscription, keepalive_seconds: float = None):
+        """
+        Yields Server-Sent Events for a subscription until the client goes away.
+        Waiting subscribers take turns flushing the aggregate delta, so no
+        background task is needed.
+        """
+        keepalive_seconds = keepalive_seconds or settings.SSE_KEEPALIVE_SECONDS
+        last_sent = time.monotonic()
+        try:
+            while True:
+                events = await subscription.get(timeout=self.aggregate_seconds)
+                self.flush_aggregates()
+                if events:
+                    yield "".join(format_sse(name, data) for name, data in events)
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= keepalive_seconds:
+                    # Comment line; keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscription)
+
+    @staticmethod
+    def _copy(totals: dict) -> dict:
+        return {**totals, "models": {k: dict(v) for k, v in totals["models"].items()}}
+
+
+# Global instance
+broadcast_hub = BroadcastHub()
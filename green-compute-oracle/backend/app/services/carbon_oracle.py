@@ -1,7 +1,9 @@
-import httpx
-from datetime import datetime
+from datetime import datetime, timezone
 from app.models.schemas import CarbonIntensityResponse
+from app.services.intensity_store import FALLBACK_SOURCE, IntensityStore, intensity_store, to_epoch
+from sqlalchemy.orm import Session
 import logging
+import time
 from typing import Optional
 
 logger = logging.getLogger(__name__)
@@ -20,6 +22,7 @@ class WattTimeClient:
         
     async def _get_token(self) -> Optional[str]:
         """Authenticate and get access token"""
+        import httpx  # Deferred: not needed until the first live lookup
         try:
             async with httpx.AsyncClient() as client:
                 response = await client.get(
@@ -49,6 +52,7 @@ class WattTimeClient:
             logger.warning("No WattTime token, using fallback")
             return None
             
+        import httpx
         try:
             async with httpx.AsyncClient() as client:
                 response = await client.get(
@@ -91,6 +95,7 @@ class ElectricityMapsClient:
             logger.warning("No Electricity Maps API key")
             return None
             
+        import httpx
         try:
             async with httpx.AsyncClient() as client:
                 response = await client.get(
@@ -108,12 +113,46 @@ class ElectricityMapsClient:
             logger.error(f"Electricity Maps API error: {e}")
             return None
 
+    async def get_intensity_at(self, zone: str, timestamp: datetime) -> Optional[float]:
+        """
+        Get the carbon intensity a zone had at a past point in time.
+        """
+        if not self.api_key:
+            return None
+
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        import httpx
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(
+                    f"{self.base_url}/carbon-intensity/past",
+                    params={"zone": zone, "datetime": timestamp.astimezone(timezone.utc).isoformat()},
+                    headers={"auth-token": self.api_key},
+                    timeout=10.0
+                )
+
+                if response.status_code == 200:
+                    data = response.json()
+                    return data.get("carbonIntensity", None)
+
+        except Exception as e:
+            logger.error(f"Electricity Maps API error: {e}")
+            return None
+
 class CarbonOracle:
     """Enhanced Carbon Oracle with real-time API integration"""
     
-    def __init__(self, watttime_user: str = "", watttime_pass: str = "", emaps_key: str = ""):
+    def __init__(
+        self,
+        watttime_user: str = "",
+        watttime_pass: str = "",
+        emaps_key: str = "",
+        history: Optional[IntensityStore] = None
+    ):
         self.watttime = WattTimeClient(watttime_user, watttime_pass)
         self.emaps = ElectricityMapsClient(emaps_key)
+        self.history = history if history is not None else intensity_store
         
         # Fallback regional averages (US EPA 2023 data)
         self.regional_fallbacks = {
@@ -128,12 +167,15 @@ class CarbonOracle:
             "default": 429.0       # Global average
         }
     
-    async def get_intensity(self, region: str) -> CarbonIntensityResponse:
+    async def get_intensity(self, region: str, db: Optional[Session] = None) -> CarbonIntensityResponse:
         """
         Get carbon intensity with cascading fallback:
         1. Try WattTime
         2. Try Electricity Maps
         3. Use regional fallback
+
+        Every provider observation is recorded in the intensity history; the
+        regional average is not.
         """
         intensity = None
         source = "fallback"
@@ -155,17 +197,67 @@ class CarbonOracle:
         # Fallback to regional average
         if not intensity:
             intensity = self.regional_fallbacks.get(region, self.regional_fallbacks["default"])
-            source = "regional_average"
+            source = FALLBACK_SOURCE
         
         logger.info(f"Carbon intensity for {region}: {intensity:.2f} gCO2/kWh (source: {source})")
         
+        observed_at = datetime.utcnow()
+        # Skipped for the regional average, which was not observed at this time
+        self.history.record(region, observed_at, intensity, source, db=db)
+        
         return CarbonIntensityResponse(
             region=region,
             intensity=intensity,
-            timestamp=datetime.utcnow(),
+            timestamp=observed_at,
             source=source  # Add source tracking
         )
     
+    async def get_intensity_at(
+        self,
+        region: str,
+        timestamp: datetime,
+        db: Optional[Session] = None,
+        read_db: Optional[Session] = None
+    ) -> CarbonIntensityResponse:
+        """
+        Get carbon intensity at a specific point in time:
+        1. The intensity history, when an observation is close enough
+        2. A live lookup, if ``timestamp`` is that close to now
+        3. Electricity Maps' historical data (WattTime's needs a paid plan)
+        4. The regional average, reported as source ``FALLBACK_SOURCE``
+
+        The current intensity is never used for an older timestamp.
+        History reads go through ``read_db`` when given, writes through ``db``.
+        """
+        known = self.history.lookup(region, timestamp, db=read_db if read_db is not None else db)
+        if known is not None:
+            intensity, source = known
+            return CarbonIntensityResponse(
+                region=region,
+                intensity=intensity,
+                timestamp=timestamp,
+                source=source
+            )
+
+        if abs(time.time() - to_epoch(timestamp)) <= self.history.max_gap_seconds:
+            return await self.get_intensity(region, db=db)
+
+        intensity = await self.emaps.get_intensity_at(self._map_to_emaps_zone(region), timestamp)
+        if intensity:
+            source = "electricitymaps"
+            self.history.record(region, timestamp, intensity, source, db=db)
+        else:
+            intensity = self.regional_fallbacks.get(region, self.regional_fallbacks["default"])
+            source = FALLBACK_SOURCE
+        logger.info(f"Carbon intensity for {region} at {timestamp.isoformat()}: {intensity:.2f} gCO2/kWh (source: {source})")
+
+        return CarbonIntensityResponse(
+            region=region,
+            intensity=intensity,
+            timestamp=timestamp,
+            source=source
+        )
+    
     def _map_to_watttime_ba(self, region: str) -> str:
         """Map our region codes to WattTime Balancing Authority codes"""
         mapping = {
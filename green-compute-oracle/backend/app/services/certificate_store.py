@@ -0,0 +1,227 @@
+"""
+Storage backends for issued certificates.
+
+Routes read and write certificates through a ``CertificateStore`` instead of
+a SQLAlchemy session, so every endpoint works the same with or without a
+database. ``SQLCertificateStore`` wraps a session; when the database is not
+available the dependencies below hand out the in-memory columnar store from
+services/memory_store.py instead.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Depends
+from sqlalchemy import func, literal, null, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.models.orm import Certificate, TelemetryEvent
+from app.models.schemas import GreenCertificate
+from app.services.partitions import iter_certificate_rows, partitioned
+from app.services.sketches import DDSketch, merged_sketches
+from app.services.storage import store_certificates
+
+
+ISSUER = GreenCertificate.model_fields["issuer"].default
+
+
+def certificate_object(row: Tuple) -> Dict:
+    """
+    A certificate row as the object a GreenCertificate serializes to.
+    Rows hold the GreenCertificate fields in declaration order, without
+    ``issuer``.
+    """
+    (certificate_id, inference_id, hardware_id, model_id, timestamp, energy_used_kwh,
+     carbon_intensity_gco2_kwh, total_emissions_gco2, signature, certificate_hash) = row
+    return {
+        "certificate_id": certificate_id,
+        "inference_id": inference_id,
+        "hardware_id": hardware_id,
+        "model_id": model_id,
+        "timestamp": timestamp,
+        "energy_used_kwh": energy_used_kwh,
+        "carbon_intensity_gco2_kwh": carbon_intensity_gco2_kwh,
+        "total_emissions_gco2": total_emissions_gco2,
+        "issuer": ISSUER,
+        "signature": signature,
+        "certificate_hash": certificate_hash,
+    }
+
+
+class CertificateStore(ABC):
+    """
+    Where certificates are kept and queried. Implementations must be safe to
+    call from the threadpool.
+
+    Read paths come in two forms: plain rows (see ``certificate_object``)
+    for routes that encode them straight to JSON, and GreenCertificate
+    models built from those rows for everything else.
+    """
+
+    @abstractmethod
+    def store_certificates(self, items: List[Tuple[GreenCertificate, str]]) -> List[GreenCertificate]:
+        """
+        Stores (certificate, agent signature) pairs. Returns the certificate
+        held for each item once this returns, in order: the item's own, or
+        for an inference ID that was already stored, the stored one. Raises
+        if they could not be stored.
+        """
+
+    @abstractmethod
+    def get_certificate_row(self, inference_id: str) -> Optional[Tuple]:
+        """The current certificate for an inference as a row, or None."""
+
+    @abstractmethod
+    def get_certificate_row_by_hash(self, certificate_hash: str) -> Optional[Tuple]:
+        """
+        The certificate with this content hash as a row, or None. Superseded
+        certificates are found too; they remain valid documents.
+        """
+
+    @abstractmethod
+    def list_certificate_rows(self, limit: int = 100, offset: int = 0) -> List[Tuple]:
+        """Current certificates as rows, newest first."""
+
+    def get_certificate(self, inference_id: str) -> Optional[GreenCertificate]:
+        row = self.get_certificate_row(inference_id)
+        return GreenCertificate(**certificate_object(row)) if row is not None else None
+
+    def list_certificates(self, limit: int = 100, offset: int = 0) -> List[GreenCertificate]:
+        return [GreenCertificate(**certificate_object(row)) for row in self.list_certificate_rows(limit, offset)]
+
+    @abstractmethod
+    def model_emissions(self, model_id: str) -> Dict:
+        """``total_emissions_gco2``, ``avg_emissions_gco2`` and ``inference_count`` for one model."""
+
+    @abstractmethod
+    def iter_certificate_rows(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[Dict]:
+        """
+        Current certificates issued in ``[start, end)``, newest first, as dicts
+        with ``id``, ``inference_id``, ``issued_at``, ``energy_used_kwh``,
+        ``carbon_intensity_gco2_kwh`` and ``total_emissions_gco2``.
+        """
+
+    @abstractmethod
+    def emission_distributions(
+        self,
+        dimension: str,
+        key: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[DDSketch, DDSketch]:
+        """(energy, emissions) sketches for a model, node or region over the hours overlapping ``[start, end)``."""
+
+
+class SQLCertificateStore(CertificateStore):
+    """
+    Certificates in the SQL database, including rotated partitions, and cold
+    archives for exports.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _columns(self):
+        certificates = partitioned(self.db, Certificate.__tablename__)
+        return select(
+            certificates.c.id,
+            certificates.c.inference_id,
+            literal("node-placeholder"), # In real system, join with telemetry -> node
+            null(),
+            certificates.c.issued_at,
+            certificates.c.energy_used_kwh,
+            certificates.c.carbon_intensity_gco2_kwh,
+            certificates.c.total_emissions_gco2,
+            certificates.c.signed_content,
+            certificates.c.certificate_hash
+        ), certificates
+
+    def _rows(self):
+        query, certificates = self._columns()
+        return query.where(certificates.c.superseded_by.is_(None)), certificates
+
+    def store_certificates(self, items: List[Tuple[GreenCertificate, str]]) -> List[GreenCertificate]:
+        stored = {cert.inference_id: cert for cert in store_certificates(self.db, items)}
+        known = [cert.inference_id for cert, _ in items if cert.inference_id not in stored]
+        if known:
+            query, certificates = self._rows()
+            for row in self.db.execute(query.where(certificates.c.inference_id.in_(known))):
+                stored[row[1]] = GreenCertificate(**certificate_object(row))
+        return [stored[cert.inference_id] for cert, _ in items]
+
+    def get_certificate_row(self, inference_id: str) -> Optional[Tuple]:
+        query, certificates = self._rows()
+        return self.db.execute(
+            query.where(certificates.c.inference_id == inference_id).limit(1)
+        ).first()
+
+    def get_certificate_row_by_hash(self, certificate_hash: str) -> Optional[Tuple]:
+        query, certificates = self._columns()
+        return self.db.execute(
+            query.where(certificates.c.certificate_hash == certificate_hash).limit(1)
+        ).first()
+
+    def list_certificate_rows(self, limit: int = 100, offset: int = 0) -> List[Tuple]:
+        query, certificates = self._rows()
+        return self.db.execute(
+            query.order_by(certificates.c.issued_at.desc()).limit(limit).offset(offset)
+        ).all()
+
+    def model_emissions(self, model_id: str) -> Dict:
+        # Telemetry and certificates rotate on different columns, so an
+        # inference's two rows may sit in different months' partitions
+        certificates = partitioned(self.db, Certificate.__tablename__)
+        telemetry = partitioned(self.db, TelemetryEvent.__tablename__)
+        result = self.db.execute(select(
+            func.sum(certificates.c.total_emissions_gco2).label('total_emissions'),
+            func.avg(certificates.c.total_emissions_gco2).label('avg_emissions'),
+            func.count(certificates.c.id).label('inference_count')
+        ).join(
+            telemetry, certificates.c.inference_id == telemetry.c.inference_id
+        ).where(
+            telemetry.c.model_name == model_id,
+            certificates.c.superseded_by.is_(None)
+        )).first()
+        return {
+            "total_emissions_gco2": float(result.total_emissions or 0),
+            "avg_emissions_gco2": float(result.avg_emissions or 0),
+            "inference_count": result.inference_count
+        }
+
+    def iter_certificate_rows(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[Dict]:
+        return iter_certificate_rows(self.db, settings.ARCHIVE_DIR, start, end)
+
+    def emission_distributions(
+        self,
+        dimension: str,
+        key: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[DDSketch, DDSketch]:
+        return merged_sketches(self.db, dimension, key, start, end)
+
+
+def _memory_store() -> CertificateStore:
+    # Imported here: memory_store subclasses CertificateStore
+    from app.services import memory_store
+    return memory_store.memory_store
+
+
+def get_certificate_store(db: Session = Depends(get_db)) -> CertificateStore:
+    """Store for routes that write; the in-memory store when there is no database."""
+    return SQLCertificateStore(db) if db is not None else _memory_store()
+
+
+def get_read_certificate_store(db: Session = Depends(get_read_db)) -> CertificateStore:
+    """Store for read-only routes, on the reader pool where there is one."""
+    return SQLCertificateStore(db) if db is not None else _memory_store()
@@ -1,44 +1,115 @@
-from jose import jwt, jws
 from datetime import datetime, timedelta
-from app.core.config import settings
-import hashlib
+from typing import List
 import json
+from app.core.canonical import canonicalize, digest
+from app.core.config import settings
+from app.models.schemas import TelemetryPayload
+from app.services.issuer_keys import issuer_keyring
+from app.services.node_keys import batch_content, node_keys, signed_content
 
 class CryptoEngine:
     def __init__(self):
+        # Node tokens are only ever checked by us, so they stay HMAC-signed;
+        # certificates are signed with the published issuer keys
         self.secret = settings.SECRET_KEY
         self.algorithm = settings.ALGORITHM
+        self.keyring = issuer_keyring
 
     def sign_certificate(self, payload: dict) -> str:
         """
         Signs a Green Compute Certificate using JWS.
         """
-        # In a real production system, this would use an HSM-backed private key (RSA/ECDSA)
-        # For this v1, we use HS256 with a secret key
-        token = jwt.encode(payload, self.secret, algorithm=self.algorithm)
+        return self.sign_canonical(canonicalize(payload))
+
+    def sign_canonical(self, canonical: bytes) -> str:
+        """
+        Signs canonical JSON bytes (see app.core.canonical) as the JWS payload,
+        so callers that also hash the document serialize it only once.
+        ES256 with the active issuer key; the JWS header names its kid.
+        """
+        _, token = self.keyring.sign(canonical)
         return token
 
+    def verify_canonical(self, token: str) -> bytes:
+        """
+        Verifies an issuer JWS with the published key its kid names and
+        returns the signed canonical bytes. Tokens from before the issuer
+        keys (HS256, no kid) are checked against SECRET_KEY while
+        VERIFY_LEGACY_HS256 is on.
+        """
+        from jose import jws  # Deferred: python-jose pulls in cryptography
+        try:
+            header = jws.get_unverified_header(token)
+            if "kid" not in header and header.get("alg") == "HS256" and settings.VERIFY_LEGACY_HS256:
+                return jws.verify(token, self.secret, algorithms=["HS256"])
+            return self.keyring.verify(token)
+        except Exception as e:
+            raise ValueError(f"Invalid signature: {str(e)}")
+
     def verify_signature(self, token: str) -> dict:
+        """
+        Verifies a certificate signature and returns the signed claims.
+        """
+        return json.loads(self.verify_canonical(token))
+
+    def issue_node_token(self, node_id: str, expires_days: int = None) -> str:
+        """
+        Issues the bearer token a node presents to open a telemetry stream.
+        """
+        expires = datetime.utcnow() + timedelta(days=expires_days or settings.NODE_TOKEN_EXPIRE_DAYS)
+        claims = {"sub": node_id, "scope": "telemetry", "exp": expires}
+        from jose import jwt
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm)
+
+    def verify_node_token(self, token: str) -> str:
+        """
+        Returns the node ID a token was issued to.
+        """
+        from jose import jwt  # Deferred: python-jose pulls in cryptography
         try:
-            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
-            return payload
+            claims = jwt.decode(token, self.secret, algorithms=[self.algorithm])
         except Exception as e:
             raise ValueError(f"Invalid signature: {str(e)}")
+        if claims.get("scope") != "telemetry" or not claims.get("sub"):
+            raise ValueError("Invalid signature: not a node token")
+        return claims["sub"]
 
     def hash_content(self, content: dict) -> str:
         """
         Creates a canonical hash of the content
         """
-        canonical_json = json.dumps(content, sort_keys=True)
-        return hashlib.sha256(canonical_json.encode()).hexdigest()
+        return digest(canonicalize(content))
 
-    def verify_agent_signature(self, payload: dict, signature: str, public_key: str) -> bool:
+    def verify_agent_signature(self, payload: TelemetryPayload) -> bool:
         """
-        Verifies the signature from the Telemetry Agent (TPM signed).
-        For v1, we assume the agent signs the hash of the payload.
+        Verifies the Telemetry Agent's signature of one payload against the
+        node's registered Ed25519 or P-256 key.
         """
-        # Placeholder for actual TPM signature verification (e.g. using tpm2-pytss or openssl)
-        # Here we just check if signature exists for the demo
-        return True if signature else False
+        try:
+            content = signed_content(payload)
+        except (TypeError, ValueError):
+            return False
+        valid = node_keys.verify(payload.node_id, content, payload.signature)
+        return self._unregistered_node(payload.signature) if valid is None else valid
+
+    def verify_agent_batch(self, payloads: List[TelemetryPayload], signature: str) -> bool:
+        """
+        Verifies one agent signature over a whole batch. The payloads must
+        all come from the same node.
+        """
+        node_ids = {payload.node_id for payload in payloads}
+        if len(node_ids) != 1:
+            return False
+        try:
+            content = batch_content(payloads)
+        except (TypeError, ValueError):
+            return False
+        valid = node_keys.verify(node_ids.pop(), content, signature)
+        return self._unregistered_node(signature) if valid is None else valid
+
+    def _unregistered_node(self, signature: str) -> bool:
+        # Nodes without a registered key keep the demo behaviour: any
+        # signature is accepted, unless registration is required
+        return bool(signature) and not settings.REQUIRE_NODE_KEYS
 
 crypto_engine = CryptoEngine()
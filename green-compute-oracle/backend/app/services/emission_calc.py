@@ -6,4 +6,15 @@ class EmissionCalculator:
         """
         return energy_kwh * carbon_intensity_gco2_kwh
 
+    @staticmethod
+    def calculate_emissions_batch(energy_kwh, carbon_intensity_gco2_kwh):
+        """
+        Vectorized form of calculate_emissions over NumPy arrays (gCO2 per row).
+        """
+        import numpy as np
+        return np.multiply(
+            np.asarray(energy_kwh, dtype=np.float64),
+            np.asarray(carbon_intensity_gco2_kwh, dtype=np.float64)
+        )
+
 emission_calculator = EmissionCalculator()
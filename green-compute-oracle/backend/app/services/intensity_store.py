@@ -0,0 +1,306 @@
+"""
+Per-region carbon intensity history.
+
+Recent observations are kept in compact ``array('d')`` columns so that pricing
+an inference at its own timestamp is a bisection plus a linear interpolation.
+Lookups the in-memory window cannot answer (older than it, or in a gap)
+fall through to the ``carbon_intensity_history`` table.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.models.orm import CarbonIntensityRecord
+
+logger = logging.getLogger(__name__)
+
+# Source of the CarbonOracle's regional averages. They are estimates, not
+# observations, so they are never history; rows stored with this source by
+# earlier versions are ignored.
+FALLBACK_SOURCE = "regional_average"
+
+
+def to_epoch(timestamp: datetime) -> float:
+    """Seconds since the epoch; naive datetimes are treated as UTC."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def to_naive_utc(timestamp: datetime) -> datetime:
+    """Normalizes a datetime to the naive-UTC form stored in the database."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _observed():
+    """Filter for history rows that are provider observations."""
+    return or_(CarbonIntensityRecord.source.is_(None), CarbonIntensityRecord.source != FALLBACK_SOURCE)
+
+
+class _RegionSeries:
+    """Time-sorted observations for one region."""
+    __slots__ = ("times", "values", "sources")
+
+    def __init__(self):
+        self.times = array("d")
+        self.values = array("d")
+        self.sources = array("B")
+
+
+class IntensityStore:
+    """
+    Time-indexed carbon intensity history, filled by the CarbonOracle.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 7 * 24 * 3600,
+        max_points: int = 50_000,
+        max_gap_seconds: float = 15 * 60,
+    ):
+        # How much history stays in memory per region
+        self.window_seconds = window_seconds
+        self.max_points = max_points
+        # A lookup is only answered if an observation lies within this distance
+        self.max_gap_seconds = max_gap_seconds
+
+        self._series: Dict[str, _RegionSeries] = {}
+        self._source_names: List[str] = []
+        self._source_codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _source_code(self, source: str) -> int:
+        code = self._source_codes.get(source)
+        if code is None:
+            code = len(self._source_names)
+            self._source_names.append(source)
+            self._source_codes[source] = code
+        return code
+
+    def record(
+        self,
+        region: str,
+        timestamp: datetime,
+        intensity: float,
+        source: str = "unknown",
+        db: Optional[Session] = None,
+    ) -> None:
+        """
+        Adds an observation to the in-memory window and, if a session is given,
+        persists it to the history table. Regional averages are not recorded.
+        """
+        if source == FALLBACK_SOURCE:
+            return
+        t = to_epoch(timestamp)
+        with self._lock:
+            series = self._series.setdefault(region, _RegionSeries())
+            code = self._source_code(source)
+
+            # Observations almost always arrive in order, so this is an append
+            i = bisect_right(series.times, t)
+            if i == len(series.times):
+                series.times.append(t)
+                series.values.append(intensity)
+                series.sources.append(code)
+            else:
+                series.times.insert(i, t)
+                series.values.insert(i, intensity)
+                series.sources.insert(i, code)
+
+            # Trim to the configured window
+            cutoff = series.times[-1] - self.window_seconds
+            drop = max(bisect_left(series.times, cutoff), len(series.times) - self.max_points)
+            if drop > 0:
+                del series.times[:drop]
+                del series.values[:drop]
+                del series.sources[:drop]
+
+        if db is not None:
+            try:
+                db.add(CarbonIntensityRecord(
+                    region=region,
+                    timestamp=to_naive_utc(timestamp),
+                    intensity_gco2_kwh=intensity,
+                    source=source,
+                ))
+                db.commit()
+            except Exception as e:
+                logger.error(f"Error storing carbon intensity history: {e}")
+                db.rollback()
+
+    def lookup(
+        self,
+        region: str,
+        timestamp: datetime,
+        db: Optional[Session] = None,
+    ) -> Optional[Tuple[float, str]]:
+        """
+        Returns ``(intensity, source)`` at ``timestamp``, interpolating between
+        neighbouring observations, or None if nothing close enough is known.
+        """
+        t = to_epoch(timestamp)
+        known = None
+        with self._lock:
+            series = self._series.get(region)
+            if series is not None and series.times and t >= series.times[0]:
+                known = self._interpolate(
+                    t,
+                    self._neighbour(series, bisect_right(series.times, t) - 1),
+                    self._neighbour(series, bisect_left(series.times, t)),
+                )
+
+        # Observations persisted by other workers may fill gaps in this one's window
+        if known is not None or db is None:
+            return known
+        return self._lookup_db(region, timestamp, t, db)
+
+    def latest(self, region: str) -> Optional[float]:
+        """Most recent in-memory observation for a region, if any."""
+        with self._lock:
+            series = self._series.get(region)
+            if series is None or not series.values:
+                return None
+            return series.values[-1]
+
+    def _neighbour(self, series: _RegionSeries, i: int) -> Optional[Tuple[float, float, str]]:
+        if i < 0 or i >= len(series.times):
+            return None
+        return series.times[i], series.values[i], self._source_names[series.sources[i]]
+
+    def _interpolate(
+        self,
+        t: float,
+        before: Optional[Tuple[float, float, str]],
+        after: Optional[Tuple[float, float, str]],
+    ) -> Optional[Tuple[float, str]]:
+        if before is not None and t - before[0] > self.max_gap_seconds:
+            before = None
+        if after is not None and after[0] - t > self.max_gap_seconds:
+            after = None
+
+        if before is None and after is None:
+            return None
+        if after is None:
+            return before[1], before[2]
+        if before is None or after[0] == before[0]:
+            return after[1], after[2]
+
+        weight = (t - before[0]) / (after[0] - before[0])
+        intensity = before[1] + weight * (after[1] - before[1])
+        source = before[2] if weight < 0.5 else after[2]
+        return intensity, source
+
+    def _lookup_db(
+        self,
+        region: str,
+        timestamp: datetime,
+        t: float,
+        db: Session,
+    ) -> Optional[Tuple[float, str]]:
+        at = to_naive_utc(timestamp)
+        try:
+            before = db.query(CarbonIntensityRecord).filter(
+                CarbonIntensityRecord.region == region,
+                CarbonIntensityRecord.timestamp <= at,
+                _observed(),
+            ).order_by(CarbonIntensityRecord.timestamp.desc()).first()
+            after = db.query(CarbonIntensityRecord).filter(
+                CarbonIntensityRecord.region == region,
+                CarbonIntensityRecord.timestamp >= at,
+                _observed(),
+            ).order_by(CarbonIntensityRecord.timestamp.asc()).first()
+        except Exception as e:
+            logger.error(f"Error reading carbon intensity history: {e}")
+            db.rollback()
+            return None
+
+        def as_point(row):
+            if row is None:
+                return None
+            return to_epoch(row.timestamp), row.intensity_gco2_kwh, row.source or "unknown"
+
+        return self._interpolate(t, as_point(before), as_point(after))
+
+    def lookup_many(self, region: str, epochs, db: Optional[Session] = None):
+        """
+        Vectorized lookup for many timestamps (seconds since the epoch).
+        Returns a float64 NumPy array with NaN where no observation is close enough.
+        """
+        import numpy as np
+
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if epochs.size == 0:
+            return np.empty(0, dtype=np.float64)
+
+        with self._lock:
+            series = self._series.get(region)
+            times = np.array(series.times if series else (), dtype=np.float64)
+            values = np.array(series.values if series else (), dtype=np.float64)
+
+        # Pull persisted observations when the request reaches past the memory window
+        lo, hi = float(epochs.min()), float(epochs.max())
+        if db is not None and (times.size == 0 or lo < times[0]):
+            db_times, db_values = self._load_db_range(region, lo - self.max_gap_seconds, hi + self.max_gap_seconds, db)
+            if db_times.size:
+                times = np.concatenate([db_times, times])
+                values = np.concatenate([db_values, values])
+                order = np.argsort(times, kind="stable")
+                times, values = times[order], values[order]
+
+        result = np.full(epochs.shape, np.nan, dtype=np.float64)
+        if times.size == 0:
+            return result
+
+        after = np.searchsorted(times, epochs, side="left")
+        before = np.searchsorted(times, epochs, side="right") - 1
+        has_before = before >= 0
+        has_after = after < times.size
+        before_c = np.clip(before, 0, times.size - 1)
+        after_c = np.clip(after, 0, times.size - 1)
+
+        near_before = has_before & (epochs - times[before_c] <= self.max_gap_seconds)
+        near_after = has_after & (times[after_c] - epochs <= self.max_gap_seconds)
+
+        span = times[after_c] - times[before_c]
+        weight = np.divide(epochs - times[before_c], span, out=np.zeros_like(epochs), where=span > 0)
+        interpolated = values[before_c] + weight * (values[after_c] - values[before_c])
+
+        both = near_before & near_after
+        result[both] = interpolated[both]
+        only_before = near_before & ~near_after
+        result[only_before] = values[before_c][only_before]
+        only_after = near_after & ~near_before
+        result[only_after] = values[after_c][only_after]
+        return result
+
+    def _load_db_range(self, region: str, start: float, end: float, db: Session):
+        import numpy as np
+
+        try:
+            rows = db.query(
+                CarbonIntensityRecord.timestamp,
+                CarbonIntensityRecord.intensity_gco2_kwh
+            ).filter(
+                CarbonIntensityRecord.region == region,
+                CarbonIntensityRecord.timestamp >= datetime.utcfromtimestamp(start),
+                CarbonIntensityRecord.timestamp <= datetime.utcfromtimestamp(end),
+                _observed(),
+            ).order_by(CarbonIntensityRecord.timestamp.asc()).all()
+        except Exception as e:
+            logger.error(f"Error reading carbon intensity history: {e}")
+            db.rollback()
+            rows = []
+
+        times = np.fromiter((to_epoch(r[0]) for r in rows), dtype=np.float64, count=len(rows))
+        values = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+        return times, values
+
+# Global instance
+intensity_store = IntensityStore()
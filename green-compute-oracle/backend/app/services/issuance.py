@@ -0,0 +1,90 @@
+"""
+Certificate issuance pipeline shared by the single and batch telemetry routes.
+"""
+from typing import Optional
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.core.canonical import canonicalize, digest
+from app.models.schemas import TelemetryPayload, GreenCertificate
+from app.services.carbon_oracle import carbon_oracle
+from app.services.emission_calc import emission_calculator
+from app.services.crypto_engine import crypto_engine
+from app.services.verifiable_credentials import vc_engine
+
+
+class InvalidAgentSignature(ValueError):
+    """Raised when telemetry fails agent signature verification."""
+
+
+async def issue_certificate(
+    payload: TelemetryPayload,
+    db: Optional[Session] = None,
+    read_db: Optional[Session] = None,
+    signature_verified: bool = False
+) -> GreenCertificate:
+    """
+    Verifies signed telemetry, prices it at its own timestamp and returns a
+    signed Green Compute Certificate. Storing the certificate is up to the caller.
+    Pass ``signature_verified`` when the payload's batch signature was
+    already checked.
+    """
+    # 1. Verify Agent Signature (TPM/TEE) against the node's registered key
+    if not signature_verified and not crypto_engine.verify_agent_signature(payload):
+        raise InvalidAgentSignature("Invalid Agent Signature")
+
+    # 2. Fetch Carbon Intensity at the time the energy was used
+    # We assume the node region is known or passed. For now, default to 'us-east'
+    region = "us-east"
+    carbon_data = await carbon_oracle.get_intensity_at(region, payload.timestamp, db, read_db)
+
+    # 3. Compute Emissions
+    total_emissions = emission_calculator.calculate_emissions(
+        payload.energy_kwh,
+        carbon_data.intensity
+    )
+
+    # 4. Generate Certificate ID
+    cert_id = str(uuid.uuid4())
+
+    # 5. Generate W3C Verifiable Credential
+    vc = vc_engine.create_vc(
+        certificate_id=cert_id,
+        inference_id=payload.inference_id,
+        hardware_id=payload.node_id,
+        timestamp=payload.timestamp,
+        energy_kwh=payload.energy_kwh,
+        carbon_intensity=carbon_data.intensity,
+        total_emissions=total_emissions,
+        carbon_source=carbon_data.source
+    )
+
+    # 6. Sign VC
+    signed_vc = vc_engine.sign_vc(vc)
+
+    # 7. Also create legacy JWS certificate for backward compatibility
+    cert_data = {
+        "certificate_id": cert_id,
+        "inference_id": payload.inference_id,
+        "hardware_id": payload.node_id,
+        "timestamp": payload.timestamp.isoformat(),
+        "energy_used_kwh": payload.energy_kwh,
+        "carbon_intensity_gco2_kwh": carbon_data.intensity,
+        "total_emissions_gco2": total_emissions,
+        "issuer": "Verifiable Green Compute Oracle",
+        "w3c_vc": signed_vc  # Embed VC in legacy format
+    }
+
+    # Canonicalize once: the same bytes are signed and content-addressed. The
+    # payload includes the random certificate ID and the VC's issuance date,
+    # so the hash identifies this issuance, not the telemetry it prices
+    canonical = canonicalize(cert_data)
+    signature = crypto_engine.sign_canonical(canonical)
+
+    return GreenCertificate(
+        **{k: v for k, v in cert_data.items() if k != "w3c_vc"},
+        model_id=payload.model_id,
+        signature=signature,
+        certificate_hash=digest(canonical)
+    )
@@ -0,0 +1,229 @@
+"""
+Issuer signing keys, published so credentials can be verified offline.
+
+Certificates and credentials are signed with ES256 (ECDSA P-256) keys kept
+as PEM files in ``ISSUER_KEY_DIR``. The newest key signs unless
+``ISSUER_KEY_ID`` pins another one. Every key in the directory stays
+published in the JWKS and the did:web document, so credentials signed before
+a rotation keep verifying. Workers rescan the directory at most every
+``RESCAN_SECONDS``, so a key added by ``rotate_issuer_key.py`` is published and
+used without a restart. Key IDs are RFC 7638 thumbprints, so every worker
+and replica derives the same ``kid`` for the same key.
+
+Verification resolves the JWS ``kid`` against the parsed public keys held
+here; nothing is fetched over the network.
+"""
+from typing import Dict, List, Tuple
+import base64
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+
+from app.core.canonical import canonicalize, digest
+from app.core.config import settings
+
+ALGORITHM = "ES256"
+
+KEY_FILE = "issuer-key-{:04d}.pem"
+_KEY_FILE_NUMBER = re.compile(r"issuer-key-(\d+)\.pem$")
+
+RESCAN_SECONDS = 60
+
+
+def thumbprint(public_jwk: Dict) -> str:
+    """RFC 7638 JWK thumbprint of an EC public key, used as its ``kid``."""
+    members = {name: public_jwk[name] for name in ("crv", "kty", "x", "y")}
+    return base64.urlsafe_b64encode(hashlib.sha256(canonicalize(members)).digest()).rstrip(b"=").decode()
+
+
+class IssuerKeyring:
+    """
+    The issuer's signing keys and a cache of parsed public keys by ``kid``.
+    Keys are loaded (or the first one generated) on first use; RuntimeError
+    if a key has to be generated and the key directory is not writable.
+    """
+
+    def __init__(self, key_dir: str, active_kid: str = ""):
+        self.key_dir = key_dir
+        self.active_kid = active_kid
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._scanned_at = 0.0
+        self._missed_at = -RESCAN_SECONDS  # monotonic time of the last rescan for an unknown kid
+        self._files = set()
+        self._private = {}  # kid -> jose key
+        self._public = {}  # kid -> jose key, including keys imported from JWKS documents
+        self._published = []  # (kid, public JWK), oldest first
+        self._documents = {}
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            self._read_key_files()
+            if not self._private:
+                self._create_key()
+            self._loaded = True
+
+    def _refresh(self) -> None:
+        self.load()
+        if time.monotonic() - self._scanned_at > RESCAN_SECONDS:
+            with self._lock:
+                self._read_key_files()
+
+    def _read_key_files(self) -> None:
+        self._scanned_at = time.monotonic()
+        for path in sorted(glob.glob(os.path.join(self.key_dir, "issuer-key-*.pem"))):
+            if path not in self._files:
+                with open(path, "rb") as f:
+                    self._add_private_key(f.read())
+                self._files.add(path)
+
+    def _add_private_key(self, pem: bytes) -> str:
+        from jose import jwk  # Deferred: python-jose pulls in cryptography
+        key = jwk.construct(pem, ALGORITHM)
+        public = key.public_key()
+        public_jwk = public.to_dict()
+        kid = thumbprint(public_jwk)
+        if kid not in self._private:
+            self._private[kid] = key
+            self._public[kid] = public
+            self._published.append((kid, {**public_jwk, "kid": kid, "use": "sig"}))
+            self._documents.clear()
+        return kid
+
+    def _create_key(self) -> str:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        numbers = [int(m.group(1)) for m in map(_KEY_FILE_NUMBER.search, self._files) if m]
+        path = os.path.join(self.key_dir, KEY_FILE.format(max(numbers, default=0) + 1))
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.key_dir, exist_ok=True)
+            with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+                f.write(pem)
+            os.link(temp_path, path)
+        except OSError as e:
+            if not os.path.isfile(path):
+                # A key that is not persisted is never published, and nothing
+                # it signs could be verified elsewhere or after a restart
+                raise RuntimeError(f"Cannot create an issuer key in {self.key_dir}: {e}") from e
+            # Linking fails if the name is taken: when workers race to create
+            # a key, one wins and the rest load it, never a partial file
+            self._read_key_files()
+            return self._signing_kid()
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        self._files.add(path)
+        return self._add_private_key(pem)
+
+    def rotate(self) -> str:
+        """
+        Generates and persists a new key and returns its ``kid``. It signs
+        from now on unless ``active_kid`` pins an older key; the old keys stay
+        published.
+        """
+        with self._lock:
+            self.load()
+            self._read_key_files()
+            return self._create_key()
+
+    def _signing_kid(self) -> str:
+        if self.active_kid in self._private:
+            return self.active_kid
+        return self._published[-1][0]
+
+    def sign(self, payload: bytes) -> Tuple[str, str]:
+        """Signs a payload as a compact JWS with a ``kid`` header; returns (kid, token)."""
+        from jose import jws
+        self._refresh()
+        kid = self._signing_kid()
+        return kid, jws.sign(payload, self._private[kid], headers={"kid": kid}, algorithm=ALGORITHM)
+
+    def resolve(self, kid: str):
+        """
+        The public key for a ``kid``, or None. An unknown kid triggers a rescan
+        of the key directory, in case another process rotated, at most every
+        ``RESCAN_SECONDS`` so forged kids cannot keep the directory busy.
+        """
+        self.load()
+        key = self._public.get(kid)
+        if key is None and time.monotonic() - self._missed_at >= RESCAN_SECONDS:
+            with self._lock:
+                self._missed_at = time.monotonic()
+                self._read_key_files()
+                key = self._public.get(kid)
+        return key
+
+    def verify(self, token: str) -> bytes:
+        """Verifies a JWS against the cached key its ``kid`` names and returns the payload."""
+        from jose import jws
+        kid = jws.get_unverified_header(token).get("kid")
+        key = self.resolve(kid) if kid else None
+        if key is None:
+            raise ValueError(f"Unknown signing key: {kid}")
+        return jws.verify(token, key, algorithms=[ALGORITHM])
+
+    def add_jwks(self, jwks: Dict) -> List[str]:
+        """
+        Trusts the public keys of a JWKS document (e.g. another oracle's), for
+        verification only. Returns their kids.
+        """
+        from jose import jwk
+        kids = []
+        with self._lock:
+            for public_jwk in jwks.get("keys", []):
+                if public_jwk.get("kty") != "EC" or public_jwk.get("crv") != "P-256":
+                    continue
+                kid = thumbprint(public_jwk)
+                if public_jwk.get("kid", kid) != kid:
+                    raise ValueError(f"kid {public_jwk['kid']} does not match its key")
+                self._public.setdefault(kid, jwk.construct(public_jwk, ALGORITHM))
+                kids.append(kid)
+        return kids
+
+    def jwks(self) -> Dict:
+        """The published keys as a JWK Set."""
+        self.load()
+        return {"keys": [public_jwk for _, public_jwk in self._published]}
+
+    def did_document(self, did: str) -> Dict:
+        """A did:web document listing the published keys as JsonWebKey2020 methods."""
+        self.load()
+        methods = [
+            {"id": f"{did}#{kid}", "type": "JsonWebKey2020", "controller": did, "publicKeyJwk": public_jwk}
+            for kid, public_jwk in self._published
+        ]
+        return {
+            "@context": ["https://www.w3.org/ns/did/v1", "https://w3id.org/security/suites/jws-2020/v1"],
+            "id": did,
+            "verificationMethod": methods,
+            "assertionMethod": [method["id"] for method in methods]
+        }
+
+    def document(self, name: str, did: str = "") -> Tuple[bytes, str]:
+        """
+        ``"jwks"`` or ``"did"`` as canonical JSON bytes and a strong ETag,
+        cached until the published keys change.
+        """
+        with self._lock:
+            self._refresh()
+            cached = self._documents.get((name, did))
+            if cached is None:
+                content = canonicalize(self.jwks() if name == "jwks" else self.did_document(did))
+                cached = self._documents[(name, did)] = (content, f'"{digest(content)}"')
+            return cached
+
+
+# Global instance
+issuer_keyring = IssuerKeyring(settings.ISSUER_KEY_DIR, settings.ISSUER_KEY_ID)
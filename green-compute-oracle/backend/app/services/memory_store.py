@@ -0,0 +1,287 @@
+"""
+In-memory columnar certificate store for running without a database.
+
+When the database is unavailable (demo mode, edge sites) certificates are
+kept in typed ``array`` columns instead of being discarded: one machine
+float per number, and the model, node and region of each row as a 4-byte
+code into a shared string table, so a repeated ID is held once however many
+certificates carry it. Aggregation, export and percentile queries view the
+columns as NumPy arrays without copying them.
+
+With ``MEMORY_STORE_SNAPSHOT`` set, every stored batch is also appended to
+that file as JSON lines and replayed on first use, so a restart keeps its
+certificates. The file is only ever appended to; a line torn by a crash is
+cut off when the file is next loaded.
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+
+from app.core.config import settings
+from app.models.schemas import GreenCertificate
+from app.services.broadcast import broadcast_hub
+from app.services.certificate_store import CertificateStore, certificate_object
+from app.services.intensity_store import to_naive_utc
+from app.services.sketches import DDSketch, hour_bucket
+from app.services.storage import GRID_REGION, certificate_hash
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+_NO_STRING = -1  # Code for a missing (None) string
+
+
+def _epoch(timestamp: datetime) -> float:
+    return (to_naive_utc(timestamp) - _EPOCH).total_seconds()
+
+
+def _datetime(seconds: float) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+class MemoryCertificateStore(CertificateStore):
+    """
+    Certificates held in process memory, one column per field, in the order
+    they were stored (which is the order they were issued). The agent's raw
+    telemetry signature is not kept.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.RLock()
+        self._loaded = False
+
+        # Interned model, node and region IDs
+        self._strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+        self._model = array("i")
+        self._node = array("i")
+        self._region = array("i")
+        self._timestamp = array("d")  # Inference time, seconds since the epoch (UTC)
+        self._issued_at = array("d")
+        self._energy = array("d")
+        self._intensity = array("d")
+        self._emissions = array("d")
+        self._certificate_ids: List[str] = []
+        self._inference_ids: List[str] = []
+        self._signatures: List[str] = []
+        self._hashes: List[str] = []
+        self._rows: Dict[str, int] = {}  # inference_id -> row
+        self._rows_by_hash: Dict[str, int] = {}
+        self._count = 0  # Rows whose columns are all appended; readers do not lock
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return self._count
+
+    def store_certificates(self, items: List[Tuple[GreenCertificate, str]]) -> List[GreenCertificate]:
+        self._ensure_loaded()
+        issued_at = _epoch(datetime.utcnow())
+        held = []
+        stored = []
+        records = []
+        with self._lock:
+            for cert_data, _ in items:
+                row = self._rows.get(cert_data.inference_id)
+                if row is not None:
+                    held.append(GreenCertificate(**certificate_object(self._row(row))))
+                    continue
+                record = [
+                    cert_data.certificate_id,
+                    cert_data.inference_id,
+                    cert_data.model_id,
+                    cert_data.hardware_id,
+                    GRID_REGION,
+                    _epoch(cert_data.timestamp),
+                    issued_at,
+                    cert_data.energy_used_kwh,
+                    cert_data.carbon_intensity_gco2_kwh,
+                    cert_data.total_emissions_gco2,
+                    cert_data.signature,
+                    certificate_hash(cert_data),
+                ]
+                self._append(record)
+                records.append(record)
+                stored.append(cert_data)
+                held.append(cert_data)
+            # Written under the lock so the file keeps the column order
+            if records and self.snapshot_path:
+                with open(self.snapshot_path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+        try:
+            broadcast_hub.publish_certificates(stored)
+        except Exception as e:
+            logger.error(f"Could not publish stored certificates: {e}")
+        return held
+
+    def get_certificate_row(self, inference_id: str) -> Optional[Tuple]:
+        self._ensure_loaded()
+        row = self._rows.get(inference_id)
+        return self._row(row) if row is not None else None
+
+    def get_certificate_row_by_hash(self, certificate_hash: str) -> Optional[Tuple]:
+        self._ensure_loaded()
+        row = self._rows_by_hash.get(certificate_hash)
+        return self._row(row) if row is not None else None
+
+    def list_certificate_rows(self, limit: int = 100, offset: int = 0) -> List[Tuple]:
+        self._ensure_loaded()
+        newest = len(self) - 1 - offset
+        return [self._row(row) for row in range(newest, max(newest - limit, -1), -1)]
+
+    def model_emissions(self, model_id: str) -> Dict:
+        self._ensure_loaded()
+        total, count = 0.0, 0
+        code = self._codes.get(model_id)
+        if code is not None:
+            import numpy as np
+            with self._lock:
+                mask = self._view(self._model, np.int32) == code
+                count = int(mask.sum())
+                total = float(self._view(self._emissions, np.float64)[mask].sum())
+        return {
+            "total_emissions_gco2": total,
+            "avg_emissions_gco2": total / count if count else 0.0,
+            "inference_count": count
+        }
+
+    def iter_certificate_rows(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[Dict]:
+        self._ensure_loaded()
+        import numpy as np
+        with self._lock:
+            issued_at = self._view(self._issued_at, np.float64)
+            mask = np.ones(issued_at.size, dtype=bool)
+            if start is not None:
+                mask &= issued_at >= _epoch(start)
+            if end is not None:
+                mask &= issued_at < _epoch(end)
+            rows = np.flatnonzero(mask)[::-1].tolist()
+            del issued_at
+
+        for row in rows:
+            yield {
+                "id": self._certificate_ids[row],
+                "inference_id": self._inference_ids[row],
+                "issued_at": _datetime(self._issued_at[row]),
+                "energy_used_kwh": self._energy[row],
+                "carbon_intensity_gco2_kwh": self._intensity[row],
+                "total_emissions_gco2": self._emissions[row],
+            }
+
+    def emission_distributions(
+        self,
+        dimension: str,
+        key: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[DDSketch, DDSketch]:
+        self._ensure_loaded()
+        code = self._codes.get(key)
+        if code is None:
+            return DDSketch(), DDSketch()
+
+        import numpy as np
+        column = {"model": self._model, "node": self._node, "region": self._region}[dimension]
+        with self._lock:
+            timestamp = self._view(self._timestamp, np.float64)
+            mask = self._view(column, np.int32) == code
+            # Whole hours, like the hourly sketches the SQL store merges
+            if start is not None:
+                mask &= timestamp >= _epoch(hour_bucket(start))
+            if end is not None:
+                end_bucket = hour_bucket(end)
+                if end_bucket < to_naive_utc(end):
+                    end_bucket += timedelta(hours=1)
+                mask &= timestamp < _epoch(end_bucket)
+            energy = self._view(self._energy, np.float64)[mask]
+            emissions = self._view(self._emissions, np.float64)[mask]
+            del timestamp
+        return DDSketch.from_values(energy), DDSketch.from_values(emissions)
+
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def _string(self, code: int) -> Optional[str]:
+        return self._strings[code] if code != _NO_STRING else None
+
+    def _append(self, record: list) -> None:
+        (certificate_id, inference_id, model_id, node_id, region, timestamp,
+         issued_at, energy, intensity, emissions, signature, content_hash) = record
+        row = self._count
+        self._certificate_ids.append(certificate_id)
+        self._inference_ids.append(inference_id)
+        self._signatures.append(signature)
+        self._hashes.append(content_hash)
+        self._model.append(self._intern(model_id))
+        self._node.append(self._intern(node_id))
+        self._region.append(self._intern(region))
+        self._timestamp.append(timestamp)
+        self._issued_at.append(issued_at)
+        self._energy.append(energy)
+        self._intensity.append(intensity)
+        self._emissions.append(emissions)
+        # Published once every column has the row, so lock-free readers never see it half-written
+        self._count = row + 1
+        self._rows[inference_id] = row
+        self._rows_by_hash[content_hash] = row
+
+    def _row(self, row: int) -> Tuple:
+        return (
+            self._certificate_ids[row],
+            self._inference_ids[row],
+            self._string(self._node[row]),
+            self._string(self._model[row]),
+            _datetime(self._issued_at[row]),
+            self._energy[row],
+            self._intensity[row],
+            self._emissions[row],
+            self._signatures[row],
+            self._hashes[row],
+        )
+
+    @staticmethod
+    def _view(column: array, dtype):
+        # Zero-copy; an array cannot grow while a view exists, so views
+        # are only taken, and must be dropped, under the lock
+        import numpy as np
+        return np.frombuffer(column, dtype=dtype)
+
+    def _ensure_loaded(self) -> None:
+        """Replays the snapshot file once, cutting off a torn last line."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.snapshot_path and os.path.exists(self.snapshot_path):
+                valid_size = 0
+                with open(self.snapshot_path, "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        valid_size += len(line)
+                        record = json.loads(line)
+                        if record[1] not in self._rows:
+                            self._append(record)
+                if os.path.getsize(self.snapshot_path) > valid_size:
+                    os.truncate(self.snapshot_path, valid_size)
+            self._loaded = True
+
+
+# Global instance
+memory_store = MemoryCertificateStore(settings.MEMORY_STORE_SNAPSHOT or None)
@@ -0,0 +1,110 @@
+"""
+Agent public keys, for verifying signed telemetry.
+
+Each node's public key is a PEM file ``NODE_KEY_DIR/<node_id>.pem`` (the
+``<key>.pub`` an agent writes on first start), Ed25519 or ECDSA P-256.
+Keys are parsed once and cached; a node without a key is looked up again at
+most every ``RESCAN_SECONDS``, so registering a node needs no restart.
+
+Agents sign either each payload or a whole batch (see agent/signer.py). A
+payload signature covers the payload's canonical JSON without ``signature``.
+A batch signature covers the canonical JSON array of those payloads' hex
+SHA-256 digests, in batch order. The canonical JSON is built from the fields
+as received, not from the parsed payload, since parsing normalizes values
+(e.g. a ``+00:00`` offset becomes ``Z``) and drops unknown fields.
+"""
+from typing import List, Optional
+import hashlib
+import os
+import re
+import threading
+import time
+
+from app.core.canonical import canonicalize
+from app.core.config import settings
+from app.models.schemas import TelemetryPayload
+
+RESCAN_SECONDS = 60
+
+_NODE_ID = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+def signed_content(payload: TelemetryPayload) -> bytes:
+    """
+    The bytes an agent signs for one payload. Raises TypeError or ValueError
+    if the received fields are not plain JSON values.
+    """
+    fields = getattr(payload, "_received", None)
+    if fields is None:  # Built in process rather than received
+        fields = payload.model_dump(mode="json", exclude_none=True)
+    return canonicalize({name: value for name, value in fields.items() if name != "signature"})
+
+
+def batch_content(payloads: List[TelemetryPayload]) -> bytes:
+    """The bytes an agent signs for a batch of payloads."""
+    return canonicalize([hashlib.sha256(signed_content(payload)).hexdigest() for payload in payloads])
+
+
+class NodeKeyRegistry:
+    """
+    Registered agent public keys by node ID.
+    """
+
+    def __init__(self, key_dir: str):
+        self.key_dir = key_dir
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._missing = {}  # node_id -> monotonic time of the last lookup that found nothing
+
+    def get(self, node_id: str):
+        """The node's public key, or None if it has none registered."""
+        key = self._keys.get(node_id)
+        if key is not None or not _NODE_ID.match(node_id):
+            return key
+        if time.monotonic() - self._missing.get(node_id, -RESCAN_SECONDS) < RESCAN_SECONDS:
+            return None
+
+        path = os.path.join(self.key_dir, f"{node_id}.pem")
+        try:
+            with open(path, "rb") as f:
+                pem = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._missing[node_id] = time.monotonic()
+            return None
+
+        # Deferred: cryptography is only needed once a node has a key
+        from cryptography.hazmat.primitives.serialization import load_pem_public_key
+        key = load_pem_public_key(pem)
+        with self._lock:
+            self._keys[node_id] = key
+            self._missing.pop(node_id, None)
+        return key
+
+    def verify(self, node_id: str, content: bytes, signature: str) -> Optional[bool]:
+        """
+        Whether ``signature`` (hex; DER for ECDSA) is the node's signature of
+        ``content``. None if the node has no registered key.
+        """
+        key = self.get(node_id)
+        if key is None:
+            return None
+
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+        try:
+            raw = bytes.fromhex(signature)
+            if isinstance(key, ed25519.Ed25519PublicKey):
+                key.verify(raw, content)
+            elif isinstance(key, ec.EllipticCurvePublicKey):
+                key.verify(raw, content, ec.ECDSA(hashes.SHA256()))
+            else:
+                return False
+        except (InvalidSignature, ValueError):
+            return False
+        return True
+
+
+# Global instance
+node_keys = NodeKeyRegistry(settings.NODE_KEY_DIR)
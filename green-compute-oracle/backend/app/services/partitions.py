@@ -0,0 +1,353 @@
+"""
+Time-based partitioning and cold archival for telemetry and certificates.
+
+Postgres uses native declarative range partitions (see schema.sql); this module
+only creates monthly partitions ahead of time, and for months that have rows
+in the default partition. SQLite has no partitioning, so completed months are
+rotated out of the hot tables into per-month tables (``certificates_p202501``);
+``partitioned`` gives queries the hot table and its partitions as one, as
+Postgres does natively. The retention job writes partitions older than the
+retention window to gzip'd JSON-lines archives and drops them.
+``iter_certificate_rows`` also reads the archives that overlap a time range,
+so exports see the full history.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+import gzip
+import json
+import logging
+import os
+import re
+
+from sqlalchemy import Column, MetaData, Table, delete, inspect, insert, select, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import FromClause
+
+from app.models.orm import Certificate, TelemetryEvent
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables and the column they are partitioned on
+PARTITIONED_TABLES: Dict[str, Tuple[Table, str]] = {
+    TelemetryEvent.__tablename__: (TelemetryEvent.__table__, "timestamp"),
+    Certificate.__tablename__: (Certificate.__table__, "issued_at"),
+}
+
+# Columns point lookups use, indexed on rotated SQLite partitions too
+PARTITION_INDEXES: Dict[str, Tuple[str, ...]] = {
+    TelemetryEvent.__tablename__: ("inference_id",),
+    Certificate.__tablename__: ("inference_id", "certificate_hash"),
+}
+
+_PARTITION_RE = re.compile(r"^(?P<table>[a-z_]+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def period_start(timestamp: datetime) -> datetime:
+    return datetime(timestamp.year, timestamp.month, 1)
+
+
+def next_period(start: datetime) -> datetime:
+    if start.month == 12:
+        return datetime(start.year + 1, 1, 1)
+    return datetime(start.year, start.month + 1, 1)
+
+
+def previous_period(start: datetime) -> datetime:
+    return period_start(start - timedelta(days=1))
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start.year:04d}{start.month:02d}"
+
+
+def parse_partition_name(name: str) -> Optional[Tuple[str, datetime]]:
+    """Returns (parent table, period start) for a partition name, else None."""
+    match = _PARTITION_RE.match(name)
+    if not match or match.group("table") not in PARTITIONED_TABLES:
+        return None
+    return match.group("table"), datetime(int(match.group("year")), int(match.group("month")), 1)
+
+
+def _partition_table(parent: Table, name: str) -> Table:
+    """Column-compatible copy of ``parent`` without constraints or indexes."""
+    return Table(
+        name,
+        MetaData(),
+        *[Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in parent.columns]
+    )
+
+
+def list_partitions(engine: Engine, table: str) -> List[Tuple[str, datetime]]:
+    """
+    Existing partitions of ``table`` as (name, period start), oldest first.
+    On SQLite ``engine`` may also be a connection.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            names = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :parent"
+            ), {"parent": table}).scalars().all()
+    else:
+        names = inspect(engine).get_table_names()
+
+    partitions = []
+    for name in names:
+        parsed = parse_partition_name(name)
+        if parsed and parsed[0] == table:
+            partitions.append((name, parsed[1]))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def covering_tables(
+    db: Session,
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Table]:
+    """
+    The tables holding rows of ``table`` in ``[start, end)``: the table itself
+    and, on SQLite, its rotated partitions overlapping the range. On Postgres
+    the parent routes reads and writes to its partitions natively.
+    """
+    parent, _ = PARTITIONED_TABLES[table]
+    if db.get_bind().dialect.name == "postgresql":
+        return [parent]
+    return [parent] + [
+        _partition_table(parent, name)
+        for name, period in list_partitions(db.connection(), table)
+        if _overlaps(period, start, end)
+    ]
+
+
+def partitioned(
+    db: Session,
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> FromClause:
+    """
+    Rows of ``table`` in its covering tables, as one selectable with the
+    table's columns: the table itself when nothing was rotated out of it,
+    else a UNION ALL of the hot table and its partitions. Callers still
+    filter on the time range; it only limits which partitions are read.
+    """
+    tables = covering_tables(db, table, start, end)
+    if len(tables) == 1:
+        return tables[0]
+    return union_all(*[select(t) for t in tables]).subquery(f"{table}_all")
+
+
+def ensure_postgres_partitions(engine: Engine, now: datetime, months_ahead: int = 2) -> None:
+    """
+    Creates monthly partitions from the current month to ``months_ahead``,
+    and for every month that has rows in the default partition. A partition
+    cannot be attached while the default partition holds rows in its range,
+    so those rows are moved into the new table first.
+    """
+    for table, (_, column) in PARTITIONED_TABLES.items():
+        existing = {name for name, _ in list_partitions(engine, table)}
+        with engine.begin() as conn:
+            periods = {
+                period_start(month) for month in conn.execute(text(
+                    f"SELECT DISTINCT date_trunc('month', {column})::timestamp FROM {table}_default"
+                )).scalars()
+            }
+            start = period_start(now)
+            for _ in range(months_ahead + 1):
+                periods.add(start)
+                start = next_period(start)
+
+        for start in sorted(periods):
+            name = partition_name(table, start)
+            if name in existing:
+                continue
+            end = next_period(start)
+            in_period = f"{column} >= '{start.isoformat()}' AND {column} < '{end.isoformat()}'"
+            with engine.begin() as conn:
+                conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+                moved = conn.execute(text(
+                    f"WITH moved AS (DELETE FROM {table}_default WHERE {in_period} RETURNING *) "
+                    f"INSERT INTO {name} SELECT * FROM moved"
+                )).rowcount
+                conn.execute(text(
+                    f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+            if moved:
+                logger.info(f"Moved {moved} rows from {table}_default into {name}")
+
+
+def rotate_sqlite_partitions(engine: Engine, now: datetime, hot_periods: int = 2) -> List[str]:
+    """
+    Moves rows older than the last ``hot_periods`` months out of the hot tables
+    into per-month tables. Returns the partitions that received rows.
+    """
+    hot_start = period_start(now)
+    for _ in range(hot_periods - 1):
+        hot_start = previous_period(hot_start)
+
+    touched = []
+    for table_name, (parent, column) in PARTITIONED_TABLES.items():
+        time_col = parent.c[column]
+
+        with engine.begin() as conn:
+            oldest = conn.execute(select(time_col).where(time_col < hot_start).order_by(time_col).limit(1)).scalar()
+            if oldest is None:
+                continue
+
+            start = period_start(oldest)
+            while start < hot_start:
+                end = next_period(start)
+                in_period = (time_col >= start) & (time_col < end)
+                name = partition_name(table_name, start)
+                part = _partition_table(parent, name)
+                part.create(conn, checkfirst=True)
+                for indexed in (column,) + PARTITION_INDEXES[table_name]:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{name}_{indexed} ON {name} ({indexed})"))
+
+                moved = conn.execute(
+                    insert(part).from_select([c.name for c in parent.columns], select(parent).where(in_period))
+                ).rowcount
+                conn.execute(delete(parent).where(in_period))
+                if moved:
+                    touched.append(name)
+                    logger.info(f"Rotated {moved} rows into {name}")
+                start = end
+
+    return touched
+
+
+def archive_path(archive_dir: str, name: str) -> str:
+    return os.path.join(archive_dir, f"{name}.jsonl.gz")
+
+
+def archive_partitions(engine: Engine, archive_dir: str, now: datetime, older_than_days: int) -> List[str]:
+    """
+    Writes every partition whose period ended more than ``older_than_days``
+    ago to a compressed archive, newest row first, and drops it. Returns the
+    archived names.
+    """
+    cutoff = now - timedelta(days=older_than_days)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    archived = []
+    for table_name, (parent, time_column) in PARTITIONED_TABLES.items():
+        for name, start in list_partitions(engine, table_name):
+            if next_period(start) > cutoff:
+                continue
+
+            part = _partition_table(parent, name)
+            path = archive_path(archive_dir, name)
+            tmp_path = f"{path}.tmp"
+            with engine.connect() as conn, gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+                # In the order iter_certificate_rows returns them, so it can stream the file
+                for row in conn.execute(select(part).order_by(part.c[time_column].desc())):
+                    record = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in row._mapping.items()}
+                    out.write(json.dumps(record, separators=(",", ":")) + "\n")
+            os.replace(tmp_path, path)
+
+            with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    conn.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+            archived.append(name)
+            logger.info(f"Archived {name} to {path}")
+
+    return archived
+
+
+def run_retention(
+    engine: Engine,
+    archive_dir: str,
+    older_than_days: int,
+    hot_periods: int = 2,
+    now: Optional[datetime] = None,
+) -> Dict[str, List[str]]:
+    """Partition maintenance followed by archival, for cron or the CLI."""
+    now = now or datetime.utcnow()
+    rotated: List[str] = []
+    if engine.dialect.name == "postgresql":
+        ensure_postgres_partitions(engine, now)
+    else:
+        rotated = rotate_sqlite_partitions(engine, now, hot_periods)
+    archived = archive_partitions(engine, archive_dir, now, older_than_days)
+    return {"rotated": rotated, "archived": archived}
+
+
+def _overlaps(start: datetime, range_start: Optional[datetime], range_end: Optional[datetime]) -> bool:
+    if range_start is not None and next_period(start) <= range_start:
+        return False
+    if range_end is not None and start >= range_end:
+        return False
+    return True
+
+
+def _in_range(value: datetime, range_start: Optional[datetime], range_end: Optional[datetime]) -> bool:
+    if range_start is not None and value < range_start:
+        return False
+    if range_end is not None and value >= range_end:
+        return False
+    return True
+
+
+def iter_certificate_rows(
+    db: Session,
+    archive_dir: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[Dict]:
+    """
+    Current (not superseded) certificates issued in ``[start, end)``, newest
+    first, across the hot table, rotated partitions and archives. Only the
+    partitions and archive files overlapping the range are opened.
+    """
+    def bounded(query, col):
+        if start is not None:
+            query = query.where(col >= start)
+        if end is not None:
+            query = query.where(col < end)
+        return query.where(col.table.c.superseded_by.is_(None)).order_by(col.desc())
+
+    # 1. Hot table (on Postgres this is the partitioned parent and prunes natively)
+    parent = Certificate.__table__
+    for row in db.execute(bounded(select(parent), parent.c.issued_at)):
+        yield dict(row._mapping)
+
+    # 2. Rotated SQLite partitions
+    bind = db.get_bind()
+    live = set()
+    if bind.dialect.name != "postgresql":
+        for name, period in reversed(list_partitions(bind, parent.name)):
+            live.add(name)
+            if not _overlaps(period, start, end):
+                continue
+            part = _partition_table(parent, name)
+            for row in db.execute(bounded(select(part), part.c.issued_at)):
+                yield dict(row._mapping)
+    else:
+        live.update(name for name, _ in list_partitions(bind, parent.name))
+
+    # 3. Cold archives, skipping any whose partition still exists
+    if not os.path.isdir(archive_dir):
+        return
+    archives = []
+    for filename in os.listdir(archive_dir):
+        if not filename.endswith(".jsonl.gz"):
+            continue
+        name = filename[:-len(".jsonl.gz")]
+        parsed = parse_partition_name(name)
+        if parsed and parsed[0] == parent.name and name not in live and _overlaps(parsed[1], start, end):
+            archives.append((parsed[1], name))
+
+    for _, name in sorted(archives, reverse=True):
+        # Archives are written newest first, so rows are yielded as they are read
+        with gzip.open(archive_path(archive_dir, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                record["issued_at"] = datetime.fromisoformat(record["issued_at"])
+                if record.get("superseded_by") is None and _in_range(record["issued_at"], start, end):
+                    yield record
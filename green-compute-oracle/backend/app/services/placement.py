@@ -0,0 +1,123 @@
+"""
+Carbon-aware placement: where and when to run a job with the lowest emissions.
+
+Every candidate region gets an intensity series on a fixed time grid over the
+planning horizon. Expected emissions for every (region, start slot) pair are
+then one sliding-window sum over the stacked series, computed with cumulative
+sums so the whole search is a handful of NumPy operations.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import math
+
+from app.services.carbon_oracle import CarbonOracle
+from app.services.intensity_store import to_epoch
+
+# Grid intensity follows a strong daily cycle, so yesterday is the forecast
+SEASONAL_PERIOD_SECONDS = 24 * 3600
+
+
+def build_forecast(
+    oracle: CarbonOracle,
+    regions: List[str],
+    start: datetime,
+    step_seconds: float,
+    slots: int,
+):
+    """
+    Returns a (regions x slots) float64 matrix of expected intensity.
+
+    Each slot uses, in order: a cached observation at that time, the
+    observation one day earlier, the latest known observation for the
+    region, and finally the regional fallback.
+    """
+    import numpy as np
+
+    epochs = to_epoch(start) + step_seconds * np.arange(slots, dtype=np.float64)
+    matrix = np.empty((len(regions), slots), dtype=np.float64)
+
+    for row, region in enumerate(regions):
+        series = oracle.history.lookup_many(region, epochs)
+        missing = np.isnan(series)
+        if missing.any():
+            seasonal = oracle.history.lookup_many(region, epochs[missing] - SEASONAL_PERIOD_SECONDS)
+            series[missing] = seasonal
+            missing = np.isnan(series)
+        if missing.any():
+            latest = oracle.history.latest(region)
+            if latest is None:
+                latest = oracle.regional_fallbacks.get(region, oracle.regional_fallbacks["default"])
+            series[missing] = latest
+        matrix[row] = series
+
+    return matrix
+
+
+def rank_placements(
+    regions: List[str],
+    intensity,
+    start: datetime,
+    step_seconds: float,
+    energy_kwh: float,
+    duration_seconds: float,
+    limit: int = 10,
+) -> List[Dict]:
+    """
+    Ranks every (region, start slot) by expected emissions for a job that
+    draws ``energy_kwh`` evenly over ``duration_seconds``.
+    """
+    import numpy as np
+
+    intensity = np.asarray(intensity, dtype=np.float64)
+    slots = intensity.shape[1]
+    window = max(1, math.ceil(duration_seconds / step_seconds))
+    if window > slots:
+        return []
+
+    # Sliding-window sums for all regions at once
+    cumulative = np.zeros((intensity.shape[0], slots + 1), dtype=np.float64)
+    np.cumsum(intensity, axis=1, out=cumulative[:, 1:])
+    window_mean = (cumulative[:, window:] - cumulative[:, :-window]) / window
+    emissions = energy_kwh * window_mean
+
+    flat = emissions.ravel()
+    k = min(limit, flat.size)
+    best = np.argpartition(flat, k - 1)[:k]
+    best = best[np.argsort(flat[best], kind="stable")]
+
+    starts = emissions.shape[1]
+    options = []
+    for index in best:
+        row, slot = divmod(int(index), starts)
+        begin = start + timedelta(seconds=slot * step_seconds)
+        options.append({
+            "region": regions[row],
+            "start_time": begin,
+            "end_time": begin + timedelta(seconds=duration_seconds),
+            "expected_emissions_gco2": float(flat[index]),
+            "avg_intensity_gco2_kwh": float(window_mean[row, slot]),
+        })
+    return options
+
+
+def plan_placement(
+    oracle: CarbonOracle,
+    energy_kwh: float,
+    duration_seconds: float,
+    horizon_seconds: float,
+    step_seconds: float,
+    regions: Optional[List[str]] = None,
+    start: Optional[datetime] = None,
+    limit: int = 10,
+) -> List[Dict]:
+    """
+    Builds the forecast matrix for the horizon and returns the ranked options.
+    """
+    if regions is None:
+        regions = [r for r in oracle.regional_fallbacks if r != "default"]
+    start = start or datetime.utcnow()
+    # Enough slots for the last admissible start plus the job itself
+    slots = max(1, math.ceil(horizon_seconds / step_seconds)) + math.ceil(duration_seconds / step_seconds)
+
+    intensity = build_forecast(oracle, regions, start, step_seconds, slots)
+    return rank_placements(regions, intensity, start, step_seconds, energy_kwh, duration_seconds, limit)
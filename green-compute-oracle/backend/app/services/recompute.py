@@ -0,0 +1,271 @@
+"""
+Bulk emissions recomputation for revised grid data.
+
+Streams the certificates of one region and time range in keyset-ordered chunks,
+re-prices them against the intensity history (or the revised regional fallback)
+in one vectorized multiply per chunk, and writes the results back with a single
+executemany UPDATE. Certificates and telemetry in rotated SQLite partitions are
+read and updated too, and the hourly emission sketches are moved to the new
+values in the same transaction. Regional averages are never history, so
+certificates priced with one are re-priced against the revised average.
+Progress is checkpointed after every chunk so an interrupted job resumes
+where it stopped.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+import json
+import logging
+import os
+import time
+import uuid
+
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.canonical import canonicalize, digest
+from app.models.orm import Certificate, TelemetryEvent
+from app.services.carbon_oracle import CarbonOracle, carbon_oracle
+from app.services.crypto_engine import crypto_engine
+from app.services.emission_calc import emission_calculator
+from app.services.intensity_store import to_epoch
+from app.services.partitions import covering_tables, partitioned
+from app.services.sketches import reprice_sketches
+
+logger = logging.getLogger(__name__)
+
+# Re-priced values closer than this to the stored ones are left untouched
+EMISSIONS_TOLERANCE_GCO2 = 1e-9
+
+
+class RecomputeJob:
+    """
+    Re-prices stored certificates for ``region`` issued in ``[start, end)``.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        region: str,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = 10_000,
+        reissue: bool = False,
+        checkpoint_path: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        oracle: Optional[CarbonOracle] = None,
+    ):
+        self.db = db
+        self.region = region
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+        self.reissue = reissue
+        self.checkpoint_path = checkpoint_path
+        self.progress = progress
+        self.oracle = oracle if oracle is not None else carbon_oracle
+
+        self.state: Dict[str, Any] = {
+            "region": region,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "last_issued_at": None,
+            "last_id": None,
+            "processed": 0,
+            "updated": 0,
+            "reissued": 0,
+            "done": False,
+        }
+        self._load_checkpoint()
+
+    def _load_checkpoint(self) -> None:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            saved = json.load(f)
+        same_job = all(saved.get(k) == self.state[k] for k in ("region", "start", "end"))
+        if not same_job:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to a different recompute job")
+        self.state.update(saved)
+        logger.info(f"Resuming recompute for {self.region} after {self.state['processed']} certificates")
+
+    def _save_checkpoint(self) -> None:
+        if not self.checkpoint_path:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _next_chunk(self):
+        """
+        Next chunk of (id, inference_id, energy, issued_at, consumed_at,
+        emissions, model, node) tuples.
+        """
+        certificates = partitioned(self.db, Certificate.__tablename__, self.start, self.end)
+        # Telemetry rotates on its own timestamp, which may fall in another month
+        telemetry = partitioned(self.db, TelemetryEvent.__tablename__)
+        query = select(
+            certificates.c.id,
+            certificates.c.inference_id,
+            certificates.c.energy_used_kwh,
+            certificates.c.issued_at,
+            telemetry.c.timestamp,
+            certificates.c.total_emissions_gco2,
+            telemetry.c.model_name,
+            telemetry.c.node_name,
+        ).select_from(certificates).outerjoin(
+            telemetry, certificates.c.inference_id == telemetry.c.inference_id
+        ).where(
+            certificates.c.grid_region == self.region,
+            certificates.c.issued_at >= self.start,
+            certificates.c.issued_at < self.end,
+            certificates.c.superseded_by.is_(None),
+        )
+
+        if self.state["last_issued_at"] is not None:
+            last_issued_at = datetime.fromisoformat(self.state["last_issued_at"])
+            query = query.where(or_(
+                certificates.c.issued_at > last_issued_at,
+                and_(certificates.c.issued_at == last_issued_at, certificates.c.id > self.state["last_id"]),
+            ))
+
+        query = query.order_by(certificates.c.issued_at, certificates.c.id).limit(self.chunk_size)
+        return self.db.execute(query).all()
+
+    def _reprice(self, rows):
+        """Returns (energy, intensity, emissions) arrays for a chunk."""
+        import numpy as np
+
+        n = len(rows)
+        energy = np.fromiter((r[2] for r in rows), dtype=np.float64, count=n)
+        # Price at consumption time when the telemetry is known, else at issuance
+        epochs = np.fromiter((to_epoch(r[4] or r[3]) for r in rows), dtype=np.float64, count=n)
+
+        intensity = self.oracle.history.lookup_many(self.region, epochs, db=self.db)
+        fallback = self.oracle.regional_fallbacks.get(self.region, self.oracle.regional_fallbacks["default"])
+        intensity = np.where(np.isnan(intensity), fallback, intensity)
+
+        emissions = emission_calculator.calculate_emissions_batch(energy, intensity)
+        return energy, intensity, emissions
+
+    def _changed_rows(self, rows, emissions):
+        import numpy as np
+
+        stored = np.fromiter((r[5] for r in rows), dtype=np.float64, count=len(rows))
+        return np.flatnonzero(np.abs(stored - emissions) > EMISSIONS_TOLERANCE_GCO2)
+
+    def _update_by_id(self, params) -> None:
+        """
+        Executemany UPDATE keyed by ``certificate_id``, against every table
+        that may hold the certificates; each row matches in exactly one.
+        """
+        for table in covering_tables(self.db, Certificate.__tablename__, self.start, self.end):
+            self.db.execute(update(table).where(table.c.id == bindparam("certificate_id")), params)
+
+    def _write_updates(self, rows, intensity, emissions, changed) -> None:
+        self._update_by_id([
+            {
+                "certificate_id": rows[i][0],
+                "carbon_intensity_gco2_kwh": float(intensity[i]),
+                "total_emissions_gco2": float(emissions[i]),
+            }
+            for i in changed
+        ])
+
+    def _move_sketches(self, rows, emissions, changed) -> None:
+        # Keyed as storage.store_certificates observed them: at consumption time
+        reprice_sketches(self.db, (
+            (
+                {"model": rows[i][6], "node": rows[i][7], "region": self.region},
+                rows[i][4] or rows[i][3],
+                rows[i][5],
+                float(emissions[i]),
+            )
+            for i in changed
+        ))
+
+    def _write_superseding(self, rows, energy, intensity, emissions, changed) -> None:
+        issued_at = datetime.utcnow()
+        new_certs = []
+        links = []
+        for i in changed:
+            cert_id = str(uuid.uuid4())
+            cert_data = {
+                "certificate_id": cert_id,
+                "inference_id": rows[i][1],
+                "timestamp": (rows[i][4] or rows[i][3]).isoformat(),
+                "energy_used_kwh": float(energy[i]),
+                "carbon_intensity_gco2_kwh": float(intensity[i]),
+                "total_emissions_gco2": float(emissions[i]),
+                "issuer": "Verifiable Green Compute Oracle",
+                "supersedes": rows[i][0],
+            }
+            canonical = canonicalize(cert_data)
+            new_certs.append({
+                "id": cert_id,
+                "inference_id": rows[i][1],
+                "energy_used_kwh": float(energy[i]),
+                "carbon_intensity_gco2_kwh": float(intensity[i]),
+                "total_emissions_gco2": float(emissions[i]),
+                "grid_region": self.region,
+                "issued_at": issued_at,
+                "certificate_hash": digest(canonical),
+                "signed_content": crypto_engine.sign_canonical(canonical),
+            })
+            links.append({"certificate_id": rows[i][0], "superseded_by": cert_id})
+
+        self.db.execute(insert(Certificate), new_certs)
+        self._update_by_id(links)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Processes the remaining chunks and returns the final job state.
+        """
+        if self.state["done"]:
+            return self.state
+
+        started = time.monotonic()
+        processed_at_start = self.state["processed"]
+
+        while True:
+            rows = self._next_chunk()
+            if not rows:
+                break
+
+            energy, intensity, emissions = self._reprice(rows)
+            changed = self._changed_rows(rows, emissions)
+
+            try:
+                if len(changed):
+                    if self.reissue:
+                        self._write_superseding(rows, energy, intensity, emissions, changed)
+                    else:
+                        self._write_updates(rows, intensity, emissions, changed)
+                    self._move_sketches(rows, emissions, changed)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+
+            last = rows[-1]
+            self.state["last_issued_at"] = last[3].isoformat()
+            self.state["last_id"] = last[0]
+            self.state["processed"] += len(rows)
+            if self.reissue:
+                self.state["reissued"] += len(changed)
+            else:
+                self.state["updated"] += len(changed)
+            self._save_checkpoint()
+
+            elapsed = time.monotonic() - started
+            self.state["rows_per_second"] = (self.state["processed"] - processed_at_start) / elapsed if elapsed > 0 else 0.0
+            if self.progress is not None:
+                self.progress(dict(self.state))
+
+        self.state["done"] = True
+        self._save_checkpoint()
+        logger.info(
+            f"Recompute for {self.region} finished: {self.state['processed']} processed, "
+            f"{self.state['updated']} updated, {self.state['reissued']} reissued"
+        )
+        return self.state
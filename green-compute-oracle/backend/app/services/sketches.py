@@ -0,0 +1,346 @@
+"""
+Mergeable quantile sketches for emission and energy distributions.
+
+Every stored certificate is folded into a DDSketch per (dimension, key, hour)
+for each of the model, node and grid region it belongs to. A DDSketch keeps
+log-spaced bucket counts, so any quantile it reports is within
+``relative_accuracy`` of the true value, two sketches merge by adding their
+counts, and its size depends on the spread of the data rather than on how
+many values it has seen. Percentile queries over a window merge that
+window's hourly sketches instead of sorting raw certificates. Re-priced
+certificates are moved from their old emissions to the new ones.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+import json
+import math
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.models.orm import EmissionSketch
+from app.services.intensity_store import to_naive_utc
+
+DIMENSIONS = ("model", "node", "region")
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative-error guarantees (Masson et al., 2019).
+    Values <= 0 are counted in a dedicated zero bucket.
+    """
+    __slots__ = ("relative_accuracy", "max_bins", "gamma", "_log_gamma", "bins", "zero_count",
+                 "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: int = 1) -> None:
+        if value > 0:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        else:
+            self.zero_count += weight
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def remove(self, value: float) -> bool:
+        """
+        Takes one occurrence of ``value`` back out. Returns False, changing
+        nothing, if the sketch cannot hold it. Removing the minimum or
+        maximum narrows it to the edge of the remaining buckets, within the
+        sketch's relative accuracy of the true value.
+        """
+        if value > 0:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            if index not in self.bins and self.bins and index < min(self.bins):
+                # Folded into the lowest bucket by _collapse
+                index = min(self.bins)
+            if index not in self.bins:
+                return False
+            self.bins[index] -= 1
+            if not self.bins[index]:
+                del self.bins[index]
+        else:
+            if not self.zero_count:
+                return False
+            self.zero_count -= 1
+        self.count -= 1
+        self.sum -= value
+        if not self.count:
+            self.sum = 0.0
+            self.min = math.inf
+            self.max = -math.inf
+            return True
+        if value <= self.min:
+            self.min = min(self.min, 0.0) if self.zero_count else self.gamma ** (min(self.bins) - 1)
+        if value >= self.max:
+            self.max = self.gamma ** max(self.bins) if self.bins else min(self.max, 0.0)
+        return True
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy: float = 0.01) -> "DDSketch":
+        """Builds a sketch from an array of values in one vectorized pass."""
+        import numpy as np
+
+        sketch = cls(relative_accuracy=relative_accuracy)
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return sketch
+        positive = values[values > 0]
+        indexes, counts = np.unique(np.ceil(np.log(positive) / sketch._log_gamma).astype(np.int64), return_counts=True)
+        sketch.bins = dict(zip(indexes.tolist(), counts.tolist()))
+        if len(sketch.bins) > sketch.max_bins:
+            sketch._collapse()
+        sketch.zero_count = int(values.size - positive.size)
+        sketch.count = int(values.size)
+        sketch.sum = float(values.sum())
+        sketch.min = float(values.min())
+        sketch.max = float(values.max())
+        return sketch
+
+    def merge_json(self, data: str) -> None:
+        """Merges a serialized sketch without building an intermediate one."""
+        state = json.loads(data)
+        if state["a"] != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        bins = self.bins
+        for index, count in state["bins"]:
+            bins[index] = bins.get(index, 0) + count
+        if len(bins) > self.max_bins:
+            self._collapse()
+        if state["n"]:
+            self.zero_count += state["zero"]
+            self.count += state["n"]
+            self.sum += state["sum"]
+            self.min = min(self.min, state["min"])
+            self.max = max(self.max, state["max"])
+
+    def _collapse(self) -> None:
+        # Fold the lowest buckets together; high quantiles stay accurate
+        indexes = sorted(self.bins)
+        excess = indexes[:len(indexes) - self.max_bins + 1]
+        folded = sum(self.bins.pop(index) for index in excess)
+        target = indexes[len(excess)]
+        self.bins[target] += folded
+
+    def _value(self, index: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return min(self.min, 0.0)
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "a": self.relative_accuracy,
+            "bins": [[index, count] for index, count in sorted(self.bins.items())],
+            "zero": self.zero_count,
+            "n": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "DDSketch":
+        state = json.loads(data)
+        sketch = cls(relative_accuracy=state["a"])
+        sketch.bins = {index: count for index, count in state["bins"]}
+        sketch.zero_count = state["zero"]
+        sketch.count = state["n"]
+        sketch.sum = state["sum"]
+        if sketch.count:
+            sketch.min = state["min"]
+            sketch.max = state["max"]
+        return sketch
+
+
+def _insert(db: Session):
+    """The dialect's INSERT construct, which supports ON CONFLICT."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return to_naive_utc(timestamp).replace(minute=0, second=0, microsecond=0)
+
+
+def update_sketches(db: Session, observations: Iterable[Tuple[Dict[str, Optional[str]], datetime, float, float]]) -> int:
+    """
+    Folds observations into the hourly sketches and commits.
+    Each observation is ({dimension: key}, timestamp, energy_kwh, emissions_gco2);
+    dimensions whose key is None are skipped. Returns the number of sketch
+    rows written.
+    """
+    pending: Dict[Tuple[str, str, datetime], Tuple[DDSketch, DDSketch]] = {}
+    for keys, timestamp, energy_kwh, emissions_gco2 in observations:
+        bucket = hour_bucket(timestamp)
+        for dimension in DIMENSIONS:
+            key = keys.get(dimension)
+            if key is None:
+                continue
+            energy, emissions = pending.setdefault((dimension, key, bucket), (DDSketch(), DDSketch()))
+            energy.add(energy_kwh)
+            emissions.add(emissions_gco2)
+    if not pending:
+        return 0
+
+    rows = _locked_rows(db, pending)
+    for (dimension, key, bucket), (energy, emissions) in pending.items():
+        row = rows[(dimension, key, bucket)]
+        stored_energy = DDSketch.from_json(row.energy_sketch)
+        stored_emissions = DDSketch.from_json(row.emissions_sketch)
+        stored_energy.merge(energy)
+        stored_emissions.merge(emissions)
+        row.count = stored_energy.count
+        row.energy_sketch = stored_energy.to_json()
+        row.emissions_sketch = stored_emissions.to_json()
+        row.updated_at = datetime.utcnow()
+
+    db.commit()
+    return len(pending)
+
+
+def reprice_sketches(db: Session, changes: Iterable[Tuple[Dict[str, Optional[str]], datetime, float, float]]) -> int:
+    """
+    Moves re-priced inferences from their old emissions to the new ones in
+    the hourly sketches, without committing: the caller commits with the
+    certificates. Each change is ({dimension: key}, timestamp,
+    old_emissions_gco2, new_emissions_gco2); energy is unchanged. Values a
+    sketch never saw (e.g. its update failed) are left out. Returns the
+    number of sketch rows written.
+    """
+    pending: Dict[Tuple[str, str, datetime], list] = {}
+    for keys, timestamp, old_emissions, new_emissions in changes:
+        bucket = hour_bucket(timestamp)
+        for dimension in DIMENSIONS:
+            key = keys.get(dimension)
+            if key is not None:
+                pending.setdefault((dimension, key, bucket), []).append((old_emissions, new_emissions))
+    if not pending:
+        return 0
+
+    rows = _locked_rows(db, pending)
+    for bucket_key, moves in pending.items():
+        row = rows[bucket_key]
+        emissions = DDSketch.from_json(row.emissions_sketch)
+        for old_emissions, new_emissions in moves:
+            if emissions.remove(old_emissions):
+                emissions.add(new_emissions)
+        row.emissions_sketch = emissions.to_json()
+        row.updated_at = datetime.utcnow()
+    return len(pending)
+
+
+def _locked_rows(db: Session, buckets) -> Dict[Tuple[str, str, datetime], EmissionSketch]:
+    """The sketch rows for (dimension, key, bucket) triples, created if missing and locked."""
+    # Create missing rows first, skipping any another writer created, then
+    # lock them all: concurrent writers wait for each other instead of one
+    # failing on the unique index and losing its observations
+    empty = DDSketch().to_json()
+    db.execute(
+        _insert(db)(EmissionSketch).values([
+            {
+                "id": str(uuid.uuid4()),
+                "dimension": dimension,
+                "key": key,
+                "bucket_start": bucket,
+                "count": 0,
+                "energy_sketch": empty,
+                "emissions_sketch": empty,
+            }
+            for dimension, key, bucket in buckets
+        ]).on_conflict_do_nothing(index_elements=["dimension", "key", "bucket_start"])
+    )
+    return {
+        (row.dimension, row.key, row.bucket_start): row
+        for row in db.query(EmissionSketch).filter(
+            EmissionSketch.bucket_start.in_({bucket for _, _, bucket in buckets}),
+            EmissionSketch.key.in_({key for _, key, _ in buckets})
+        ).with_for_update().populate_existing()
+    }
+
+
+def merged_sketches(
+    db: Session,
+    dimension: str,
+    key: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Tuple[DDSketch, DDSketch]:
+    """
+    Merges the hourly (energy, emissions) sketches for one key whose bucket
+    overlaps [start, end).
+    """
+    query = db.query(EmissionSketch.energy_sketch, EmissionSketch.emissions_sketch).filter(
+        EmissionSketch.dimension == dimension,
+        EmissionSketch.key == key
+    )
+    if start is not None:
+        query = query.filter(EmissionSketch.bucket_start >= hour_bucket(start))
+    if end is not None:
+        query = query.filter(EmissionSketch.bucket_start < to_naive_utc(end))
+
+    energy, emissions = DDSketch(), DDSketch()
+    for energy_json, emissions_json in query:
+        energy.merge_json(energy_json)
+        emissions.merge_json(emissions_json)
+    return energy, emissions
+
+
+def summarize(sketch: DDSketch, quantiles: Sequence[float]) -> dict:
+    return {
+        "count": sketch.count,
+        "mean": sketch.sum / sketch.count if sketch.count else None,
+        "min": sketch.min if sketch.count else None,
+        "max": sketch.max if sketch.count else None,
+        "percentiles": {f"p{q * 100:g}": sketch.quantile(q) for q in quantiles},
+    }
@@ -1,43 +1,116 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from app.core.canonical import canonicalize, digest
 from app.models.orm import Certificate, TelemetryEvent
 from app.models.schemas import GreenCertificate
+from app.services.broadcast import broadcast_hub
+from app.services.partitions import partitioned
+from app.services.sketches import update_sketches
 from datetime import datetime
+from typing import List, Tuple
+
+GRID_REGION = "us-east" # Should be passed in with the certificate
+
+def certificate_hash(cert_data: GreenCertificate) -> str:
+    """
+    The certificate's content address. Issued certificates carry the digest
+    of their canonical signed payload; one without (e.g. built elsewhere) is
+    hashed over its canonical fields, and the result is recorded on it.
+
+    The payload includes the random certificate ID and the issue time, so
+    certificates issued twice for the same telemetry hash differently: the
+    hash identifies a certificate, it does not deduplicate telemetry.
+    """
+    if cert_data.certificate_hash is None:
+        fields = cert_data.model_dump(mode="json", exclude={"certificate_hash"})
+        cert_data.certificate_hash = digest(canonicalize(fields))
+    return cert_data.certificate_hash
 
 def store_certificate(db: Session, cert_data: GreenCertificate, raw_signature: str):
     """
     Stores the certificate and telemetry event in the database.
     """
+    store_certificates(db, [(cert_data, raw_signature)])
+
+def store_certificates(db: Session, items: List[Tuple[GreenCertificate, str]]) -> List[GreenCertificate]:
+    """
+    Stores certificates and their telemetry events in a single transaction
+    and returns the ones it stored. Agents deliver at least once, so
+    inference IDs that are already stored are skipped. Newly stored
+    certificates are announced on the broadcast hub and folded into the
+    emission sketches once committed. Raises if the transaction fails.
+    """
     try:
         # 1. Store Telemetry Event (if not already exists, or simplified flow)
         # In a real app, telemetry might be stored before certificate generation.
         # Here we store them together for simplicity.
-        
-        # Check if telemetry exists
-        existing_telemetry = db.query(TelemetryEvent).filter(TelemetryEvent.inference_id == cert_data.inference_id).first()
-        if not existing_telemetry:
-            telemetry = TelemetryEvent(
+        inference_ids = [cert_data.inference_id for cert_data, _ in items]
+
+        # Check which telemetry and certificates already exist, rotated partitions included
+        telemetry_rows = partitioned(db, TelemetryEvent.__tablename__)
+        existing_telemetry = set(db.execute(
+            select(telemetry_rows.c.inference_id).where(telemetry_rows.c.inference_id.in_(inference_ids))
+        ).scalars())
+        certificate_rows = partitioned(db, Certificate.__tablename__)
+        existing_certificates = set(db.execute(
+            select(certificate_rows.c.inference_id).where(certificate_rows.c.inference_id.in_(inference_ids))
+        ).scalars())
+        stored = []
+        for cert_data, raw_signature in items:
+            if cert_data.inference_id in existing_certificates:
+                continue
+            existing_certificates.add(cert_data.inference_id)
+
+            if cert_data.inference_id not in existing_telemetry:
+                telemetry = TelemetryEvent(
+                    inference_id=cert_data.inference_id,
+                    model_name=cert_data.model_id,
+                    node_name=cert_data.hardware_id,
+                    timestamp=cert_data.timestamp,
+                    energy_kwh=cert_data.energy_used_kwh,
+                    signature=raw_signature, # The agent's signature
+                    verified=True # We verified it in the route
+                )
+                db.add(telemetry)
+                existing_telemetry.add(cert_data.inference_id)
+
+            # 2. Store Certificate
+            cert_orm = Certificate(
+                id=cert_data.certificate_id,
                 inference_id=cert_data.inference_id,
-                timestamp=cert_data.timestamp,
-                energy_kwh=cert_data.energy_used_kwh,
-                signature=raw_signature, # The agent's signature
-                verified=True # We verified it in the route
+                energy_used_kwh=cert_data.energy_used_kwh,
+                carbon_intensity_gco2_kwh=cert_data.carbon_intensity_gco2_kwh,
+                total_emissions_gco2=cert_data.total_emissions_gco2,
+                grid_region=GRID_REGION,
+                certificate_hash=certificate_hash(cert_data),
+                signed_content=cert_data.signature
             )
-            db.add(telemetry)
-            db.flush() # Get ID if needed
-
-        # 2. Store Certificate
-        cert_orm = Certificate(
-            id=cert_data.certificate_id,
-            inference_id=cert_data.inference_id,
-            energy_used_kwh=cert_data.energy_used_kwh,
-            carbon_intensity_gco2_kwh=cert_data.carbon_intensity_gco2_kwh,
-            total_emissions_gco2=cert_data.total_emissions_gco2,
-            grid_region="us-east", # Should be passed in
-            certificate_hash="hash-placeholder", # Should be computed
-            signed_content=cert_data.signature
-        )
-        db.add(cert_orm)
+            db.add(cert_orm)
+            stored.append(cert_data)
         db.commit()
     except Exception as e:
         print(f"Error storing certificate: {e}")
         db.rollback()
+        raise
+
+    # Committed by now: a failed announcement must not report them as unstored
+    try:
+        broadcast_hub.publish_certificates(stored)
+    except Exception as e:
+        print(f"Error publishing stored certificates: {e}")
+
+    # Separate transaction: a failed sketch update must not lose certificates
+    try:
+        update_sketches(db, (
+            (
+                {"model": cert_data.model_id, "node": cert_data.hardware_id, "region": GRID_REGION},
+                cert_data.timestamp,
+                cert_data.energy_used_kwh,
+                cert_data.total_emissions_gco2
+            )
+            for cert_data in stored
+        ))
+    except Exception as e:
+        print(f"Error updating emission sketches: {e}")
+        db.rollback()
+    return stored
@@ -0,0 +1,191 @@
+"""
+Streaming telemetry ingest over a WebSocket.
+
+An authenticated node keeps one socket open and pushes telemetry payloads as
+they are produced. Each payload goes through the same issuance pipeline as
+POST /telemetry and is answered asynchronously on the same socket.
+
+Flow control is credit based: the server announces a window of credits when
+the socket opens, every payload spends one and every answer ("certificate" or
+"rejected") returns one. A node that sends without credit is disconnected.
+Payloads that queue up while the server is busy are issued and stored
+together, sharing one pair of sessions and one transaction.
+
+Text frames carry JSON and binary frames MessagePack; answers are encoded as
+MessagePack when the handshake's Accept header asks for it.
+"""
+from typing import Optional
+import asyncio
+import json
+import logging
+
+from fastapi import WebSocket, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core import database
+from app.core.config import settings
+from app.core.wire import accepts_msgpack
+from app.models.schemas import TelemetryPayload
+from app.services.crypto_engine import crypto_engine
+from app.services.issuance import issue_certificate, InvalidAgentSignature
+from app.services.certificate_store import get_certificate_store
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+def authenticate_node(websocket: WebSocket) -> Optional[str]:
+    """
+    Returns the node ID for the bearer token in the Authorization header, or
+    None if it is missing or invalid. Tokens are not accepted in the query
+    string, where they would end up in access logs.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    token = authorization[len("bearer "):].strip()
+    if not token:
+        return None
+    try:
+        return crypto_engine.verify_node_token(token)
+    except ValueError as e:
+        logger.warning(f"Rejected telemetry stream: {e}")
+        return None
+
+
+class TelemetryStream:
+    """
+    Serves one node's telemetry socket.
+    """
+
+    def __init__(self, websocket: WebSocket, node_id: str, credits: int = None, drain_max: int = None):
+        self.websocket = websocket
+        self.node_id = node_id
+        self.credits = settings.STREAM_CREDITS if credits is None else credits
+        self.drain_max = drain_max or settings.STREAM_DRAIN_MAX
+        self.binary = msgpack is not None and accepts_msgpack(websocket)
+        self.in_flight = 0
+        self.connected = True
+        self.pending: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, message: dict) -> None:
+        if not self.connected:
+            return
+        if self.binary:
+            await self.websocket.send_bytes(msgpack.packb(message))
+        else:
+            await self.websocket.send_text(json.dumps(message))
+
+    def decode(self, message: dict) -> TelemetryPayload:
+        """Validates one frame; raises ValueError if it is not a telemetry payload."""
+        if message.get("bytes") is not None:
+            if msgpack is None:
+                raise ValueError("MessagePack is not supported by this server")
+            return TelemetryPayload.from_received(msgpack.unpackb(message["bytes"], raw=False))
+        return TelemetryPayload.from_received(json.loads(message.get("text") or ""))
+
+    async def receive_loop(self) -> None:
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                self.connected = False
+                return
+            if self.in_flight >= self.credits:
+                self.connected = False
+                await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Credit exhausted")
+                return
+            self.in_flight += 1
+            self.pending.put_nowait(message)
+
+    async def issue_loop(self) -> None:
+        """Issues queued payloads until the receiver hands over ``None``."""
+        while True:
+            message = await self.pending.get()
+            if message is None:
+                return
+            messages = [message]
+            while len(messages) < self.drain_max and not self.pending.empty():
+                message = self.pending.get_nowait()
+                if message is None:
+                    await self.issue_batch(messages)
+                    return
+                messages.append(message)
+            await self.issue_batch(messages)
+
+    async def issue_batch(self, messages) -> None:
+        db = database.SessionLocal() if database.SessionLocal is not None else None
+        read_db = database.ReadSessionLocal() if database.ReadSessionLocal is not None else None
+        try:
+            answers = []
+            issued = []
+            for message in messages:
+                try:
+                    payload = self.decode(message)
+                except ValueError as e:
+                    answers.append({"type": "rejected", "inference_id": None, "detail": str(e)})
+                    continue
+                if payload.node_id != self.node_id:
+                    answers.append({
+                        "type": "rejected",
+                        "inference_id": payload.inference_id,
+                        "detail": "node_id does not match the authenticated node"
+                    })
+                    continue
+                try:
+                    certificate = await issue_certificate(payload, db, read_db)
+                except InvalidAgentSignature as e:
+                    answers.append({"type": "rejected", "inference_id": payload.inference_id, "detail": str(e)})
+                    continue
+                issued.append((certificate, payload.signature))
+                answers.append(certificate.inference_id)
+
+            # Answer only once stored, so an acknowledged certificate is durable;
+            # a redelivered inference is answered with the certificate already stored
+            held = {}
+            if issued:
+                store = get_certificate_store(db)
+                try:
+                    held = {cert.inference_id: cert for cert in await run_in_threadpool(store.store_certificates, issued)}
+                except Exception as e:
+                    logger.error(f"Could not store streamed certificates: {e}")
+            answers = [self._answer(answer, held) for answer in answers]
+        finally:
+            if db is not None:
+                db.close()
+            if read_db is not None:
+                read_db.close()
+
+        for answer in answers:
+            self.in_flight -= 1
+            await self.send(answer)
+
+    @staticmethod
+    def _answer(answer, held: dict) -> dict:
+        if not isinstance(answer, str):
+            return answer
+        certificate = held.get(answer)
+        if certificate is None:
+            # Not acknowledged: the node should keep the payload and send it again
+            return {"type": "rejected", "inference_id": answer, "detail": "Certificate could not be stored"}
+        return {"type": "certificate", "certificate": certificate.model_dump(mode="json")}
+
+    async def run(self) -> None:
+        await self.send({"type": "ready", "credits": self.credits})
+        receiver = asyncio.create_task(self.receive_loop())
+        issuer = asyncio.create_task(self.issue_loop())
+        done, _ = await asyncio.wait({receiver, issuer}, return_when=asyncio.FIRST_COMPLETED)
+        if issuer in done:
+            # The issuer only stops early on an error
+            receiver.cancel()
+            issuer.result()
+            return
+
+        receiver.result()
+        # Finish what the node already sent; it will not see the answers, but
+        # the certificates are stored and its retries are deduplicated
+        self.pending.put_nowait(None)
+        await issuer
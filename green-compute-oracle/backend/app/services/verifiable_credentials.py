@@ -5,7 +5,8 @@ Spec: https://www.w3.org/TR/vc-data-model/
 from datetime import datetime
 from typing import Dict, Any, Optional
 import json
-import hashlib
+from app.core.canonical import canonicalize
+from app.core.config import settings
 from app.services.crypto_engine import crypto_engine
 
 class VerifiableCredentialEngine:
@@ -102,18 +103,16 @@ class VerifiableCredentialEngine:
         Adds a cryptographic proof to the VC (JWS format)
         Uses JsonWebSignature2020 proof type
         """
-        # Create canonical representation for signing
-        canonical = json.dumps(vc, sort_keys=True, separators=(',', ':'))
-        
-        # Generate signature
-        signature = crypto_engine.sign_certificate(vc)
+        # Sign the canonical representation; verifiers find the key by kid in
+        # the published JWKS or DID document
+        kid, signature = crypto_engine.keyring.sign(canonicalize(vc))
         
         # Add proof section
         vc_with_proof = vc.copy()
         vc_with_proof["proof"] = {
             "type": "JsonWebSignature2020",
             "created": datetime.utcnow().isoformat() + "Z",
-            "verificationMethod": f"{self.issuer_did}#key-1",
+            "verificationMethod": f"{self.issuer_did}#{kid}",
             "proofPurpose": "assertionMethod",
             "jws": signature
         }
@@ -122,7 +121,8 @@ class VerifiableCredentialEngine:
     
     def verify_vc(self, vc_with_proof: Dict[str, Any]) -> bool:
         """
-        Verifies a signed VC
+        Verifies a signed VC against the locally cached issuer keys: the JWS
+        must check out under the key its kid names and cover exactly this VC
         """
         if "proof" not in vc_with_proof:
             return False
@@ -139,8 +139,9 @@ class VerifiableCredentialEngine:
         
         try:
             # Verify signature
-            decoded = crypto_engine.verify_signature(jws)
-            return True
+            signed = crypto_engine.verify_canonical(jws)
+            # Compared as canonical JSON: legacy credentials were not signed canonically
+            return canonicalize(json.loads(signed)) == canonicalize(vc_copy)
         except Exception:
             return False
     
@@ -157,4 +158,4 @@ class VerifiableCredentialEngine:
         return json.loads(json_ld)
 
 # Global instance
-vc_engine = VerifiableCredentialEngine()
+vc_engine = VerifiableCredentialEngine(settings.ISSUER_DID)
@@ -0,0 +1,94 @@
+"""
+Per-inference signing cost on the agent and verification cost on the server:
+RSA-2048 PSS (the old TPM stub), Ed25519 and ECDSA P-256, per payload and
+with one signature per upload batch. Includes canonicalization.
+
+Usage (from backend/):
+    python -m benchmarks.bench_agent_signing [--batch 100] [--rounds 20]
+"""
+from datetime import datetime
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "agent"))
+
+from app.models.schemas import TelemetryPayload
+from app.services.node_keys import NodeKeyRegistry, batch_content, signed_content
+from signer import Signer
+import signer as agent_signer
+
+def make_payloads(size):
+    return [
+        {
+            "node_id": "bench-node",
+            "model_id": "llama-3-70b",
+            "inference_id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat(),
+            "energy_kwh": 0.0021,
+            "gpu_utilization": 93.4,
+            "signature": "",
+        }
+        for _ in range(size)
+    ]
+
+def per_inference_us(fn, rounds, batch):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds / batch * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch", type=int, default=100, help="payloads per upload batch")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.batch)
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pss = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+    def rsa_each():
+        for payload in payloads:
+            rsa_key.sign(agent_signer.signed_content(payload), pss, hashes.SHA256()).hex()
+
+    print(f"agent signing, per inference ({args.batch} payloads per batch):")
+    print(f"  {'rsa-2048 pss, each':<24} {per_inference_us(rsa_each, args.rounds, args.batch):8.1f} us")
+
+    key_dir = tempfile.mkdtemp()
+    for algorithm in ("ed25519", "p256"):
+        signer = Signer.load(os.path.join(key_dir, f"{algorithm}.pem"), algorithm)
+
+        def each():
+            for payload in payloads:
+                signer.sign_payload(payload)
+
+        print(f"  {algorithm + ', each':<24} {per_inference_us(each, args.rounds, args.batch):8.1f} us")
+        print(f"  {algorithm + ', batch':<24} {per_inference_us(lambda: signer.sign_batch(payloads), args.rounds, args.batch):8.1f} us")
+
+    print("server verification, per inference:")
+    for algorithm in ("ed25519", "p256"):
+        signer = Signer.load(os.path.join(key_dir, f"{algorithm}.pem"), algorithm)
+        os.replace(os.path.join(key_dir, f"{algorithm}.pem.pub"), os.path.join(key_dir, "bench-node.pem"))
+        registry = NodeKeyRegistry(key_dir)
+        models = [TelemetryPayload(**{**p, "signature": signer.sign_payload(p)}) for p in payloads]
+        batch_signature = signer.sign_batch(payloads)
+
+        def verify_each():
+            for model in models:
+                assert registry.verify(model.node_id, signed_content(model), model.signature)
+
+        def verify_batch():
+            assert registry.verify("bench-node", batch_content(models), batch_signature)
+
+        print(f"  {algorithm + ', each':<24} {per_inference_us(verify_each, args.rounds, args.batch):8.1f} us")
+        print(f"  {algorithm + ', batch':<24} {per_inference_us(verify_batch, args.rounds, args.batch):8.1f} us")
+
+if __name__ == "__main__":
+    main()
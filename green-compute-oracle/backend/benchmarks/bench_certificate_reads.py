@@ -0,0 +1,78 @@
+"""
+Measures the certificate read endpoints end to end, in-process: rows/s for
+GET /certificates pages and lookups/s for GET /certificate/{inference_id}.
+
+Usage (from backend/):
+    python -m benchmarks.bench_certificate_reads [--certificates 50000] [--limit 1000]
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+def populate(engine, count):
+    from sqlalchemy import insert
+    from app.models.orm import Certificate, TelemetryEvent
+
+    start = datetime(2025, 11, 1)
+    events, certs = [], []
+    for i in range(count):
+        inference_id = str(uuid.uuid4())
+        timestamp = start + timedelta(seconds=i * 10)
+        events.append({"id": str(uuid.uuid4()), "inference_id": inference_id, "model_id": "llama-3-70b",
+                       "timestamp": timestamp, "energy_kwh": 0.0021, "signature": "sig"})
+        certs.append({"id": str(uuid.uuid4()), "inference_id": inference_id, "energy_used_kwh": 0.0021,
+                      "carbon_intensity_gco2_kwh": 380.5, "total_emissions_gco2": 0.799,
+                      "grid_region": "us-east", "issued_at": timestamp, "certificate_hash": inference_id,
+                      "signed_content": "eyJhbGciOiJIUzI1NiJ9." + "x" * 600})
+    with engine.begin() as connection:
+        connection.execute(insert(TelemetryEvent), events)
+        connection.execute(insert(Certificate), certs)
+    return [event["inference_id"] for event in events]
+
+def bench_pages(client, count, limit, seconds):
+    rows = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        # Walk the first pages repeatedly; the body is not parsed here
+        response = client.get("/api/v1/certificates", params={"limit": limit, "offset": rows % min(count, 10 * limit)})
+        assert response.status_code == 200
+        rows += limit
+    return rows / (time.perf_counter() - start)
+
+def bench_lookups(client, inference_ids, seconds):
+    lookups = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        response = client.get(f"/api/v1/certificate/{inference_ids[lookups % len(inference_ids)]}")
+        assert response.status_code == 200
+        lookups += 1
+    return lookups / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--certificates", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings are read at import time
+        os.environ["SQLITE_DB_PATH"] = os.path.join(tmp, "bench.db")
+        from fastapi.testclient import TestClient
+        from app.core.database import Base, engine
+        from app.main import app
+
+        Base.metadata.create_all(bind=engine)
+        inference_ids = populate(engine, args.certificates)
+        with TestClient(app) as client:
+            page_rate = bench_pages(client, args.certificates, args.limit, args.seconds)
+            lookup_rate = bench_lookups(client, inference_ids, args.seconds)
+
+    print(f"  GET /certificates?limit={args.limit}: {page_rate:8.0f} rows/s")
+    print(f"  GET /certificate/{{id}}: {lookup_rate:8.0f} lookups/s")
+
+if __name__ == "__main__":
+    main()
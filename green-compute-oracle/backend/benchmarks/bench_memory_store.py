@@ -0,0 +1,102 @@
+"""
+Compares the in-memory columnar certificate store against the SQLite store:
+ingest rate, memory per certificate and latency of the read endpoints'
+queries.
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory_store [--certificates 100000]
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.schemas import GreenCertificate
+from app.services.certificate_store import SQLCertificateStore
+from app.services.memory_store import MemoryCertificateStore
+
+BATCH = 500
+MODELS = [f"model-{i}" for i in range(8)]
+NODES = [f"node-{i}" for i in range(64)]
+
+def make_certificates(count):
+    rng = random.Random(1)
+    start = datetime(2025, 11, 1)
+    certs = []
+    for i in range(count):
+        energy = rng.lognormvariate(-6, 1.0)
+        intensity = rng.uniform(50, 600)
+        certs.append(GreenCertificate(
+            certificate_id=str(uuid.uuid4()),
+            inference_id=str(uuid.uuid4()),
+            hardware_id=rng.choice(NODES),
+            model_id=rng.choice(MODELS),
+            timestamp=start + timedelta(seconds=i * 10),
+            energy_used_kwh=energy,
+            carbon_intensity_gco2_kwh=intensity,
+            total_emissions_gco2=energy * intensity,
+            signature="eyJhbGciOiJIUzI1NiJ9." + "x" * 600,
+        ))
+    return certs
+
+def ingest(store, certs):
+    start = time.perf_counter()
+    for i in range(0, len(certs), BATCH):
+        store.store_certificates([(cert, "sig") for cert in certs[i:i + BATCH]])
+    return len(certs) / (time.perf_counter() - start)
+
+def queries(store, certs):
+    timings = {}
+    for name, fn in (
+        ("get", lambda: store.get_certificate(certs[len(certs) // 2].inference_id)),
+        ("list", lambda: store.list_certificates(100, 0)),
+        ("model_emissions", lambda: store.model_emissions("model-3")),
+        ("percentiles", lambda: store.emission_distributions("node", "node-7")),
+        ("export", lambda: sum(1 for _ in store.iter_certificate_rows())),
+    ):
+        fn()
+        start = time.perf_counter()
+        for _ in range(5):
+            fn()
+        timings[name] = (time.perf_counter() - start) / 5 * 1000
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--certificates", type=int, default=100_000)
+    args = parser.parse_args()
+    certs = make_certificates(args.certificates)
+
+    tracemalloc.start()
+    memory = MemoryCertificateStore()
+    memory_rate = ingest(memory, certs)
+    memory_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    memory_times = queries(memory, certs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        sql = SQLCertificateStore(db)
+        sql_rate = ingest(sql, certs)
+        sql_times = queries(sql, certs)
+        db.close()
+
+    print(f"{'':>16}  {'memory':>10}  {'sqlite':>10}")
+    print(f"{'ingest (cert/s)':>16}  {memory_rate:10.0f}  {sql_rate:10.0f}")
+    for name in memory_times:
+        print(f"{name + ' (ms)':>16}  {memory_times[name]:10.2f}  {sql_times[name]:10.2f}")
+    # The ID and signature strings already exist before ingest and are shared, not copied
+    print(f"memory store: {memory_bytes / len(certs):.0f} bytes/certificate on top of its ID and signature strings")
+
+if __name__ == "__main__":
+    main()
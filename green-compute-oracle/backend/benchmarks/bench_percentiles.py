@@ -0,0 +1,92 @@
+"""
+Compares per-model percentiles from merged hourly sketches against exact
+percentiles computed from the certificates table.
+
+Usage (from backend/):
+    python -m benchmarks.bench_percentiles [--certificates 200000] [--days 30]
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.orm import Certificate, TelemetryEvent
+from app.services.sketches import merged_sketches, update_sketches
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+def populate(db, count, days):
+    rng = random.Random(1)
+    start = datetime(2025, 11, 1)
+    span = days * 86400
+    events, certs, observations = [], [], []
+    for _ in range(count):
+        inference_id = str(uuid.uuid4())
+        timestamp = start + timedelta(seconds=rng.uniform(0, span))
+        energy = rng.lognormvariate(-6, 1.0)
+        emissions = energy * rng.uniform(50, 600)
+        events.append({"id": str(uuid.uuid4()), "inference_id": inference_id, "model_id": "llama-3-70b",
+                       "timestamp": timestamp, "energy_kwh": energy, "signature": "sig"})
+        certs.append({"id": str(uuid.uuid4()), "inference_id": inference_id, "energy_used_kwh": energy,
+                      "carbon_intensity_gco2_kwh": emissions / energy, "total_emissions_gco2": emissions,
+                      "grid_region": "us-east", "issued_at": timestamp, "certificate_hash": inference_id,
+                      "signed_content": "jws"})
+        observations.append(({"model": "llama-3-70b"}, timestamp, energy, emissions))
+    db.execute(insert(TelemetryEvent), events)
+    db.execute(insert(Certificate), certs)
+    db.commit()
+    update_sketches(db, observations)
+    return start, start + timedelta(days=days)
+
+def exact(db, start, end):
+    emissions = [
+        row[0] for row in db.query(Certificate.total_emissions_gco2).join(
+            TelemetryEvent, Certificate.inference_id == TelemetryEvent.inference_id
+        ).filter(
+            TelemetryEvent.model_id == "llama-3-70b",
+            TelemetryEvent.timestamp >= start,
+            TelemetryEvent.timestamp < end
+        ).order_by(Certificate.total_emissions_gco2)
+    ]
+    return [float(np.quantile(emissions, q, method="lower")) for q in QUANTILES]
+
+def sketched(db, start, end):
+    _, emissions = merged_sketches(db, "model", "llama-3-70b", start, end)
+    return [emissions.quantile(q) for q in QUANTILES]
+
+def timed(fn, *args, rounds=5):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn(*args)
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--certificates", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        start, end = populate(db, args.certificates, args.days)
+
+        exact_ms, exact_values = timed(exact, db, start, end)
+        sketch_ms, sketch_values = timed(sketched, db, start, end)
+
+    errors = [abs(s - e) / e * 100 for s, e in zip(sketch_values, exact_values)]
+    print(f"   exact: {exact_ms:8.1f} ms  {['%.4f' % v for v in exact_values]}")
+    print(f"  sketch: {sketch_ms:8.1f} ms  {['%.4f' % v for v in sketch_values]}")
+    print(f"   error: {['%.2f%%' % e for e in errors]}")
+
+if __name__ == "__main__":
+    main()
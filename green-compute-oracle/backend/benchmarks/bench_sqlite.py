@@ -0,0 +1,108 @@
+"""
+Compares the default SQLite engine against the tuned profile in
+app.core.database under concurrent ingest-style writes and dashboard reads.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sqlite [--writers 8] [--readers 4] [--writes 500]
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, create_sqlite_engines
+from app.models.orm import Certificate, TelemetryEvent
+
+def write_batch(Session, count):
+    errors = 0
+    for _ in range(count):
+        db = Session()
+        inference_id = str(uuid.uuid4())
+        try:
+            db.add(TelemetryEvent(
+                inference_id=inference_id,
+                timestamp=datetime.utcnow(),
+                energy_kwh=0.002,
+                signature="sig"
+            ))
+            db.flush()
+            db.add(Certificate(
+                inference_id=inference_id,
+                energy_used_kwh=0.002,
+                carbon_intensity_gco2_kwh=380.5,
+                total_emissions_gco2=0.761,
+                grid_region="us-east",
+                certificate_hash=inference_id,
+                signed_content="jws"
+            ))
+            db.commit()
+        except OperationalError:
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    return errors
+
+def read_until(Session, stop):
+    reads = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.query(Certificate).order_by(Certificate.issued_at.desc()).limit(100).all()
+            reads += 1
+        except OperationalError:
+            pass
+        finally:
+            db.close()
+        # Dashboards poll; they do not spin
+        time.sleep(0.01)
+    return reads
+
+def run(name, writer, reader, writers, readers, writes):
+    Base.metadata.create_all(bind=writer)
+    WriteSession = sessionmaker(bind=writer)
+    ReadSession = sessionmaker(bind=reader)
+
+    stop = threading.Event()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=writers + readers) as pool:
+        # Readers run for as long as the writers take
+        read_futures = [pool.submit(read_until, ReadSession, stop) for _ in range(readers)]
+        write_futures = [pool.submit(write_batch, WriteSession, writes) for _ in range(writers)]
+        errors = sum(f.result() for f in write_futures)
+        write_elapsed = time.monotonic() - start
+        stop.set()
+        reads = sum(f.result() for f in read_futures)
+
+    total = writers * writes - errors
+    print(
+        f"{name:>8}: {total / write_elapsed:8.0f} writes/s  "
+        f"{reads / write_elapsed:8.0f} reads/s  {errors} locked errors"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=500, help="writes per writer thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'default.db')}"
+        default = create_engine(url, pool_pre_ping=True, connect_args={"check_same_thread": False})
+        run("default", default, default, args.writers, args.readers, args.writes)
+
+        url = f"sqlite:///{os.path.join(tmp, 'tuned.db')}"
+        writer, reader = create_sqlite_engines(url)
+        run("tuned", writer, reader, args.writers, args.readers, args.writes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Measures cold start in a fresh interpreter: importing app.main, the first
+response (GET /health, after lifespan startup) and the first certificate
+(POST /telemetry), plus which heavy dependencies the import and startup
+pulled in and which the background warm-up loaded once finished.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 5] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies the app should only load when a request needs them
+HEAVY_MODULES = ("jose", "httpx", "cryptography", "numpy", "msgpack.fallback", "psycopg2")
+
+CHILD = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+
+async def call(method, path, body=b""):
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = {}
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+    scope = {
+        "type": "http", "method": method, "path": path, "raw_path": path.encode(),
+        "query_string": b"", "headers": [(b"content-type", b"application/json")],
+        "http_version": "1.1", "scheme": "http", "server": ("bench", 80),
+        "client": ("bench", 1), "root_path": "",
+    }
+    await app.main.app(scope, receive, send)
+    return status["code"]
+
+async def main():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        health = await call("GET", "/health")
+        responded = time.perf_counter()
+        heavy_after_response = [m for m in HEAVY_MODULES if m in sys.modules]
+        warmup = app.main.app.state.warmup
+        if warmup is not None:
+            await warmup
+        heavy_after_warmup = [m for m in HEAVY_MODULES if m in sys.modules]
+        payload = {
+            "node_id": "bench-node", "model_id": "bench-model", "inference_id": "bench-inference",
+            "timestamp": "2025-11-21T08:00:00", "energy_kwh": 0.5, "gpu_utilization": 90.0,
+            "signature": "bench-signature",
+        }
+        ingest = await call("POST", "/api/v1/telemetry", json.dumps(payload).encode())
+        issued = time.perf_counter()
+    return health, ingest, responded, issued, heavy_after_response, heavy_after_warmup
+
+health, ingest, responded, issued, heavy_after_response, heavy_after_warmup = asyncio.run(main())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_response_ms": (responded - start) * 1000,
+    "first_certificate_ms": (issued - start) * 1000,
+    "health_status": health,
+    "ingest_status": ingest,
+    "heavy_modules": heavy,
+    "heavy_modules_after_response": heavy_after_response,
+    "heavy_modules_after_warmup": heavy_after_warmup,
+}))
+"""
+
+def measure(env=None) -> dict:
+    """Runs one cold start in a subprocess and returns its timings."""
+    with tempfile.TemporaryDirectory() as tmp:
+        child_env = {
+            **os.environ,
+            "SQLITE_DB_PATH": os.path.join(tmp, "startup.db"),
+            "ISSUER_KEY_DIR": os.path.join(tmp, "keys"),
+            **(env or {})
+        }
+        # Tables first, as in a deployment, so the first certificate is stored
+        subprocess.run(
+            [sys.executable, "init_db.py"],
+            cwd=BACKEND_DIR, env=child_env, capture_output=True, check=True
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{CHILD}"],
+            cwd=BACKEND_DIR, env=child_env, capture_output=True, text=True, check=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def import_times() -> list:
+    """(cumulative_us, module) for every module imported by ``import app.main``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times.append((int(cumulative), module.strip()))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest app imports")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    for key in ("import_ms", "first_response_ms", "first_certificate_ms"):
+        values = [run[key] for run in runs]
+        print(f"{key:>22}: median {statistics.median(values):7.1f}  min {min(values):7.1f}")
+    print(f"{'heavy modules loaded':>22}: {runs[0]['heavy_modules'] or 'none'}")
+    print(f"{'after first response':>22}: {runs[0]['heavy_modules_after_response'] or 'none'}")
+
+    if args.importtime:
+        print()
+        for cumulative, module in sorted(import_times(), reverse=True)[:20]:
+            print(f"{cumulative / 1000:9.1f} ms  {module}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares one node ingesting telemetry through per-inference POST /telemetry
+against the /telemetry/stream WebSocket, in-process.
+
+Usage (from backend/):
+    python -m benchmarks.bench_stream_ingest [--messages 2000]
+"""
+from datetime import datetime
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+def make_payload():
+    return {
+        "node_id": "bench-node",
+        "model_id": "llama-3-70b",
+        "inference_id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "energy_kwh": 0.0021,
+        "gpu_utilization": 93.4,
+        "signature": os.urandom(256).hex(),
+    }
+
+def bench_post(client, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.post("/api/v1/telemetry", json=make_payload())
+        assert response.status_code == 200
+    return count / (time.perf_counter() - start)
+
+def bench_stream(client, token, count):
+    start = time.perf_counter()
+    with client.websocket_connect(f"/api/v1/telemetry/stream?token={token}") as ws:
+        credits = ws.receive_json()["credits"]
+        sent = received = 0
+        while received < count:
+            # Keep the credit window full
+            while sent < count and sent - received < credits:
+                ws.send_json(make_payload())
+                sent += 1
+            answer = ws.receive_json()
+            assert answer["type"] == "certificate"
+            received += 1
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings are read at import time
+        os.environ["SQLITE_DB_PATH"] = os.path.join(tmp, "bench.db")
+        from fastapi.testclient import TestClient
+        from app.core.database import Base, engine
+        from app.main import app
+        from app.services.crypto_engine import crypto_engine
+
+        Base.metadata.create_all(bind=engine)
+        with TestClient(app) as client:
+            post_rate = bench_post(client, args.messages)
+            stream_rate = bench_stream(client, crypto_engine.issue_node_token("bench-node"), args.messages)
+
+    print(f"    POST: {post_rate:8.0f} certificates/s")
+    print(f"  stream: {stream_rate:8.0f} certificates/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares JSON and MessagePack telemetry batches: bytes on the wire, agent-side
+encode cost and the backend's decode cost (app.core.wire.decode_body).
+
+Usage (from backend/):
+    python -m benchmarks.bench_wire_format [--batch 100] [--rounds 200]
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import time
+import uuid
+
+import msgpack
+
+from app.core.wire import MSGPACK_MEDIA_TYPE, decode_body
+from app.models.schemas import TelemetryBatch
+
+def make_batch(size):
+    return {
+        "payloads": [
+            {
+                "node_id": "node-01",
+                "model_id": "llama-3-70b",
+                "inference_id": str(uuid.uuid4()),
+                "timestamp": datetime.utcnow().isoformat(),
+                "energy_kwh": 0.0021,
+                "gpu_utilization": 93.4,
+                "signature": os.urandom(256).hex(),  # RSA-2048
+            }
+            for _ in range(size)
+        ]
+    }
+
+def with_raw_signatures(batch):
+    return {
+        "payloads": [
+            {**payload, "signature": bytes.fromhex(payload["signature"])}
+            for payload in batch["payloads"]
+        ]
+    }
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch", type=int, default=100, help="payloads per batch")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    batch = make_batch(args.batch)
+    raw_batch = with_raw_signatures(batch)
+
+    json_body = json.dumps(batch, separators=(",", ":")).encode()
+    msgpack_body = msgpack.packb(raw_batch)
+
+    results = {
+        "json": (
+            len(json_body),
+            timed(lambda: json.dumps(batch, separators=(",", ":")).encode(), args.rounds),
+            timed(lambda: decode_body(TelemetryBatch, json_body), args.rounds),
+        ),
+        "msgpack": (
+            len(msgpack_body),
+            timed(lambda: msgpack.packb(with_raw_signatures(batch)), args.rounds),
+            timed(lambda: decode_body(TelemetryBatch, msgpack_body, MSGPACK_MEDIA_TYPE), args.rounds),
+        ),
+    }
+
+    for name, (size, encode, parse) in results.items():
+        print(
+            f"{name:>8}: {size / args.batch:7.0f} bytes/payload  "
+            f"encode {encode * 1e6 / args.batch:6.2f} us/payload  "
+            f"parse {parse * 1e6 / args.batch:6.2f} us/payload"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ Creates all tables in SQLite
 """
 from app.models.orm import Base
 from app.core.database import engine
+from app.services.partitions import ensure_postgres_partitions
+from datetime import datetime
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +16,9 @@ def init_db():
     try:
         logger.info("Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        if engine.dialect.name == "postgresql":
+            # schema.sql creates the partitioned parents; add the monthly partitions
+            ensure_postgres_partitions(engine, datetime.utcnow())
         logger.info("✅ Database tables created successfully!")
     except Exception as e:
         logger.error(f"❌ Failed to create database tables: {e}")
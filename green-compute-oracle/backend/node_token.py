@@ -0,0 +1,20 @@
+"""
+Issues the bearer token a node uses to open a telemetry stream.
+
+Usage:
+    python node_token.py gpu-node-01 [--days 365]
+"""
+import argparse
+
+from app.services.crypto_engine import crypto_engine
+
+def main():
+    parser = argparse.ArgumentParser(description="Issue a telemetry stream token for a node")
+    parser.add_argument("node_id")
+    parser.add_argument("--days", type=int, default=None, help="token lifetime (default NODE_TOKEN_EXPIRE_DAYS)")
+    args = parser.parse_args()
+
+    print(crypto_engine.issue_node_token(args.node_id, expires_days=args.days))
+
+if __name__ == "__main__":
+    main()
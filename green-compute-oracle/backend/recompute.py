@@ -0,0 +1,55 @@
+"""
+Re-prices stored certificates after grid intensity data has been revised.
+
+Usage:
+    python recompute.py --region us-east --start 2025-01-01 --end 2025-02-01 \
+        --checkpoint recompute-us-east.json [--reissue]
+"""
+from datetime import datetime
+import argparse
+import logging
+
+from app.core.database import SessionLocal
+from app.services.recompute import RecomputeJob
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def report_progress(state):
+    logger.info(
+        f"{state['processed']} certificates processed "
+        f"({state['updated']} updated, {state['reissued']} reissued, "
+        f"{state['rows_per_second']:.0f} rows/s)"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute certificate emissions for a region and time range")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--start", required=True, type=datetime.fromisoformat)
+    parser.add_argument("--end", required=True, type=datetime.fromisoformat)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--checkpoint", help="JSON file used to resume an interrupted run")
+    parser.add_argument("--reissue", action="store_true", help="Issue superseding certificates instead of updating in place")
+    args = parser.parse_args()
+
+    if SessionLocal is None:
+        raise SystemExit("Database not available")
+
+    db = SessionLocal()
+    try:
+        job = RecomputeJob(
+            db,
+            region=args.region,
+            start=args.start,
+            end=args.end,
+            chunk_size=args.chunk_size,
+            reissue=args.reissue,
+            checkpoint_path=args.checkpoint,
+            progress=report_progress,
+        )
+        job.run()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Partition maintenance and cold archival, meant to run daily from cron.
+
+Creates upcoming monthly partitions (Postgres) or rotates completed months out
+of the hot tables (SQLite), then archives partitions older than the retention
+window to compressed files that /compliance/export still reads.
+
+Usage:
+    python retention.py [--older-than-days 365] [--archive-dir archive]
+"""
+import argparse
+import logging
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.partitions import run_retention
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotate and archive time partitions")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--archive-dir", default=settings.ARCHIVE_DIR)
+    parser.add_argument("--hot-periods", type=int, default=settings.PARTITION_HOT_PERIODS)
+    args = parser.parse_args()
+
+    if engine is None:
+        raise SystemExit("Database not available")
+
+    result = run_retention(engine, args.archive_dir, args.older_than_days, args.hot_periods)
+    logger.info(f"Rotated: {result['rotated'] or 'none'}; archived: {result['archived'] or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+Generates a new issuer signing key in ISSUER_KEY_DIR and prints its kid.
+Older keys stay published, so credentials they signed keep verifying.
+
+Verifiers may cache the JWKS for KEY_DOCUMENT_MAX_AGE seconds. To publish
+the new key before it signs, pin the current kid with ISSUER_KEY_ID, rotate,
+and unpin once that long has passed.
+
+Usage:
+    python rotate_issuer_key.py
+"""
+from app.services.issuer_keys import issuer_keyring
+
+def main():
+    print(issuer_keyring.rotate())
+
+if __name__ == "__main__":
+    main()
@@ -30,18 +30,27 @@ CREATE TABLE api_keys (
 );
 
 -- Telemetry Events: Raw data from agents
+-- Range-partitioned by month on timestamp. Monthly partitions are created ahead
+-- of time and archived by the retention job (python retention.py); the default
+-- partition only catches rows outside every monthly range.
 CREATE TABLE telemetry_events (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID DEFAULT uuid_generate_v4(),
     node_id UUID REFERENCES nodes(id),
     model_id UUID REFERENCES models(id),
-    inference_id VARCHAR(255) UNIQUE NOT NULL,
+    model_name TEXT, -- Model ID as reported by the agent; not necessarily a registered model
+    node_name TEXT, -- Node ID as reported by the agent; not necessarily a registered node
+    inference_id VARCHAR(255) NOT NULL,
     timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
     energy_kwh DOUBLE PRECISION NOT NULL,
     gpu_utilization DOUBLE PRECISION,
     signature TEXT NOT NULL, -- Agent signature
     verified BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    UNIQUE (inference_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE telemetry_events_default PARTITION OF telemetry_events DEFAULT;
 
 -- Attestation Records: TPM/TEE verification logs
 CREATE TABLE attestation_records (
@@ -54,18 +63,60 @@ CREATE TABLE attestation_records (
 );
 
 -- Certificates: Green Compute Certificates
+-- Range-partitioned by month on issued_at, like telemetry_events. inference_id
+-- cannot reference telemetry_events because unique keys on a partitioned table
+-- must include the partition key.
 CREATE TABLE certificates (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    inference_id VARCHAR(255) REFERENCES telemetry_events(inference_id),
+    id UUID DEFAULT uuid_generate_v4(),
+    inference_id VARCHAR(255) NOT NULL,
     energy_used_kwh DOUBLE PRECISION NOT NULL,
     carbon_intensity_gco2_kwh DOUBLE PRECISION NOT NULL,
     total_emissions_gco2 DOUBLE PRECISION NOT NULL,
     grid_region VARCHAR(50) NOT NULL,
-    issued_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    certificate_hash VARCHAR(255) NOT NULL,
-    signed_content TEXT NOT NULL -- JWS or VC
+    issued_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    certificate_hash VARCHAR(64) NOT NULL, -- SHA-256 of the canonical (RFC 8785) signed payload
+    signed_content TEXT NOT NULL, -- JWS or VC
+    superseded_by UUID, -- Newer certificate issued after an emissions recomputation
+    PRIMARY KEY (id, issued_at)
+) PARTITION BY RANGE (issued_at);
+
+CREATE TABLE certificates_default PARTITION OF certificates DEFAULT;
+CREATE INDEX ix_certificates_inference_id ON certificates (inference_id);
+CREATE INDEX ix_certificates_issued ON certificates (issued_at);
+-- Not UNIQUE: unique indexes on a partitioned table must include issued_at. Hashes
+-- cover the random certificate ID and issue time, so they never repeat; they identify
+-- a certificate and are not a dedup key (redelivered telemetry is caught by inference_id).
+CREATE INDEX ix_certificates_hash ON certificates (certificate_hash);
+
+CREATE INDEX ix_certificates_region_issued ON certificates (grid_region, issued_at, id);
+
+-- Carbon Intensity History: per-region grid intensity observations
+CREATE TABLE carbon_intensity_history (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    region VARCHAR(50) NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    intensity_gco2_kwh DOUBLE PRECISION NOT NULL,
+    source VARCHAR(50) DEFAULT 'unknown',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX ix_carbon_intensity_region_ts ON carbon_intensity_history (region, timestamp);
+
+-- Emission Sketches: hourly DDSketch of per-inference energy and emissions
+-- for each model, node and region; merged at query time for percentiles
+CREATE TABLE emission_sketches (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    dimension VARCHAR(20) NOT NULL, -- 'model', 'node', 'region'
+    key VARCHAR(255) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    energy_sketch TEXT NOT NULL,
+    emissions_sketch TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE UNIQUE INDEX ix_emission_sketches_bucket ON emission_sketches (dimension, key, bucket_start);
+
 -- Audit Logs
 CREATE TABLE audit_logs (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -19,6 +19,12 @@ interface Certificate {
     energy_used_kwh: number;
 }
 
+interface Totals {
+    count: number;
+    total_emissions_gco2: number;
+    energy_kwh: number;
+}
+
 interface Stats {
     totalEmissions: number;
     avgEmissions: number;
@@ -26,9 +32,19 @@ interface Stats {
     certCount: number;
 }
 
+const RECENT_LIMIT = 20;
+
+const toStats = (totals: Totals): Stats => ({
+    totalEmissions: totals.total_emissions_gco2,
+    avgEmissions: totals.count > 0 ? totals.total_emissions_gco2 / totals.count : 0,
+    totalEnergy: totals.energy_kwh,
+    certCount: totals.count,
+});
+
 export default function Dashboard() {
     const [certificates, setCertificates] = useState<Certificate[]>([]);
     const [loading, setLoading] = useState(true);
+    const [reconnects, setReconnects] = useState(0);
     const [stats, setStats] = useState<Stats>({
         totalEmissions: 0,
         avgEmissions: 0,
@@ -37,40 +53,46 @@ export default function Dashboard() {
     });
 
     useEffect(() => {
-        fetchData();
-        const interval = setInterval(fetchData, 5000);
-        return () => clearInterval(interval);
-    }, []);
-
-    const fetchData = async () => {
-        try {
-            const response = await fetch(`${API_BASE}/certificates?limit=20`);
-            if (response.ok) {
-                const data: Certificate[] = await response.json();
-                setCertificates(data);
-
-                const totalEmissions = data.reduce(
-                    (sum, c) => sum + c.total_emissions_gco2,
-                    0
-                );
-                const totalEnergy = data.reduce(
-                    (sum, c) => sum + c.energy_used_kwh,
-                    0
-                );
-
-                setStats({
-                    totalEmissions,
-                    avgEmissions: data.length > 0 ? totalEmissions / data.length : 0,
-                    totalEnergy,
-                    certCount: data.length,
-                });
-            }
-        } catch (error) {
-            console.error("Failed to fetch:", error);
-        } finally {
+        // Live feed: a snapshot on connect, then new certificates and
+        // coalesced aggregate deltas. EventSource reconnects on its own and
+        // every reconnect starts from a fresh snapshot.
+        const source = new EventSource(`${API_BASE}/certificates/stream`);
+
+        source.addEventListener("snapshot", (event) => {
+            const snapshot: { certificates: Certificate[]; totals: Totals } = JSON.parse(
+                (event as MessageEvent).data
+            );
+            setCertificates(snapshot.certificates);
+            setStats(toStats(snapshot.totals));
             setLoading(false);
-        }
-    };
+        });
+
+        source.addEventListener("certificate", (event) => {
+            const cert: Certificate = JSON.parse((event as MessageEvent).data);
+            setCertificates((prev) => [cert, ...prev].slice(0, RECENT_LIMIT));
+        });
+
+        source.addEventListener("aggregates", (event) => {
+            const delta: Totals = JSON.parse((event as MessageEvent).data);
+            setStats((prev) =>
+                toStats({
+                    count: prev.certCount + delta.count,
+                    total_emissions_gco2: prev.totalEmissions + delta.total_emissions_gco2,
+                    energy_kwh: prev.totalEnergy + delta.energy_kwh,
+                })
+            );
+        });
+
+        // We fell behind and missed events: reconnect for a fresh snapshot
+        source.addEventListener("dropped", () => {
+            source.close();
+            setReconnects((n) => n + 1);
+        });
+
+        source.onerror = () => setLoading(false);
+
+        return () => source.close();
+    }, [reconnects]);
 
     return (
         <main className="min-h-screen bg-gradient-mesh relative">
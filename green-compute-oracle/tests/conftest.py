@@ -0,0 +1,80 @@
+from datetime import datetime
+import os
+import tempfile
+import uuid
+
+# Before the app is imported: the suite gets its own database, not backend/green_compute.db
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="oracle-tests-"), "oracle.db"))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import database
+from app.models import orm  # noqa: F401  Registers the tables on Base
+from app.models.schemas import GreenCertificate
+from app.services.issuer_keys import issuer_keyring
+
+
+@pytest.fixture(autouse=True, scope="session")
+def issuer_key_dir(tmp_path_factory):
+    """Keeps the issuer keys the suite generates out of the source tree."""
+    issuer_keyring.key_dir = str(tmp_path_factory.mktemp("issuer-keys"))
+    yield issuer_keyring.key_dir
+
+
+@pytest.fixture(autouse=True, scope="session")
+def database_tables():
+    """Creates the tables, as init_db.py does, so stored certificates are kept."""
+    if database.init_engines():
+        database.Base.metadata.create_all(bind=database.engine)
+
+
+@pytest.fixture
+def db_engine():
+    """A fresh in-memory database with the tables, usable from any thread."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(db_engine):
+    """A session on ``db_engine``."""
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """A database file with the tables, for tests that need separate connections."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'oracle.db'}")
+    database.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def make_certificate():
+    """
+    Builds certificates for new inferences, priced at 400 gCO2/kWh unless
+    ``emissions`` is given.
+    """
+    def make(timestamp=datetime(2025, 11, 21, 8), energy_kwh=0.005, model_id="model-a", node="node-1",
+             emissions=None):
+        return GreenCertificate(
+            certificate_id=str(uuid.uuid4()),
+            inference_id=str(uuid.uuid4()),
+            hardware_id=node,
+            model_id=model_id,
+            timestamp=timestamp,
+            energy_used_kwh=energy_kwh,
+            carbon_intensity_gco2_kwh=400.0,
+            total_emissions_gco2=energy_kwh * 400.0 if emissions is None else emissions,
+            signature="jws",
+        )
+
+    return make
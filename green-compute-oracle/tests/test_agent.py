@@ -0,0 +1,276 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+
+import msgpack
+import pytest
+
+from runtime import AgentRuntime, InferenceBoundaryDetector
+from sampler import GPUSampler, RingBuffer, SimulatedNVML
+from spool import Spool, Uploader
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {"certificates": [], "rejected": []}
+        self.text = str(self._body)
+        self.headers = {"content-type": "application/json"}
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.batches = []
+
+    def post(self, url, timeout, json=None, data=None, headers=None):
+        body = json if json is not None else msgpack.unpackb(data, raw=False)
+        self.batches.append(body["payloads"])
+        return FakeResponse(self.statuses.pop(0))
+
+
+def test_spool_survives_restart_and_ignores_torn_write(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(3):
+        spool.append({"inference_id": f"inf-{i}"})
+    records, end = spool.read_batch(2)
+    spool.commit(end)
+    spool.close()
+
+    # Crash mid-write leaves a partial line behind
+    with open(spool.data_path, "ab") as f:
+        f.write(b'{"inference_id": "inf-')
+
+    reopened = Spool(str(tmp_path))
+    records, _ = reopened.read_batch(10)
+    assert [r["inference_id"] for r in records] == ["inf-2"]
+
+
+def test_uploader_batches_and_keeps_records_on_server_error(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(5):
+        spool.append({"inference_id": f"inf-{i}"})
+    session = FakeSession([503, 200, 200])
+    uploader = Uploader(spool, "http://backend/api/v1/telemetry/batch", batch_size=3, session=session)
+
+    with pytest.raises(Exception):
+        uploader.ship_once()
+    assert spool.pending_bytes() > 0
+
+    assert uploader.ship_once() == 3
+    assert uploader.ship_once() == 2
+    assert uploader.ship_once() == 0
+    assert [len(b) for b in session.batches] == [3, 3, 2]
+    assert spool.pending_bytes() == 0
+
+
+class RefusingSession(FakeSession):
+    """Refuses, like a 422, any batch containing a record marked bad."""
+
+    def __init__(self):
+        super().__init__([])
+
+    def post(self, url, timeout, json=None, data=None, headers=None):
+        body = json if json is not None else msgpack.unpackb(data, raw=False)
+        self.batches.append(body["payloads"])
+        return FakeResponse(422 if any(r.get("bad") for r in body["payloads"]) else 200)
+
+
+def test_uploader_quarantines_only_refused_records(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(5):
+        spool.append({"inference_id": f"inf-{i}", "bad": i == 3})
+    session = RefusingSession()
+
+    assert Uploader(spool, "http://backend/api/v1/telemetry/batch", batch_size=5, session=session).ship_once() == 5
+
+    accepted = [r["inference_id"] for batch in session.batches if not any(r["bad"] for r in batch) for r in batch]
+    assert sorted(accepted) == ["inf-0", "inf-1", "inf-2", "inf-4"]
+    assert spool.pending_bytes() == 0
+    with open(spool.quarantine_path) as f:
+        [line] = f.readlines()
+    assert '"inf-3"' in line and "422" in line
+
+
+class RampNVML(SimulatedNVML):
+    """Two devices; device 0 ramps power linearly, device 1 has an energy counter."""
+
+    def __init__(self, clock):
+        super().__init__(device_count=2)
+        self.clock = clock
+
+    def nvmlDeviceGetPowerUsage(self, handle):
+        return (100.0 + 10.0 * self.clock.now) * 1000.0 if handle == 0 else 500_000.0
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        return self._Utilization(50.0)
+
+    def nvmlDeviceGetTotalEnergyConsumption(self, handle):
+        if handle == 0:
+            raise self.NVMLError("Not Supported")
+        return int(self.clock.now * 300_000)  # 300 W in mJ
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sampler_integrates_over_actual_elapsed_time():
+    clock = FakeClock()
+    sampler = GPUSampler(RampNVML(clock), rate_hz=10, clock=clock)
+    assert [d.use_counter for d in sampler.devices] == [False, True]
+
+    # Irregular ticks, as when the loop drifts
+    for t in [0.0, 0.1, 0.35, 0.4, 1.0]:
+        clock.now = t
+        sampler.sample_once()
+
+    energy_kwh, utilization = sampler.take()
+    # Trapezoid is exact for a linear ramp: 100 W + 5 J of ramp over 1 s; counter gives 300 J
+    assert energy_kwh * 3_600_000 == pytest.approx(105.0 + 300.0)
+    assert utilization == pytest.approx(50.0)
+    assert sampler.take()[0] == 0.0
+
+
+def test_ring_buffer_wraps():
+    ring = RingBuffer(3)
+    for v in range(5):
+        ring.append(float(v))
+    assert len(ring) == 3
+    assert ring.latest(3) == [2.0, 3.0, 4.0]
+    assert ring.latest(2) == [3.0, 4.0]
+
+
+class ConstantSampler:
+    def take(self):
+        return 0.001, 90.0
+
+
+class ListSpool:
+    def __init__(self):
+        self.records = []
+
+    def append(self, record):
+        self.records.append(record)
+
+    def pending_bytes(self):
+        return 0
+
+
+class NoopUploader:
+    def notify(self):
+        pass
+
+
+def test_runtime_pipeline_signs_and_spools_inferences():
+    spool = ListSpool()
+    runtime = AgentRuntime(
+        ConstantSampler(),
+        lambda data: "sig-" + str(len(data)),
+        spool,
+        NoopUploader(),
+        node_id="gpu-node-01",
+        model_id="llama-2-70b",
+        detector=InferenceBoundaryDetector(max_seconds=0.05),
+        tick_seconds=0.01,
+    )
+
+    async def run_briefly():
+        try:
+            await asyncio.wait_for(runtime.run(), timeout=0.3)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run_briefly())
+
+    assert len(spool.records) >= 2
+    first = spool.records[0]
+    assert first["signature"].startswith("sig-")
+    assert first["energy_kwh"] > 0
+    assert first["gpu_utilization"] == pytest.approx(90.0)
+    report = runtime.report()
+    assert report["stages"]["ship"]["count"] == len(spool.records)
+
+
+class FlakySampler(ConstantSampler):
+    def __init__(self):
+        self.calls = 0
+
+    def take(self):
+        self.calls += 1
+        if self.calls == 3:
+            raise RuntimeError("NVML went away")
+        return super().take()
+
+
+def test_runtime_restarts_failed_stages_and_keeps_order(monkeypatch):
+    import runtime as agent_runtime
+    monkeypatch.setattr(agent_runtime, "RESTART_BACKOFF_SECONDS", 0.01)
+    spool = ListSpool()
+    signed = []
+
+    def sign(data):
+        signed.append(data)
+        if len(signed) == 2:
+            raise ValueError("bad key")
+        # Later payloads sign faster, so workers finish out of order
+        time.sleep(max(0.0, 0.03 - 0.005 * len(signed)))
+        return "sig"
+
+    runtime = AgentRuntime(
+        FlakySampler(), sign, spool, NoopUploader(),
+        node_id="gpu-node-01", model_id="llama-2-70b",
+        detector=InferenceBoundaryDetector(max_seconds=0.02),
+        tick_seconds=0.005, sign_workers=4,
+    )
+
+    async def run_briefly():
+        try:
+            await asyncio.wait_for(runtime.run(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run_briefly())
+
+    assert runtime.report()["restarts"] == {"sample": 1}
+    # The payload that failed to sign is dropped; the rest ship in detection order
+    assert len(spool.records) >= 3
+    order = [json.loads(data)["inference_id"] for data in signed]
+    shipped = [record["inference_id"] for record in spool.records]
+    assert shipped == [inference_id for inference_id in order if inference_id != order[1]][:len(shipped)]
+
+
+def test_uploader_sends_msgpack_with_raw_signatures_by_default(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append({"inference_id": "inf-0", "signature": "ab" * 256})
+    session = FakeSession([200])
+
+    Uploader(spool, "http://backend/api/v1/telemetry/batch", session=session).ship_once()
+
+    assert session.batches[0][0]["signature"] == bytes.fromhex("ab" * 256)
+
+
+def test_uploader_is_not_wedged_by_non_hex_signatures(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append({"inference_id": "inf-0", "signature": "mock-sig"})
+    spool.append({"inference_id": "inf-1", "signature": "ab" * 64, "bad": True})
+    session = RefusingSession()
+    uploader = Uploader(spool, "http://backend/api/v1/telemetry/batch", session=session)
+
+    assert uploader.ship_once() == 2
+    assert session.batches[0][0]["signature"] == "mock-sig"
+    assert spool.pending_bytes() == 0
+    # Quarantined as spooled, with the hex signature
+    with open(spool.quarantine_path) as f:
+        assert '"signature":"' + "ab" * 64 + '"' in f.read()
@@ -0,0 +1,169 @@
+from datetime import datetime
+import os
+import shutil
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+
+from fastapi.testclient import TestClient
+import pytest
+
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.main import app
+from app.services import memory_store
+from app.services.memory_store import MemoryCertificateStore
+from app.services.node_keys import NodeKeyRegistry
+from signer import Signer
+from spool import Spool, Uploader
+
+client = TestClient(app)
+
+
+def make_payload(node_id="signed-node", energy_kwh=0.25):
+    return {
+        "node_id": node_id,
+        "model_id": "test-model",
+        "inference_id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "energy_kwh": energy_kwh,
+        "gpu_utilization": 90.0,
+        "signature": "",
+    }
+
+
+@pytest.fixture
+def registered(tmp_path, monkeypatch):
+    """An agent key registered with the backend for "signed-node"."""
+    signer = Signer.load(str(tmp_path / "agent" / "agent.pem"))
+    os.makedirs(tmp_path / "nodes")
+    shutil.copy(tmp_path / "agent" / "agent.pem.pub", tmp_path / "nodes" / "signed-node.pem")
+    monkeypatch.setattr("app.services.crypto_engine.node_keys", NodeKeyRegistry(str(tmp_path / "nodes")))
+    monkeypatch.setattr(memory_store, "memory_store", MemoryCertificateStore())
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_read_db] = lambda: None
+    yield signer
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("algorithm", ["ed25519", "p256"])
+def test_signer_key_is_created_once(tmp_path, algorithm):
+    path = str(tmp_path / "keys" / "agent.pem")
+    signer = Signer.load(path, algorithm)
+    assert signer.algorithm == algorithm
+    assert oct(os.stat(path).st_mode & 0o777) == "0o600"
+    with open(f"{path}.pub", "rb") as f:
+        assert f.read() == signer.public_pem()
+
+    # Restarts keep the key, whatever algorithm is configured
+    restarted = Signer.load(path, "p256" if algorithm == "ed25519" else "ed25519")
+    assert restarted.algorithm == algorithm
+    assert restarted.public_pem() == signer.public_pem()
+
+
+def test_server_verifies_payload_signatures(registered):
+    payload = make_payload()
+    payload["signature"] = registered.sign_payload(payload)
+    tampered = {**payload, "energy_kwh": 0.01}
+
+    assert client.post("/api/v1/telemetry", json=payload).status_code == 200
+    assert client.post("/api/v1/telemetry", json=tampered).status_code == 401
+    assert client.post("/api/v1/telemetry", json={**payload, "signature": "mock-sig"}).status_code == 401
+
+
+@pytest.mark.parametrize("fields, tampered", [
+    ({"timestamp": "2025-11-21T08:00:00+00:00"}, {"timestamp": "2025-11-21T08:00:01+00:00"}),
+    ({"timestamp": "2025-11-21T09:00:00.500+01:00"}, {"timestamp": "2025-11-21T08:00:00.500Z"}),
+    ({"metrics": None}, {}),
+    ({"metrics": {"temperature_c": 71.5}, "firmware": "1.2.3"}, {"firmware": "1.2.4"}),
+])
+def test_server_verifies_what_the_agent_sent(registered, fields, tampered):
+    # Parsing normalizes these (offsets, nulls, unknown fields), so the
+    # server must not verify against the parsed payload
+    payload = {**make_payload(), **fields}
+    payload["signature"] = registered.sign_payload(payload)
+    assert client.post("/api/v1/telemetry", json=payload).status_code == 200
+
+    batch = [{**make_payload(), **fields} for _ in range(2)]
+    result = client.post(
+        "/api/v1/telemetry/batch",
+        json={"payloads": batch, "batch_signature": registered.sign_batch(batch)}
+    ).json()
+    assert result["rejected"] == []
+
+    altered = {name: value for name, value in payload.items() if name in tampered or name not in fields}
+    altered.update(tampered)
+    assert client.post("/api/v1/telemetry", json=altered).status_code == 401
+
+
+def test_server_verifies_batch_signatures(registered):
+    payloads = [make_payload(energy_kwh=0.1 * (i + 1)) for i in range(5)]
+    signature = registered.sign_batch(payloads)
+
+    accepted = client.post("/api/v1/telemetry/batch", json={"payloads": payloads, "batch_signature": signature})
+    assert [c["inference_id"] for c in accepted.json()["certificates"]] == [p["inference_id"] for p in payloads]
+
+    # One altered or reordered payload invalidates the whole batch
+    for forged in ([{**payloads[0], "energy_kwh": 0.0}] + payloads[1:], payloads[::-1]):
+        result = client.post("/api/v1/telemetry/batch", json={"payloads": forged, "batch_signature": signature}).json()
+        assert result["certificates"] == []
+        assert {r["detail"] for r in result["rejected"]} == {"Invalid Agent Signature"}
+
+    # Batches mixing nodes cannot be signed by one of them
+    mixed = payloads[:2] + [make_payload(node_id="other-node")]
+    result = client.post(
+        "/api/v1/telemetry/batch",
+        json={"payloads": mixed, "batch_signature": registered.sign_batch(mixed)}
+    ).json()
+    assert len(result["rejected"]) == 3
+
+
+class BackendSession:
+    """Routes the uploader's requests to the app."""
+
+    def __init__(self):
+        self.responses = []
+
+    def post(self, url, timeout, json=None, data=None, headers=None):
+        if json is not None:
+            response = client.post("/api/v1/telemetry/batch", json=json)
+        else:
+            response = client.post("/api/v1/telemetry/batch", content=data, headers=headers)
+        self.responses.append(response)
+        return response
+
+
+@pytest.mark.parametrize("wire_format", ["json", "msgpack"])
+def test_uploader_batch_signatures_are_accepted(registered, tmp_path, wire_format):
+    spool = Spool(str(tmp_path / "spool"))
+    for _ in range(4):
+        spool.append(make_payload())
+    session = BackendSession()
+    uploader = Uploader(spool, "http://backend/api/v1/telemetry/batch", batch_size=10,
+                        session=session, wire_format=wire_format, signer=registered)
+
+    assert uploader.ship_once() == 4
+    result = uploader._decode(session.responses[0])
+    assert result["rejected"] == []
+    assert len(result["certificates"]) == 4
+
+
+def test_retried_batches_get_the_stored_certificates(registered):
+    payloads = [make_payload() for _ in range(3)]
+    body = {"payloads": payloads, "batch_signature": registered.sign_batch(payloads)}
+
+    first = client.post("/api/v1/telemetry/batch", json=body).json()["certificates"]
+    retried = client.post("/api/v1/telemetry/batch", json=body).json()["certificates"]
+
+    assert [c["certificate_id"] for c in retried] == [c["certificate_id"] for c in first]
+    assert client.get(f"/api/v1/certificate/{payloads[0]['inference_id']}").json()["certificate_id"] == first[0]["certificate_id"]
+
+
+def test_unregistered_nodes_can_be_refused(registered, monkeypatch):
+    payload = make_payload(node_id="unknown-node")
+    payload["signature"] = "mock-sig"
+    assert client.post("/api/v1/telemetry", json=payload).status_code == 200
+
+    monkeypatch.setattr(settings, "REQUIRE_NODE_KEYS", True)
+    assert client.post("/api/v1/telemetry", json={**payload, "inference_id": str(uuid.uuid4())}).status_code == 401
@@ -2,6 +2,7 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.services.crypto_engine import crypto_engine
 import json
+import msgpack
 import uuid
 from datetime import datetime
 
@@ -39,3 +40,53 @@ def test_ingest_telemetry():
     # Verify the certificate signature
     decoded = crypto_engine.verify_signature(data["signature"])
     assert decoded["inference_id"] == payload["inference_id"]
+
+def test_ingest_telemetry_batch():
+    payloads = [
+        {
+            "node_id": "test-node",
+            "model_id": "test-model",
+            "inference_id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat(),
+            "energy_kwh": 0.25,
+            "gpu_utilization": 90.0,
+            "signature": signature
+        }
+        for signature in ["mock-sig", "mock-sig", ""]
+    ]
+
+    response = client.post("/api/v1/telemetry/batch", json={"payloads": payloads})
+    assert response.status_code == 200
+    data = response.json()
+
+    assert [c["inference_id"] for c in data["certificates"]] == [p["inference_id"] for p in payloads[:2]]
+    assert data["rejected"] == [{"inference_id": payloads[2]["inference_id"], "detail": "Invalid Agent Signature"}]
+
+def test_ingest_telemetry_msgpack():
+    signature = bytes(range(256))
+    payload = {
+        "node_id": "test-node",
+        "model_id": "test-model",
+        "inference_id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "energy_kwh": 0.5,
+        "gpu_utilization": 95.0,
+        "signature": signature
+    }
+
+    response = client.post(
+        "/api/v1/telemetry",
+        content=msgpack.packb(payload),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    data = msgpack.unpackb(response.content, raw=False)
+    assert data["inference_id"] == payload["inference_id"]
+    assert data["total_emissions_gco2"] > 0
+
+    # Without an msgpack Accept header the response stays JSON
+    payload["inference_id"] = str(uuid.uuid4())
+    response = client.post("/api/v1/telemetry", content=msgpack.packb(payload),
+                           headers={"Content-Type": "application/msgpack"})
+    assert response.json()["inference_id"] == payload["inference_id"]
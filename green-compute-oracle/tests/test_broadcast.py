@@ -0,0 +1,141 @@
+import asyncio
+
+from sqlalchemy.orm import sessionmaker
+
+from app.services.broadcast import BroadcastHub, format_sse
+from app.services.certificate_store import SQLCertificateStore
+
+
+def test_hub_fans_out_certificates_and_coalesced_aggregates(make_certificate):
+    async def scenario():
+        hub = BroadcastHub(buffer_size=16, aggregate_seconds=60)
+        hub.seed(None)
+        first, second = hub.subscribe(), hub.subscribe()
+
+        hub.publish_certificates([make_certificate(), make_certificate(model_id="model-b", emissions=3.0)])
+        hub.publish_certificates([make_certificate()])
+        hub.flush_aggregates()  # Not due yet
+        hub.flush_aggregates(force=True)
+        return await first.get(timeout=0.1), await second.get(timeout=0.1), hub
+
+    first, second, hub = asyncio.run(scenario())
+
+    assert [name for name, _ in first] == ["snapshot", "certificate", "certificate", "certificate", "aggregates"]
+    assert first == second
+    assert first[0][1]["totals"]["count"] == 0
+
+    delta = first[-1][1]
+    assert delta["count"] == 3
+    assert delta["total_emissions_gco2"] == 7.0
+    assert delta["models"]["model-a"]["count"] == 2
+    assert delta["models"]["model-b"]["total_emissions_gco2"] == 3.0
+
+
+def test_new_subscribers_start_from_snapshot(make_certificate):
+    async def scenario():
+        hub = BroadcastHub(buffer_size=16, aggregate_seconds=0, recent_size=2)
+        hub.seed(None)
+        certs = [make_certificate() for _ in range(3)]
+        hub.publish_certificates(certs)
+        hub.flush_aggregates()
+        late = hub.subscribe()
+        return certs, await late.get(timeout=0.1)
+
+    certs, events = asyncio.run(scenario())
+
+    assert len(events) == 1
+    name, snapshot = events[0]
+    assert name == "snapshot"
+    assert snapshot["totals"]["count"] == 3
+    # Newest first, capped at recent_size
+    assert [c["certificate_id"] for c in snapshot["certificates"]] == [certs[2].certificate_id, certs[1].certificate_id]
+
+
+def test_slow_subscriber_drops_oldest(make_certificate):
+    async def scenario():
+        hub = BroadcastHub(buffer_size=3, aggregate_seconds=60)
+        hub.seed(None)
+        slow = hub.subscribe()
+        certs = [make_certificate() for _ in range(5)]
+        hub.publish_certificates(certs)
+        return certs, await slow.get(timeout=0.1)
+
+    certs, events = asyncio.run(scenario())
+
+    # Snapshot plus five certificates into a buffer of three
+    assert events[0] == ("dropped", {"count": 3})
+    assert [data["certificate_id"] for _, data in events[1:]] == [c.certificate_id for c in certs[2:]]
+
+
+def test_event_stream_formats_sse_and_unsubscribes(make_certificate):
+    async def scenario():
+        hub = BroadcastHub(buffer_size=16, aggregate_seconds=0.01)
+        hub.seed(None)
+        subscription = hub.subscribe()
+        stream = hub.events(subscription)
+        snapshot = await stream.__anext__()
+        hub.publish_certificates([make_certificate()])
+        update = await stream.__anext__()
+        await stream.aclose()
+        return snapshot, update, hub.subscriber_count
+
+    snapshot, update, remaining = asyncio.run(scenario())
+
+    assert snapshot.startswith("event: snapshot\ndata: ")
+    assert snapshot.endswith("\n\n")
+    assert update.startswith("event: certificate\n")
+    assert remaining == 0
+
+
+def test_format_sse():
+    assert format_sse("aggregates", {"count": 1}) == 'event: aggregates\ndata: {"count":1}\n\n'
+
+
+def test_seed_keeps_certificates_published_while_it_queries(db_engine, make_certificate):
+    engine = db_engine
+    stored = [make_certificate(), make_certificate(model_id="model-b", emissions=3.0)]
+    SQLCertificateStore(sessionmaker(bind=engine)()).store_certificates([(cert, "sig") for cert in stored])
+    hub = BroadcastHub(buffer_size=16, aggregate_seconds=60)
+    late = make_certificate()
+
+    class PublishingSession:
+        """Another worker stores and publishes a certificate mid-seed."""
+
+        def __init__(self, db):
+            self.db = db
+            self.pending = [late]
+
+        def execute(self, statement):
+            hub.publish_certificates(self.pending)
+            self.pending = []
+            return self.db.execute(statement)
+
+        def __getattr__(self, name):
+            return getattr(self.db, name)
+
+    async def scenario():
+        hub.seed(PublishingSession(sessionmaker(bind=engine)()))
+        hub.flush_aggregates(force=True)
+        return await hub.subscribe().get(timeout=0.1)
+
+    [(name, snapshot)] = asyncio.run(scenario())
+
+    assert snapshot["totals"]["count"] == 3
+    assert snapshot["totals"]["total_emissions_gco2"] == 7.0
+    assert [c["inference_id"] for c in snapshot["certificates"]][0] == late.inference_id
+    assert {c["inference_id"] for c in snapshot["certificates"]} == {c.inference_id for c in stored + [late]}
+
+
+def test_failed_publish_does_not_fail_a_committed_store(monkeypatch, db, make_certificate):
+    from app.services import storage
+    from app.services.memory_store import MemoryCertificateStore
+
+    def broken(certificates):
+        raise RuntimeError("subscriber blew up")
+
+    monkeypatch.setattr(storage.broadcast_hub, "publish_certificates", broken)
+    cert = make_certificate()
+
+    assert SQLCertificateStore(db).store_certificates([(cert, "sig")]) == [cert]
+    assert SQLCertificateStore(db).get_certificate_row(cert.inference_id) is not None
+    assert MemoryCertificateStore().store_certificates([(cert, "sig")]) == [cert]
@@ -0,0 +1,133 @@
+from datetime import datetime
+import json
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+
+from fastapi.testclient import TestClient
+from jose import jws
+import pytest
+
+from app.core.canonical import canonicalize, digest, format_number
+from app.core.database import get_db, get_read_db
+from app.main import app
+from app.services import memory_store
+from app.services.memory_store import MemoryCertificateStore
+
+
+def test_canonicalize_rfc8785_example():
+    value = {
+        "numbers": [333333333.33333329, 1E30, 4.50, 2e-3, 0.000000000000000000000000001],
+        "string": "€$\u000F\u000aA'B\"\\\\\"/",
+        "literals": [None, True, False]
+    }
+    expected = (
+        '{"literals":[null,true,false],'
+        '"numbers":[333333333.3333333,1e+30,4.5,0.002,1e-27],'
+        '"string":"€$\\u000f\\nA\'B\\"\\\\\\\\\\"/"}'
+    )
+    assert canonicalize(value) == expected.encode("utf-8")
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.0, "0"),
+    (-0.0, "0"),
+    (1, "1"),
+    (-7, "-7"),
+    (2 ** 60, "1152921504606847000"),
+    (1e21, "1e+21"),
+    (1e20, "100000000000000000000"),
+    (123456789012345680000.0, "123456789012345680000"),
+    (0.000001, "0.000001"),
+    (0.0000001, "1e-7"),
+    (5e-324, "5e-324"),
+    (1.7976931348623157e308, "1.7976931348623157e+308"),
+    (9007199254740993, "9007199254740992"),
+])
+def test_format_number_matches_ecmascript(value, expected):
+    assert format_number(value) == expected
+
+
+def test_canonicalize_sorts_keys_by_utf16_code_units():
+    # U+1F600 is a surrogate pair (D83D...), so it sorts before U+FB33
+    value = {"דּ": 1, "\U0001f600": 2, "a": 3, "\r": 4, "1": 5, "ö": 6}
+    assert list(json.loads(canonicalize(value))) == ["\r", "1", "a", "ö", "\U0001f600", "דּ"]
+
+
+def test_canonicalize_rejects_non_json_values():
+    with pytest.raises(ValueError):
+        canonicalize({"energy": float("nan")})
+    with pytest.raises(TypeError):
+        canonicalize({1: "key"})
+
+
+def test_agent_signs_canonical_bytes():
+    from app.core import canonical as backend_canonical
+    from signer import canonical as agent_canonical
+
+    payload = {"node_id": "n", "energy_kwh": 0.5, "timestamp": "2025-11-21T08:00:00"}
+    assert agent_canonical.canonicalize(payload) == canonicalize(payload)
+    # The agent vendors its own copy, which must not drift from the backend's
+    assert agent_canonical.__file__ != backend_canonical.__file__
+    with open(agent_canonical.__file__, "rb") as vendored, open(backend_canonical.__file__, "rb") as original:
+        assert vendored.read() == original.read()
+
+
+def test_certificate_hash_addresses_signed_payload(monkeypatch):
+    store = MemoryCertificateStore()
+    monkeypatch.setattr(memory_store, "memory_store", store)
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_read_db] = lambda: None
+    try:
+        client = TestClient(app)
+        payload = {
+            "node_id": "hash-node",
+            "model_id": "hash-model",
+            "inference_id": str(uuid.uuid4()),
+            "timestamp": datetime(2025, 11, 21, 8).isoformat(),
+            "energy_kwh": 0.5,
+            "gpu_utilization": 90.0,
+            "signature": "mock-sig",
+        }
+        issued = client.post("/api/v1/telemetry", json=payload).json()
+        by_hash = client.get(f"/api/v1/certificates/by-hash/{issued['certificate_hash'].upper()}")
+        missing = client.get(f"/api/v1/certificates/by-hash/{'0' * 64}")
+    finally:
+        app.dependency_overrides.clear()
+
+    signed = jws.get_unverified_claims(issued["signature"])
+    assert signed == canonicalize(json.loads(signed))
+    assert issued["certificate_hash"] == digest(signed)
+    assert by_hash.status_code == 200
+    assert by_hash.json()["certificate_id"] == issued["certificate_id"]
+    assert missing.status_code == 404
+
+
+def test_redelivered_telemetry_is_deduplicated_by_inference_id(monkeypatch):
+    store = MemoryCertificateStore()
+    monkeypatch.setattr(memory_store, "memory_store", store)
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_read_db] = lambda: None
+    try:
+        client = TestClient(app)
+        payload = {
+            "node_id": "hash-node",
+            "model_id": "hash-model",
+            "inference_id": str(uuid.uuid4()),
+            "timestamp": datetime(2025, 11, 21, 8).isoformat(),
+            "energy_kwh": 0.5,
+            "gpu_utilization": 90.0,
+            "signature": "mock-sig",
+        }
+        first = client.post("/api/v1/telemetry", json=payload).json()
+        second = client.post("/api/v1/telemetry", json=payload).json()
+    finally:
+        app.dependency_overrides.clear()
+
+    # The hash covers the certificate ID and issue time: it identifies a
+    # certificate, and a second issuance for the same telemetry differs
+    assert first["certificate_hash"] != second["certificate_hash"]
+    assert len(store) == 1
+    assert store.get_certificate_row(payload["inference_id"])[9] == first["certificate_hash"]
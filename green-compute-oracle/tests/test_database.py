@@ -0,0 +1,152 @@
+from datetime import datetime
+import os
+import re
+import sqlite3
+import time
+import uuid
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import BACKEND_DIR, settings
+from app.core.database import Base, ReadSessionFactory, create_pooled_engine, create_sqlite_engines
+from app.models.orm import TelemetryEvent
+from app.models.schemas import GreenCertificate
+from app.services.certificate_store import SQLCertificateStore
+
+
+def test_sqlite_profile_uses_wal_and_query_only_readers(tmp_path):
+    writer, reader = create_sqlite_engines(f"sqlite:///{tmp_path / 'oracle.db'}")
+
+    with writer.begin() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+
+    assert writer.pool.size() == 1
+
+    with reader.connect() as conn:
+        assert conn.execute(text("SELECT x FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+
+
+def test_pooled_engine_uses_configured_pool_without_pre_ping(tmp_path):
+    engine = create_pooled_engine(f"sqlite:///{tmp_path / 'oracle.db'}", pool_size=3)
+
+    assert engine.pool.size() == 3
+    assert engine.pool._recycle == settings.DATABASE_POOL_RECYCLE
+    assert not engine.pool._pre_ping
+
+
+def test_reads_fall_back_to_primary_while_replica_is_down(tmp_path, monkeypatch):
+    def sessions(path):
+        engine = create_pooled_engine(f"sqlite:///{path}", pool_size=1)
+        return sessionmaker(bind=engine)
+
+    primary = sessions(tmp_path / "primary.db")
+    with primary.kw["bind"].begin() as conn:
+        conn.execute(text("CREATE TABLE role (name TEXT)"))
+        conn.execute(text("INSERT INTO role VALUES ('primary')"))
+    replica = sessions(tmp_path / "replica.db")
+    with replica.kw["bind"].begin() as conn:
+        conn.execute(text("CREATE TABLE role (name TEXT)"))
+        conn.execute(text("INSERT INTO role VALUES ('replica')"))
+
+    read_sessions = ReadSessionFactory(replica, primary, retry_seconds=30)
+    with read_sessions() as db:
+        assert db.execute(text("SELECT name FROM role")).scalar() == "replica"
+
+    # The replica becomes unreachable: reads move to the primary
+    read_sessions.replica = sessions(tmp_path / "missing" / "replica.db")
+    with read_sessions() as db:
+        assert db.execute(text("SELECT name FROM role")).scalar() == "primary"
+
+    # ...and stay there until the retry interval has passed
+    read_sessions.replica = replica
+    with read_sessions() as db:
+        assert db.execute(text("SELECT name FROM role")).scalar() == "primary"
+    monkeypatch.setattr(time, "monotonic", lambda: read_sessions._replica_down_until + 1)
+    with read_sessions() as db:
+        assert db.execute(text("SELECT name FROM role")).scalar() == "replica"
+
+
+def test_reads_fall_back_when_pooled_replica_connections_die(tmp_path):
+    primary = sessionmaker(bind=create_pooled_engine(f"sqlite:///{tmp_path / 'primary.db'}", pool_size=1))
+    replica_engine = create_pooled_engine(f"sqlite:///{tmp_path / 'replica.db'}", pool_size=1, pre_ping=True)
+    replica = sessionmaker(bind=replica_engine)
+    for engine, name in ((primary.kw["bind"], "primary"), (replica_engine, "replica")):
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE role (name TEXT)"))
+            conn.execute(text(f"INSERT INTO role VALUES ('{name}')"))
+    assert replica_engine.pool._pre_ping
+    assert replica_engine.pool.checkedin() == 1
+
+    # The replica goes away with a connection still pooled: the ping fails, and so does reconnecting
+    def unreachable(*args, **kwargs):
+        raise sqlite3.OperationalError("replica unreachable")
+    replica_engine.dialect.do_ping = lambda dbapi_connection: unreachable()
+    event.listen(replica_engine, "do_connect", unreachable)
+
+    with ReadSessionFactory(replica, primary, retry_seconds=30)() as db:
+        assert db.execute(text("SELECT name FROM role")).scalar() == "primary"
+
+
+def _postgres_columns(table: str) -> dict:
+    """Column name -> declaration for a table in schema.sql."""
+    with open(os.path.join(BACKEND_DIR, "schema.sql")) as f:
+        schema = f.read()
+    body = re.search(rf"CREATE TABLE {table} \((.*?)\n\)", schema, re.S).group(1)
+    columns = {}
+    for line in body.splitlines():
+        line = line.split("--")[0].strip().rstrip(",")
+        if line and not line.startswith(("PRIMARY KEY", "UNIQUE", "FOREIGN KEY")):
+            name, declaration = line.split(None, 1)
+            columns[name] = declaration
+    return columns
+
+
+def test_stored_telemetry_fits_postgres_schema(db):
+    cert = GreenCertificate(
+        certificate_id=str(uuid.uuid4()),
+        inference_id=str(uuid.uuid4()),
+        hardware_id="gpu-node-01",
+        model_id="llama-2-70b",
+        timestamp=datetime(2025, 11, 21, 8),
+        energy_used_kwh=0.0025,
+        carbon_intensity_gco2_kwh=380.5,
+        total_emissions_gco2=0.95125,
+        signature="jws",
+    )
+    SQLCertificateStore(db).store_certificates([(cert, "sig")])
+
+    row = db.query(TelemetryEvent).one()
+    columns = _postgres_columns("telemetry_events")
+    for column in TelemetryEvent.__table__.columns:
+        value = getattr(row, column.key)
+        if value is None:
+            continue
+        declaration = columns[column.name]
+        # Postgres rejects what SQLite stores happily: non-UUIDs in UUID columns,
+        # and references to rows that do not exist (nothing is registered here)
+        assert "REFERENCES" not in declaration, column.name
+        if declaration.startswith("UUID"):
+            uuid.UUID(value)
+    assert row.model_name == "llama-2-70b"
+    assert SQLCertificateStore(db).model_emissions("llama-2-70b")["inference_count"] == 1
+
+
+def test_orm_indexes_match_postgres_schema():
+    with open(os.path.join(BACKEND_DIR, "schema.sql")) as f:
+        schema = f.read()
+    declared = {
+        name: bool(unique)
+        for unique, name in re.findall(r"CREATE (UNIQUE )?INDEX (\w+) ON", schema)
+    }
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in declared:
+                assert index.unique == declared[index.name], index.name
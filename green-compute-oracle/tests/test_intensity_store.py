@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from app.models.orm import CarbonIntensityRecord
+from app.services.carbon_oracle import CarbonOracle
+from app.services.intensity_store import IntensityStore
+
+T0 = datetime(2025, 11, 21, 8, 0, 0)
+
+
+def test_lookup_interpolates_between_observations():
+    store = IntensityStore(max_gap_seconds=600)
+    store.record("eu-west", T0, 100.0, "electricitymaps")
+    store.record("eu-west", T0 + timedelta(minutes=10), 200.0, "electricitymaps")
+
+    intensity, source = store.lookup("eu-west", T0 + timedelta(minutes=5))
+    assert intensity == 150.0
+    assert source == "electricitymaps"
+
+    # Out-of-order observations are slotted into place
+    store.record("eu-west", T0 + timedelta(minutes=5), 120.0, "watttime")
+    assert store.lookup("eu-west", T0 + timedelta(minutes=5))[0] == 120.0
+
+
+def test_lookup_outside_known_window_returns_none():
+    store = IntensityStore(max_gap_seconds=600)
+    store.record("eu-west", T0, 100.0)
+
+    assert store.lookup("eu-west", T0 + timedelta(hours=1)) is None
+    assert store.lookup("eu-west", T0 - timedelta(hours=1)) is None
+    assert store.lookup("us-east", T0) is None
+
+
+def test_oracle_prices_past_timestamp_from_history():
+    store = IntensityStore()
+    oracle = CarbonOracle(history=store)
+    store.record("eu-north", T0, 42.0, "electricitymaps")
+
+    data = asyncio.run(oracle.get_intensity_at("eu-north", T0 + timedelta(minutes=1)))
+    assert data.intensity == 42.0
+    assert data.source == "electricitymaps"
+
+
+def test_lookup_falls_through_to_db_for_gaps_in_memory(db):
+    # Another worker observed the gap this one has no data for
+    IntensityStore().record("eu-west", T0 + timedelta(hours=1), 180.0, "electricitymaps", db=db)
+    store = IntensityStore(max_gap_seconds=600)
+    store.record("eu-west", T0, 100.0)
+    store.record("eu-west", T0 + timedelta(hours=2), 300.0)
+
+    assert store.lookup("eu-west", T0 + timedelta(hours=1)) is None
+    assert store.lookup("eu-west", T0 + timedelta(hours=1), db=db) == (180.0, "electricitymaps")
+
+
+def test_oracle_never_prices_past_timestamps_at_the_live_intensity(monkeypatch):
+    store = IntensityStore()
+    oracle = CarbonOracle(history=store)
+
+    async def live(region, db=None):
+        raise AssertionError("priced at the current intensity")
+
+    async def past(zone, timestamp):
+        return 77.0 if timestamp == T0 else None
+
+    monkeypatch.setattr(oracle, "get_intensity", live)
+    monkeypatch.setattr(oracle.emaps, "get_intensity_at", past)
+
+    historical = asyncio.run(oracle.get_intensity_at("eu-west", T0))
+    assert (historical.intensity, historical.source) == (77.0, "electricitymaps")
+    assert store.lookup("eu-west", T0) == (77.0, "electricitymaps")
+
+    unknown = asyncio.run(oracle.get_intensity_at("eu-west", T0 - timedelta(days=1)))
+    assert (unknown.intensity, unknown.source) == (oracle.regional_fallbacks["eu-west"], "regional_average")
+
+    with pytest.raises(AssertionError):
+        asyncio.run(oracle.get_intensity_at("eu-west", datetime.utcnow()))
+
+
+def test_regional_averages_are_not_recorded_as_history(db):
+    store = IntensityStore()
+    oracle = CarbonOracle(history=store)
+
+    # No provider keys: priced at the regional average
+    data = asyncio.run(oracle.get_intensity_at("eu-north", datetime.utcnow(), db=db))
+    assert data.source == "regional_average"
+    assert db.query(CarbonIntensityRecord).count() == 0
+    assert store.lookup("eu-north", data.timestamp, db=db) is None
+
+    # Averages stored as history by earlier versions are not served
+    db.add(CarbonIntensityRecord(region="eu-north", timestamp=T0, intensity_gco2_kwh=45.2, source="regional_average"))
+    db.commit()
+    assert store.lookup("eu-north", T0, db=db) is None
@@ -0,0 +1,163 @@
+import json
+import os
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from jose import jws
+import pytest
+
+from app.core.canonical import canonicalize
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.main import app
+from app.services import issuer_keys, memory_store
+from app.services.crypto_engine import crypto_engine
+from app.services.issuer_keys import IssuerKeyring, thumbprint
+from app.services.memory_store import MemoryCertificateStore
+from app.services.verifiable_credentials import vc_engine
+
+client = TestClient(app)
+
+
+def test_keyring_persists_and_rotates(tmp_path):
+    keyring = IssuerKeyring(str(tmp_path))
+    first, token = keyring.sign(b'{"n":1}')
+    assert os.listdir(tmp_path) == ["issuer-key-0001.pem"]
+    assert oct(os.stat(tmp_path / "issuer-key-0001.pem").st_mode & 0o777) == "0o600"
+
+    # Another process loads the same key and derives the same kid
+    assert IssuerKeyring(str(tmp_path)).sign(b"{}")[0] == first
+
+    second = keyring.rotate()
+    assert second != first
+    assert keyring.sign(b"{}")[0] == second
+    assert [key["kid"] for key in keyring.jwks()["keys"]] == [first, second]
+    # Credentials signed before the rotation still verify
+    assert keyring.verify(token) == b'{"n":1}'
+
+    pinned = IssuerKeyring(str(tmp_path), active_kid=first)
+    assert pinned.sign(b"{}")[0] == first
+    assert len(pinned.jwks()["keys"]) == 2
+
+
+def test_keyring_refuses_keys_it_cannot_persist(tmp_path, monkeypatch):
+    (tmp_path / "not-a-dir").write_text("")
+    with pytest.raises(RuntimeError):
+        IssuerKeyring(str(tmp_path / "not-a-dir" / "keys")).sign(b"{}")
+
+    # The current key keeps signing, but a rotation that cannot be persisted fails
+    keyring = IssuerKeyring(str(tmp_path / "keys"))
+    kid, _ = keyring.sign(b"{}")
+
+    def read_only(src, dst):
+        raise PermissionError(13, "Permission denied", dst)
+
+    monkeypatch.setattr(os, "link", read_only)
+    with pytest.raises(RuntimeError):
+        keyring.rotate()
+    assert keyring.sign(b"{}")[0] == kid
+    assert len(keyring.jwks()["keys"]) == 1
+    assert os.listdir(tmp_path / "keys") == ["issuer-key-0001.pem"]
+
+
+def test_keyring_picks_up_keys_rotated_elsewhere(tmp_path, monkeypatch):
+    server = IssuerKeyring(str(tmp_path))
+    server.load()
+    IssuerKeyring(str(tmp_path)).rotate()
+    _, token = IssuerKeyring(str(tmp_path)).sign(b"{}")
+
+    # Unknown kids rescan the key directory
+    assert server.verify(token) == b"{}"
+    with pytest.raises(ValueError):
+        server.verify(jws.sign(b"{}", "secret", headers={"kid": "unknown"}, algorithm="HS256"))
+
+    # ...but not more than once per RESCAN_SECONDS
+    IssuerKeyring(str(tmp_path)).rotate()
+    _, token = IssuerKeyring(str(tmp_path)).sign(b"{}")
+    with pytest.raises(ValueError):
+        server.verify(token)
+    monkeypatch.setattr(issuer_keys, "RESCAN_SECONDS", 0)
+    assert server.verify(token) == b"{}"
+
+
+def test_keyring_trusts_imported_jwks(tmp_path):
+    other = IssuerKeyring(str(tmp_path / "other"))
+    _, token = other.sign(b"{}")
+    verifier = IssuerKeyring(str(tmp_path / "verifier"))
+    with pytest.raises(ValueError):
+        verifier.verify(token)
+
+    assert verifier.add_jwks(other.jwks()) == [key["kid"] for key in other.jwks()["keys"]]
+    assert verifier.verify(token) == b"{}"
+    assert len(verifier.jwks()["keys"]) == 1  # Trusted, not republished
+
+    forged = dict(other.jwks()["keys"][0], kid="forged")
+    with pytest.raises(ValueError):
+        verifier.add_jwks({"keys": [forged]})
+
+
+def test_key_documents_are_cacheable(tmp_path, monkeypatch):
+    monkeypatch.setattr(issuer_keys, "issuer_keyring", IssuerKeyring(str(tmp_path)))
+    monkeypatch.setattr("app.routes.keys.issuer_keyring", issuer_keys.issuer_keyring)
+
+    jwks_response = client.get("/.well-known/jwks.json")
+    did_response = client.get("/.well-known/did.json")
+    revalidated = client.get("/.well-known/jwks.json", headers={"If-None-Match": jwks_response.headers["etag"]})
+
+    assert jwks_response.headers["cache-control"] == f"public, max-age={settings.KEY_DOCUMENT_MAX_AGE}"
+    assert revalidated.status_code == 304
+    [key] = jwks_response.json()["keys"]
+    assert key["kid"] == thumbprint(key)
+    assert "d" not in key
+    did = did_response.json()
+    assert did["id"] == settings.ISSUER_DID
+    assert did["assertionMethod"] == [f"{settings.ISSUER_DID}#{key['kid']}"]
+    assert did["verificationMethod"][0]["publicKeyJwk"] == key
+
+
+def test_credentials_verify_offline_with_published_keys(monkeypatch):
+    monkeypatch.setattr(memory_store, "memory_store", MemoryCertificateStore())
+    payload = {
+        "node_id": "vc-node",
+        "model_id": "vc-model",
+        "inference_id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "energy_kwh": 0.5,
+        "gpu_utilization": 95.0,
+        "signature": "mock-sig",
+    }
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_read_db] = lambda: None
+    try:
+        assert client.post("/api/v1/telemetry", json=payload).status_code == 200
+        vc = client.get(f"/api/v1/certificate/{payload['inference_id']}/vc").json()
+        jwks = client.get("/.well-known/jwks.json").json()
+    finally:
+        app.dependency_overrides.clear()
+
+    # What an auditor does: the JWKS alone, no call back to the oracle
+    proof = vc.pop("proof")
+    kid = jws.get_unverified_header(proof["jws"])["kid"]
+    assert proof["verificationMethod"] == f"{settings.ISSUER_DID}#{kid}"
+    assert jws.verify(proof["jws"], jwks, algorithms=["ES256"]) == canonicalize(vc)
+
+    vc["proof"] = proof
+    assert vc_engine.verify_vc(vc)
+    vc["credentialSubject"]["energyMetrics"]["totalEmissions"]["value"] = 0
+    assert not vc_engine.verify_vc(vc)
+    assert not vc_engine.verify_vc({**vc, "proof": {**proof, "jws": crypto_engine.issue_node_token("vc-node")}})
+
+
+def test_legacy_hs256_credentials_still_verify(monkeypatch):
+    vc = {"id": "urn:uuid:legacy", "credentialSubject": {"energy": 0.5}}
+    legacy = jws.sign(json.dumps(vc).encode(), settings.SECRET_KEY, algorithm="HS256")
+    vc_with_proof = {**vc, "proof": {"type": "JsonWebSignature2020", "jws": legacy}}
+
+    assert crypto_engine.verify_signature(legacy) == vc
+    assert vc_engine.verify_vc(vc_with_proof)
+    forged = jws.sign(json.dumps(vc).encode(), "other-secret", algorithm="HS256")
+    assert not vc_engine.verify_vc({**vc, "proof": {"jws": forged}})
+
+    monkeypatch.setattr(settings, "VERIFY_LEGACY_HS256", False)
+    assert not vc_engine.verify_vc(vc_with_proof)
@@ -0,0 +1,82 @@
+from datetime import datetime
+import gzip
+import json
+import os
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker
+
+from app.models.orm import Certificate, TelemetryEvent
+from app.models.schemas import GreenCertificate
+from app.services.carbon_oracle import CarbonOracle
+from app.services.certificate_store import SQLCertificateStore
+from app.services.intensity_store import IntensityStore
+from app.services.partitions import iter_certificate_rows, run_retention
+from app.services.recompute import RecomputeJob
+
+
+def test_rotate_archive_and_read_back(tmp_path, file_engine):
+    engine = file_engine
+    db = sessionmaker(bind=engine)()
+    for i, issued_at in enumerate([datetime(2025, 1, 10), datetime(2025, 2, 10),
+                                   datetime(2025, 5, 10), datetime(2025, 6, 10), datetime(2025, 1, 20)]):
+        db.add(Certificate(id=f"cert-{i}", inference_id=f"inf-{i}", energy_used_kwh=1.0,
+                           carbon_intensity_gco2_kwh=100.0, total_emissions_gco2=100.0,
+                           grid_region="us-east", issued_at=issued_at,
+                           certificate_hash=f"hash-{i}", signed_content="jws"))
+    db.commit()
+
+    archive_dir = str(tmp_path / "archive")
+    result = run_retention(engine, archive_dir, older_than_days=120, hot_periods=2,
+                           now=datetime(2025, 6, 15))
+
+    assert result["rotated"] == ["certificates_p202501", "certificates_p202502"]
+    assert result["archived"] == ["certificates_p202501"]
+    assert "certificates_p202502" in inspect(engine).get_table_names()
+    assert db.query(Certificate).count() == 2
+
+    every = [r["id"] for r in iter_certificate_rows(db, archive_dir)]
+    assert every == ["cert-3", "cert-2", "cert-1", "cert-4", "cert-0"]
+
+    # Archives are written newest first, so they are streamed as stored
+    with gzip.open(os.path.join(archive_dir, "certificates_p202501.jsonl.gz"), "rt") as f:
+        assert [json.loads(line)["id"] for line in f] == ["cert-4", "cert-0"]
+    january = list(iter_certificate_rows(db, archive_dir, datetime(2025, 1, 1), datetime(2025, 1, 15)))
+    assert [r["id"] for r in january] == ["cert-0"]
+
+
+def test_reads_and_recompute_span_rotated_partitions(tmp_path, file_engine):
+    engine = file_engine
+    db = sessionmaker(bind=engine)()
+    # Consumed late in January, certified in February: rotated into different months
+    for inference_id, consumed_at, issued_at in [("inf-old", datetime(2025, 1, 31, 23), datetime(2025, 2, 1, 1)),
+                                                 ("inf-new", datetime(2025, 6, 10), datetime(2025, 6, 10))]:
+        db.add(TelemetryEvent(inference_id=inference_id, model_name="llama-2-70b", timestamp=consumed_at,
+                              energy_kwh=1.0, signature="sig"))
+        db.add(Certificate(id=f"cert-{inference_id[4:]}", inference_id=inference_id, energy_used_kwh=1.0,
+                           carbon_intensity_gco2_kwh=100.0, total_emissions_gco2=100.0,
+                           grid_region="us-east", issued_at=issued_at,
+                           certificate_hash=f"hash-{inference_id[4:]}", signed_content="jws"))
+    db.commit()
+
+    result = run_retention(engine, str(tmp_path / "archive"), older_than_days=3650, now=datetime(2025, 6, 15))
+    assert result["rotated"] == ["telemetry_events_p202501", "certificates_p202502"]
+
+    store = SQLCertificateStore(db)
+    assert store.get_certificate_row("inf-old")[0] == "cert-old"
+    assert store.get_certificate_row_by_hash("hash-old")[0] == "cert-old"
+    assert [row[0] for row in store.list_certificate_rows()] == ["cert-new", "cert-old"]
+    assert store.model_emissions("llama-2-70b")["inference_count"] == 2
+
+    # Redelivered telemetry gets the certificate stored before the rotation
+    redelivered = GreenCertificate(certificate_id="cert-again", inference_id="inf-old", hardware_id="node-1",
+                                   model_id="llama-2-70b", timestamp=datetime(2025, 1, 31, 23),
+                                   energy_used_kwh=1.0, carbon_intensity_gco2_kwh=100.0,
+                                   total_emissions_gco2=100.0, signature="jws")
+    assert [cert.certificate_id for cert in store.store_certificates([(redelivered, "sig")])] == ["cert-old"]
+
+    oracle = CarbonOracle(history=IntensityStore())
+    oracle.regional_fallbacks["us-east"] = 300.0
+    state = RecomputeJob(db, "us-east", datetime(2025, 1, 1), datetime(2025, 7, 1), oracle=oracle).run()
+    assert state["processed"] == 2 and state["updated"] == 2
+    assert {store.get_certificate(i).total_emissions_gco2 for i in ("inf-old", "inf-new")} == {300.0}
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.placement import rank_placements
+
+client = TestClient(app)
+
+
+def test_rank_placements_finds_cleanest_window():
+    start = datetime(2025, 11, 21)
+    intensity = [
+        [400, 400, 100, 100, 400, 400],
+        [300, 300, 300, 300, 300, 300],
+    ]
+    options = rank_placements(["dirty", "steady"], intensity, start, 3600, energy_kwh=2.0,
+                              duration_seconds=2 * 3600, limit=3)
+
+    best = options[0]
+    assert best["region"] == "dirty"
+    assert best["start_time"] == datetime(2025, 11, 21, 2)
+    assert best["expected_emissions_gco2"] == 200.0
+    assert [o["expected_emissions_gco2"] for o in options] == sorted(o["expected_emissions_gco2"] for o in options)
+
+
+def test_placement_endpoint_ranks_regions():
+    response = client.post("/api/v1/placement", json={
+        "energy_kwh": 10.0,
+        "duration_hours": 2,
+        "horizon_hours": 6,
+        "regions": ["eu-north", "asia-east"],
+        "limit": 5,
+    })
+    assert response.status_code == 200
+    options = response.json()["options"]
+    assert len(options) == 5
+    assert options[0]["region"] == "eu-north"
+
+    response = client.post("/api/v1/placement", json={
+        "energy_kwh": 1.0, "duration_hours": 1, "regions": ["mars-base"]
+    })
+    assert response.status_code == 400
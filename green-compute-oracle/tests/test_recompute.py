@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.orm import CarbonIntensityRecord, Certificate
+from app.services.carbon_oracle import CarbonOracle
+from app.services.intensity_store import IntensityStore
+from app.services.recompute import RecomputeJob
+from app.services.sketches import merged_sketches
+from app.services.storage import store_certificates
+
+T0 = datetime(2025, 1, 1)
+
+
+def seed(db, count):
+    for i in range(count):
+        db.add(Certificate(
+            id=f"cert-{i:04d}",
+            inference_id=f"inf-{i:04d}",
+            energy_used_kwh=2.0,
+            carbon_intensity_gco2_kwh=380.5,
+            total_emissions_gco2=761.0,
+            grid_region="us-east",
+            issued_at=T0 + timedelta(minutes=i),
+            certificate_hash=f"hash-{i:04d}",
+            signed_content="jws",
+        ))
+    db.commit()
+
+
+def test_recompute_updates_in_place_and_resumes(db, tmp_path):
+    seed(db, 25)
+
+    oracle = CarbonOracle(history=IntensityStore())
+    oracle.regional_fallbacks["us-east"] = 300.0
+    checkpoint = str(tmp_path / "job.json")
+    seen = []
+
+    job = RecomputeJob(db, "us-east", T0, T0 + timedelta(days=1), chunk_size=10,
+                       checkpoint_path=checkpoint, progress=seen.append, oracle=oracle)
+    state = job.run()
+
+    assert state["done"] and state["processed"] == 25 and state["updated"] == 25
+    assert [s["processed"] for s in seen] == [10, 20, 25]
+    assert {c.total_emissions_gco2 for c in db.query(Certificate).all()} == {600.0}
+
+    # A finished checkpoint makes a rerun a no-op
+    rerun = RecomputeJob(db, "us-east", T0, T0 + timedelta(days=1), checkpoint_path=checkpoint, oracle=oracle)
+    assert rerun.run()["processed"] == 25
+
+
+def test_recompute_reissue_supersedes_original(db):
+    seed(db, 3)
+
+    store = IntensityStore(max_gap_seconds=3600)
+    store.record("us-east", T0, 100.0)
+    oracle = CarbonOracle(history=store)
+
+    state = RecomputeJob(db, "us-east", T0, T0 + timedelta(hours=1), reissue=True, oracle=oracle).run()
+
+    assert state["reissued"] == 3
+    current = db.query(Certificate).filter(Certificate.superseded_by.is_(None)).all()
+    assert len(current) == 3
+    assert {c.total_emissions_gco2 for c in current} == {200.0}
+    assert db.query(Certificate).count() == 6
+
+
+@pytest.mark.parametrize("reissue", [False, True])
+def test_recompute_applies_a_revised_regional_average(reissue, db, make_certificate):
+    # Ingested without provider keys, so priced at the regional average,
+    # which earlier versions also stored as history
+    cert = make_certificate(T0, 2.0)
+    store_certificates(db, [(cert, "sig")])
+    db.add(CarbonIntensityRecord(region="us-east", timestamp=T0, intensity_gco2_kwh=400.0, source="regional_average"))
+    db.commit()
+
+    oracle = CarbonOracle(history=IntensityStore())
+    oracle.regional_fallbacks["us-east"] = 300.0
+    state = RecomputeJob(db, "us-east", T0, datetime.utcnow() + timedelta(hours=1),
+                         reissue=reissue, oracle=oracle).run()
+
+    assert state["updated" if not reissue else "reissued"] == 1
+    current = db.query(Certificate).filter(Certificate.superseded_by.is_(None)).one()
+    assert current.total_emissions_gco2 == 600.0
+    # Percentiles follow the re-priced emissions
+    for dimension, key in (("model", "model-a"), ("node", "node-1"), ("region", "us-east")):
+        energy, emissions = merged_sketches(db, dimension, key)
+        assert energy.count == emissions.count == 1
+        assert emissions.quantile(0.5) == 600.0
+        assert emissions.sum == 600.0
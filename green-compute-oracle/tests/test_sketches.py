@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+import random
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import get_read_db
+from app.main import app
+from app.models.orm import EmissionSketch
+from app.services.sketches import DDSketch, merged_sketches, update_sketches
+from app.services.storage import store_certificates
+
+T0 = datetime(2025, 11, 21, 8)
+
+
+def test_ddsketch_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-6, 1.2) for _ in range(20_000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.95, 0.99):
+        exact = float(np.quantile(values, q, method="lower"))
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.011
+    assert sketch.quantile(0) == min(values)
+    assert sketch.quantile(1) == max(values)
+
+
+def test_ddsketch_merge_and_round_trip():
+    rng = random.Random(3)
+    left, right, whole = DDSketch(), DDSketch(), DDSketch()
+    for i in range(5_000):
+        value = rng.expovariate(10)
+        (left if i % 2 else right).add(value)
+        whole.add(value)
+
+    merged = DDSketch.from_json(left.to_json())
+    merged.merge(DDSketch.from_json(right.to_json()))
+
+    assert merged.count == whole.count
+    assert merged.bins == whole.bins
+    assert merged.quantile(0.99) == whole.quantile(0.99)
+
+
+def test_ddsketch_remove_undoes_add():
+    rng = random.Random(5)
+    values = [rng.expovariate(10) for _ in range(1_000)]
+    kept = DDSketch.from_values(values[:900])
+    sketch = DDSketch.from_values(values)
+    for value in values[900:]:
+        assert sketch.remove(value)
+
+    assert sketch.bins == kept.bins
+    assert sketch.count == kept.count
+    assert sketch.quantile(0.5) == kept.quantile(0.5)
+    assert kept.min >= sketch.min >= kept.min / sketch.gamma
+    assert not DDSketch().remove(1.0)
+
+
+def test_ddsketch_memory_is_bounded():
+    sketch = DDSketch(max_bins=64)
+    for exponent in range(-300, 300):
+        sketch.add(1.05 ** exponent)
+    assert len(sketch.bins) <= 64
+    assert sketch.count == 600
+    # The top of the distribution is untouched by collapsing
+    assert abs(sketch.quantile(1) - 1.05 ** 299) / 1.05 ** 299 < 1e-9
+
+
+def test_stored_certificates_update_hourly_sketches(db, make_certificate):
+    first_hour = [make_certificate(T0 + timedelta(minutes=i), 0.001 * (i + 1)) for i in range(50)]
+    second_hour = [make_certificate(T0 + timedelta(hours=1, minutes=i), 0.1, model_id="model-b") for i in range(10)]
+    store_certificates(db, [(cert, "sig") for cert in first_hour[:25]])
+    store_certificates(db, [(cert, "sig") for cert in first_hour[25:] + second_hour])
+    # Redelivery is deduplicated before it reaches the sketches
+    store_certificates(db, [(cert, "sig") for cert in first_hour[:5]])
+
+    rows = db.query(EmissionSketch).filter(EmissionSketch.dimension == "model").all()
+    assert sorted((row.key, row.bucket_start, row.count) for row in rows) == [
+        ("model-a", T0, 50),
+        ("model-b", T0 + timedelta(hours=1), 10),
+    ]
+
+    energy, emissions = merged_sketches(db, "region", "us-east")
+    assert energy.count == 60
+    # 50 values of 1..50 Wh and 10 of 100 Wh
+    assert abs(energy.quantile(0.5) - 0.030) / 0.030 <= 0.011
+
+    energy, _ = merged_sketches(db, "node", "node-1", start=T0, end=T0 + timedelta(hours=1))
+    assert energy.count == 50
+
+
+def test_concurrent_writers_creating_a_bucket_keep_both_observations(file_engine, make_certificate):
+    engine = file_engine
+    other_writer = [make_certificate(T0, 0.2)]
+
+    # Another writer creates the same new hourly bucket just before this one inserts it
+    @event.listens_for(engine, "before_cursor_execute")
+    def race(conn, cursor, statement, parameters, context, executemany):
+        if other_writer and statement.startswith("INSERT INTO emission_sketches"):
+            certs = list(other_writer)
+            other_writer.clear()
+            update_sketches(sessionmaker(bind=engine)(), [
+                ({"model": cert.model_id}, cert.timestamp, cert.energy_used_kwh, cert.total_emissions_gco2)
+                for cert in certs
+            ])
+
+    cert = make_certificate(T0 + timedelta(minutes=5), 0.1)
+    update_sketches(sessionmaker(bind=engine)(), [
+        ({"model": cert.model_id}, cert.timestamp, cert.energy_used_kwh, cert.total_emissions_gco2)
+    ])
+
+    energy, _ = merged_sketches(sessionmaker(bind=engine)(), "model", "model-a")
+    assert energy.count == 2
+
+
+def test_percentiles_endpoint(db, make_certificate):
+    certs = [make_certificate(T0 + timedelta(minutes=i), 0.001 * (i + 1)) for i in range(100)]
+    store_certificates(db, [(cert, "sig") for cert in certs])
+
+    app.dependency_overrides[get_read_db] = lambda: db
+    try:
+        client = TestClient(app)
+        response = client.get("/api/v1/percentiles/model/model-a", params={"q": [0.5, 0.99]})
+        unknown = client.get("/api/v1/percentiles/model/model-z")
+        bad_dimension = client.get("/api/v1/percentiles/rack/r1")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["energy_kwh"]["count"] == 100
+    assert set(data["energy_kwh"]["percentiles"]) == {"p50", "p99"}
+    assert abs(data["energy_kwh"]["percentiles"]["p99"] - 0.099) / 0.099 <= 0.011
+    assert abs(data["emissions_gco2"]["percentiles"]["p50"] - 20.0) / 20.0 <= 0.011
+
+    assert unknown.status_code == 200
+    assert unknown.json()["energy_kwh"]["count"] == 0
+    assert bad_dimension.status_code == 422
@@ -0,0 +1,28 @@
+from benchmarks.bench_startup import HEAVY_MODULES, import_times, measure
+
+
+def test_import_defers_heavy_dependencies():
+    imported = {module for _, module in import_times()}
+    assert "app.main" in imported
+    assert not imported.intersection(HEAVY_MODULES)
+
+
+def test_startup_defers_heavy_dependencies():
+    # Checks what startup loads rather than how long it takes, which depends on
+    # the machine. Without the warm-up, which loads them on purpose concurrently
+    result = measure({"STARTUP_WARMUP": "false"})
+
+    assert result["health_status"] == 200
+    assert result["ingest_status"] == 200
+    assert result["heavy_modules"] == []
+    assert result["heavy_modules_after_response"] == []
+    assert result["heavy_modules_after_warmup"] == []
+
+
+def test_warmup_loads_what_the_first_certificate_needs():
+    result = measure({"STARTUP_WARMUP": "true"})
+
+    assert result["health_status"] == 200
+    assert result["ingest_status"] == 200
+    assert result["heavy_modules"] == []
+    assert {"jose", "httpx", "cryptography"} <= set(result["heavy_modules_after_warmup"])
@@ -0,0 +1,150 @@
+from datetime import datetime
+import uuid
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from starlette.websockets import WebSocketDisconnect
+
+from app.core import database
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.main import app
+from app.services import memory_store
+from app.services.certificate_store import SQLCertificateStore
+from app.services.crypto_engine import crypto_engine
+from app.services.memory_store import MemoryCertificateStore
+
+client = TestClient(app)
+
+STREAM_URL = "/api/v1/telemetry/stream"
+
+
+def make_payload(node_id="stream-node", signature="mock-sig"):
+    return {
+        "node_id": node_id,
+        "model_id": "test-model",
+        "inference_id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "energy_kwh": 0.25,
+        "gpu_utilization": 90.0,
+        "signature": signature,
+    }
+
+
+def auth(node_id="stream-node"):
+    return {"Authorization": f"Bearer {crypto_engine.issue_node_token(node_id)}"}
+
+
+def test_stream_requires_node_token():
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(STREAM_URL) as ws:
+            ws.receive_json()
+
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f"{STREAM_URL}?token=not-a-token") as ws:
+            ws.receive_json()
+
+    # Valid tokens are refused in the query string too: it ends up in access logs
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f"{STREAM_URL}?token={crypto_engine.issue_node_token('stream-node')}") as ws:
+            ws.receive_json()
+
+
+def test_stream_issues_certificates_and_returns_credits():
+    with client.websocket_connect(STREAM_URL, headers=auth()) as ws:
+        ready = ws.receive_json()
+        assert ready == {"type": "ready", "credits": settings.STREAM_CREDITS}
+
+        payloads = [make_payload() for _ in range(5)]
+        for payload in payloads:
+            ws.send_json(payload)
+        answers = [ws.receive_json() for _ in payloads]
+
+    assert all(a["type"] == "certificate" for a in answers)
+    assert {a["certificate"]["inference_id"] for a in answers} == {p["inference_id"] for p in payloads}
+    claims = crypto_engine.verify_signature(answers[0]["certificate"]["signature"])
+    assert claims["hardware_id"] == "stream-node"
+
+
+def test_stream_rejects_bad_payloads_without_closing():
+    with client.websocket_connect(STREAM_URL, headers=auth()) as ws:
+        ws.receive_json()
+        ws.send_json(make_payload(node_id="someone-else"))
+        ws.send_text("{not json")
+        ws.send_json(make_payload(signature=""))
+        ws.send_json(make_payload())
+        answers = [ws.receive_json() for _ in range(4)]
+
+    assert [a["type"] for a in answers] == ["rejected", "rejected", "rejected", "certificate"]
+    assert "authenticated node" in answers[0]["detail"]
+    assert answers[2]["detail"] == "Invalid Agent Signature"
+
+
+def test_stream_msgpack_frames():
+    headers = {**auth(), "Accept": "application/msgpack"}
+    payload = make_payload(signature=bytes(range(256)))
+    with client.websocket_connect(STREAM_URL, headers=headers) as ws:
+        assert msgpack.unpackb(ws.receive_bytes())["type"] == "ready"
+        ws.send_bytes(msgpack.packb(payload))
+        answer = msgpack.unpackb(ws.receive_bytes())
+
+    assert answer["type"] == "certificate"
+    assert answer["certificate"]["inference_id"] == payload["inference_id"]
+
+
+def test_stream_closes_on_credit_overrun(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_CREDITS", 0)
+    with client.websocket_connect(STREAM_URL, headers=auth()) as ws:
+        assert ws.receive_json()["credits"] == 0
+        ws.send_json(make_payload())
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            ws.receive_json()
+    assert excinfo.value.code == 1008
+
+
+def test_stream_acknowledges_only_stored_certificates(monkeypatch):
+    def failing_store(items):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    payload = make_payload()
+    with client.websocket_connect(STREAM_URL, headers=auth()) as ws:
+        ws.receive_json()
+        with monkeypatch.context() as m:
+            m.setattr(SQLCertificateStore, "store_certificates", lambda self, items: failing_store(items))
+            ws.send_json(payload)
+            failed = ws.receive_json()
+        ws.send_json(payload)
+        stored = ws.receive_json()
+        ws.send_json(payload)
+        redelivered = ws.receive_json()
+
+    assert failed == {"type": "rejected", "inference_id": payload["inference_id"], "detail": "Certificate could not be stored"}
+    assert stored["type"] == "certificate"
+    # A redelivery is answered with the certificate that was stored, not a new one
+    assert redelivered["certificate"]["certificate_id"] == stored["certificate"]["certificate_id"]
+
+
+def test_stream_without_database_stores_where_routes_read(monkeypatch):
+    store = MemoryCertificateStore()
+    monkeypatch.setattr(memory_store, "memory_store", store)
+    monkeypatch.setattr(database, "SessionLocal", None)
+    monkeypatch.setattr(database, "ReadSessionLocal", None)
+    payload = make_payload()
+    with client.websocket_connect(STREAM_URL, headers=auth()) as ws:
+        ws.receive_json()
+        ws.send_json(payload)
+        issued = ws.receive_json()
+
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_read_db] = lambda: None
+    try:
+        response = client.get(f"/api/v1/certificate/{payload['inference_id']}")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert issued["type"] == "certificate"
+    assert len(store) == 1
+    assert response.status_code == 200
+    assert response.json()["certificate_id"] == issued["certificate"]["certificate_id"]